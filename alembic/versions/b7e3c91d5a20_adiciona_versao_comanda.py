@@ -0,0 +1,26 @@
+"""Adiciona versão à comanda
+
+Revision ID: b7e3c91d5a20
+Revises: 474b82f714c9
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c91d5a20'
+down_revision: Union[str, None] = '474b82f714c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('comandas', sa.Column('versao', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('comandas', 'versao')
@@ -0,0 +1,26 @@
+"""Adiciona estação de preparo à categoria
+
+Revision ID: c41f8a2e6d13
+Revises: b7e3c91d5a20
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8a2e6d13'
+down_revision: Union[str, None] = 'b7e3c91d5a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('categorias', sa.Column('estacao', sa.String(length=20), server_default='cozinha', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('categorias', 'estacao')
@@ -0,0 +1,27 @@
+# app/api/v1/cozinha.py
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.deps import get_current_active_superuser, get_current_active_user
+from app.schemas.cozinha_schemas import FilaCozinhaSnapshot
+from app.services.fila_cozinha_service import ESTACOES, fila_cozinha_service
+
+router = APIRouter()
+
+
+@router.get("/{estacao}/fila", response_model=FilaCozinhaSnapshot, dependencies=[Depends(get_current_active_user)])
+async def obter_fila(estacao: str):
+    """
+    Fila atual da estação de preparo (itens em aberto, do mais antigo ao mais novo), servida do Redis.
+    As telas devem preferir o WebSocket /ws/cozinha/{estacao}, que envia este snapshot e depois os deltas.
+    """
+    if estacao not in ESTACOES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Estação '{estacao}' não existe")
+    return await fila_cozinha_service.snapshot(estacao)
+
+
+@router.post("/fila/reconstruir", dependencies=[Depends(get_current_active_superuser)])
+async def reconstruir_fila():
+    """Remonta as filas de todas as estações a partir dos pedidos em aberto no banco."""
+    if not await fila_cozinha_service.reconstruir(forcar=True):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reconstrução já em andamento")
+    return {"message": "Filas de preparo reconstruídas"}
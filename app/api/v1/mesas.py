@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.notifications import STAFF_NOTIFICATION_CHANNEL, manager as websocket_hub
 from app.core.session import get_db
-from app.services.mesa_service import create_mesa, get_mesa, get_mesas, update_mesa, delete_mesa
+from app.services.mesa_service import create_mesa, get_mesa, get_mesas, update_mesa, delete_mesa, get_mesa_by_qr_code_hash
 from app.schemas.mesa_schemas import MesaCreate, MesaUpdate, MesaOut
+from app.schemas.websocket_schemas import ClientCallStaffPayload, WebSocketMessage
 
 router = APIRouter()
 
@@ -71,3 +73,25 @@ async def delete(mesa_id: int, db_session: AsyncSession = Depends(get_db)):
     if not db_mesa:
         raise HTTPException(status_code=404, detail="Mesa não encontrada")
     return db_mesa
+
+@router.post("/qr/{qr_code_hash}/chamar-garcom")
+async def chamar_garcom(qr_code_hash: str, db_session: AsyncSession = Depends(get_db)):
+    """
+    Chamada de garçom feita pelo cliente através do QRCode da mesa.
+    Vai apenas aos garçons que atendem a mesa (e aos gerentes) no canal da equipe.
+
+    - **qr_code_hash**: Hash do QRCode da mesa.
+    - **return**: Mensagem de confirmação.
+    """
+    db_mesa = await get_mesa_by_qr_code_hash(db_session, qr_code_hash)
+    if not db_mesa:
+        raise HTTPException(status_code=404, detail="QRCode da mesa inválido ou mesa não encontrada")
+
+    message = WebSocketMessage(
+        type="notification",
+        payload=ClientCallStaffPayload(mesa_id=str(db_mesa.id), mesa_numero=str(db_mesa.numero_identificador)),
+        target_role="garcom",
+        mesa_id=str(db_mesa.id),
+    )
+    await websocket_hub.publish(STAFF_NOTIFICATION_CHANNEL, message)
+    return {"message": f"Garçom chamado para a mesa {db_mesa.numero_identificador}. Aguarde um momento."}
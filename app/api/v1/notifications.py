@@ -1,14 +1,15 @@
 # app/api/v1/notifications.py
+from typing import Optional
+
 from fastapi import APIRouter, WebSocket
-from app.core.notifications import manager
+from app.core.notifications import manager, DEFAULT_CHANNEL
 
 router = APIRouter()
 
 @router.websocket("/ws/notificacao")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, last_event_id: Optional[str] = None, encoding: Optional[str] = None):
+    await manager.connect(websocket, DEFAULT_CHANNEL, last_event_id=last_event_id, encoding=encoding)
     try:
-        while True:
-            await websocket.receive_text()  # Apenas para manter conexão ativa
+        await manager.receive_until_disconnect(websocket)  # Mantém a conexão ativa e responde ao heartbeat
     except:
-        manager.disconnect(websocket)
+        manager.disconnect(websocket, DEFAULT_CHANNEL)
@@ -4,7 +4,7 @@ from typing import List, Optional, Dict, Any
 
 from app.core.session import get_db
 from app.schemas.pedido_schemas import (
-    PedidoCreate, StatusPedidoUpdate, Pedido
+    PedidoCreate, StatusPedidoUpdate, Pedido, StatusPedidoLoteUpdate, StatusPedidoLoteResposta
 )
 from app.services.pedido_service import pedido_service
 
@@ -41,6 +41,22 @@ async def listar_pedidos(
     )
     return pedidos_list
 
+# Atualização de status de vários pedidos de uma vez
+@router.put("/status", response_model=StatusPedidoLoteResposta)
+async def atualizar_status_pedidos_em_lote(
+    lote: StatusPedidoLoteUpdate,
+    db_session: AsyncSession = Depends(get_db)
+):
+    """
+    Atualiza o status de vários pedidos numa única transação.
+    Transições inválidas não impedem as demais: o resultado de cada pedido vem na resposta.
+    """
+    resultados = await pedido_service.atualizar_status_pedidos_em_lote(
+        db_session, [(item.pedido_id, item.status) for item in lote.atualizacoes]
+    )
+    atualizados = sum(1 for resultado in resultados if resultado["sucesso"])
+    return {"atualizados": atualizados, "falhas": len(resultados) - atualizados, "resultados": resultados}
+
 # Atualização do status do pedido
 @router.put("/{pedido_id}/status", response_model=Pedido)
 async def atualizar_status_pedido(
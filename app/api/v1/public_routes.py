@@ -69,23 +69,8 @@ async def get_comanda_via_mesa_qr(
     # Em um cenário mais seguro, o QR da mesa poderia levar a um QR específico da comanda.
     return comanda_ativa
 
-@router.post("/mesa/{qr_code_hash}/chamar-garcom", status_code=status.HTTP_200_OK)
-async def chamar_garcom_via_mesa_qr(
-    qr_code_hash: str,
-    db: AsyncSession = Depends(get_db_session)
-):
-    """
-    Permite ao cliente chamar um garçom através do QRCode da mesa.
-    (Implementação inicial, notificação real via WebSocket/Redis será na etapa 006)
-    """
-    mesa = await mesa_service.get_mesa_by_qr_code_hash(db, qr_code_hash)
-    if not mesa:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="QRCode da mesa inválido ou mesa não encontrada.")
-
-    # Lógica de notificação (ex: publicar em um canal Redis) será adicionada depois.
-    # Por agora, apenas log ou confirmação.
-    print(f"Chamada para garçom recebida da mesa {mesa.numero_identificador} (QR: {qr_code_hash})")
-    return {"message": f"Garçom chamado para a mesa {mesa.numero_identificador}. Aguarde um momento."}
+# A chamada de garçom pelo QRCode fica em POST /mesas/qr/{qr_code_hash}/chamar-garcom (app/api/v1/mesas.py),
+# pois este router não está montado na aplicação.
 
 
 
@@ -4,11 +4,12 @@ from sqlalchemy.ext.asyncio import AsyncSession # Alterado para AsyncSession
 from datetime import date, timedelta
 from typing import Optional, Any, Literal # Adicionado Literal
 
-from app.core.session import get_db_session # Ajustado para o novo get_db_session async
+from app.core.session import get_db, get_db_session # Ajustado para o novo get_db_session async
 from app.schemas.relatorio_schemas import (
     RelatorioFiadoSchemas, RelatorioVendasSchemas,
     RelatorioProdutosVendidosSchemas, RelatorioPedidosPorStatusSchemas, 
-    RelatorioPedidosPorUsuarioSchemas
+    RelatorioPedidosPorUsuarioSchemas, RelatorioComparativoSchemas, RelatorioHeatmapSchemas,
+    RelatorioDesempenhoEquipeSchemas
 )
 from app.services import relatorio_service # Assumindo que o service será ajustado para async
 
@@ -43,6 +44,31 @@ def get_date_range_from_period(periodo: Optional[Literal["hoje", "semanal", "men
         start_of_month = today.replace(day=1)
         return start_of_month, today
 
+def _mesmo_dia_ano_anterior(dia: date) -> date:
+    # 29/02 não existe no ano anterior: usa 28/02
+    if dia.month == 2 and dia.day == 29:
+        return dia.replace(year=dia.year - 1, day=28)
+    return dia.replace(year=dia.year - 1)
+
+# Função auxiliar para determinar o período atual e o período de comparação
+def get_comparison_ranges(comparacao: Literal["semanal", "mensal_ano_anterior", "personalizado"],
+                          data_inicio: Optional[date],
+                          data_fim: Optional[date]) -> tuple[tuple[date, date], tuple[date, date]]:
+    today = date.today()
+    if comparacao == "semanal":
+        # Semana atual até hoje vs. o mesmo intervalo da semana passada
+        start_of_week = today - timedelta(days=today.weekday())
+        return (start_of_week, today), (start_of_week - timedelta(days=7), today - timedelta(days=7))
+    elif comparacao == "mensal_ano_anterior":
+        # Mês atual até hoje vs. o mesmo intervalo do mesmo mês no ano anterior
+        start_of_month = today.replace(day=1)
+        return (start_of_month, today), (_mesmo_dia_ano_anterior(start_of_month), _mesmo_dia_ano_anterior(today))
+    else:
+        # Intervalo informado vs. o intervalo de mesma duração imediatamente anterior
+        inicio, fim = get_date_range_from_period(None, data_inicio, data_fim)
+        fim_anterior = inicio - timedelta(days=1)
+        return (inicio, fim), (fim_anterior - (fim - inicio), fim_anterior)
+
 @router.get("/fiado", response_model=RelatorioFiadoSchemas)
 async def get_relatorio_fiado_endpoint(
     periodo: Optional[Literal["hoje", "semanal", "mensal", "anual"]] = Query(None, description="Período predefinido para o relatório (hoje, semanal, mensal, anual). Sobrepõe data_inicio e data_fim se fornecido."),
@@ -134,3 +160,56 @@ async def get_relatorio_pedidos_por_usuario_endpoint(
         )
     return relatorio
 
+
+@router.get("/comparativo", response_model=RelatorioComparativoSchemas)
+async def get_relatorio_comparativo_endpoint(
+    comparacao: Literal["semanal", "mensal_ano_anterior", "personalizado"] = Query("semanal", description="Tipo de comparação: semana atual vs. semana passada, mês atual vs. mesmo mês do ano anterior, ou o intervalo informado vs. o intervalo de mesma duração imediatamente anterior."),
+    data_inicio: Optional[date] = Query(None, description="Data de início (YYYY-MM-DD), usada quando comparacao='personalizado'."),
+    data_fim: Optional[date] = Query(None, description="Data de fim (YYYY-MM-DD), usada quando comparacao='personalizado'."),
+    db: AsyncSession = Depends(get_db)
+) -> Any:
+    periodo_atual, periodo_anterior = get_comparison_ranges(comparacao, data_inicio, data_fim)
+    try:
+        relatorio = await relatorio_service.get_relatorio_comparativo(
+            db=db, comparacao=comparacao, periodo_atual=periodo_atual, periodo_anterior=periodo_anterior
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro interno ao gerar o relatório comparativo: {str(e)}"
+        )
+    return relatorio
+
+@router.get("/heatmap", response_model=RelatorioHeatmapSchemas)
+async def get_relatorio_heatmap_endpoint(
+    periodo: Optional[Literal["hoje", "semanal", "mensal", "anual"]] = Query(None, description="Período predefinido para o relatório."),
+    data_inicio: Optional[date] = Query(None, description="Data de início (YYYY-MM-DD)."),
+    data_fim: Optional[date] = Query(None, description="Data de fim (YYYY-MM-DD)."),
+    db: AsyncSession = Depends(get_db)
+) -> Any:
+    start_date, end_date = get_date_range_from_period(periodo, data_inicio, data_fim)
+    try:
+        relatorio = await relatorio_service.get_relatorio_heatmap(db=db, data_inicio=start_date, data_fim=end_date)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro interno ao gerar o heatmap de vendas: {str(e)}"
+        )
+    return relatorio
+
+@router.get("/desempenho-equipe", response_model=RelatorioDesempenhoEquipeSchemas)
+async def get_relatorio_desempenho_equipe_endpoint(
+    periodo: Optional[Literal["hoje", "semanal", "mensal", "anual"]] = Query(None, description="Período predefinido para o relatório."),
+    data_inicio: Optional[date] = Query(None, description="Data de início (YYYY-MM-DD)."),
+    data_fim: Optional[date] = Query(None, description="Data de fim (YYYY-MM-DD)."),
+    db: AsyncSession = Depends(get_db)
+) -> Any:
+    start_date, end_date = get_date_range_from_period(periodo, data_inicio, data_fim)
+    try:
+        relatorio = await relatorio_service.get_relatorio_desempenho_equipe(db=db, data_inicio=start_date, data_fim=end_date)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro interno ao gerar o relatório de desempenho da equipe: {str(e)}"
+        )
+    return relatorio
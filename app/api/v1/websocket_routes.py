@@ -1,181 +1,390 @@
 # app/api/v1/websocket_routes.py
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
-from typing import List, Dict, Set
-from sqlalchemy.ext.asyncio import AsyncSession
-import asyncio
 import json
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
-from app.core.session import get_db_session
-from app.services.redis_service import redis_service_instance
-from app.schemas.websocket_schemas import WebSocketMessage, ClientCallStaffPayload, ComandaStatusUpdatePayload
+from app.api.deps import get_current_active_superuser
+from app.core.config.settings import settings
+from app.core.notifications import (
+    STAFF_NOTIFICATION_CHANNEL,
+    STAFF_ROLES,
+    SSESubscriber,
+    comanda_diff_channel,
+    comanda_status_channel,
+    cozinha_channel,
+    format_sse_event,
+    manager,
+    mesa_status_channel,
+    pedido_status_channel,
+    user_channel,
+)
+from app.core.security import decode_token
+from app.core.session import AsyncSessionFactory
+from app.models.user import User
+from app.schemas.websocket_schemas import WebSocketMessage, ClientCallStaffPayload, ComandaSnapshotPayload, ComandaStatusUpdatePayload
 from app.services import comanda_service, mesa_service # Para validar hashes e obter dados
+from app.services.fila_cozinha_service import ESTACOES, fila_cozinha_service
+from app.services.user_service import user_service
 
 router = APIRouter(prefix="/ws", tags=["WebSockets"])
 
-class ConnectionManager:
-    def __init__(self):
-        # Conexões ativas: { "canal_ou_id_unico": {websocket1, websocket2} }
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, channel_id: str):
-        await websocket.accept()
-        if channel_id not in self.active_connections:
-            self.active_connections[channel_id] = set()
-        self.active_connections[channel_id].add(websocket)
-        logger.info(f"WebSocket conectado ao canal: {channel_id}. Total de conexões no canal: {len(self.active_connections[channel_id])}")
-
-    def disconnect(self, websocket: WebSocket, channel_id: str):
-        if channel_id in self.active_connections:
-            self.active_connections[channel_id].remove(websocket)
-            if not self.active_connections[channel_id]: # Se o canal ficar vazio, remove o canal
-                del self.active_connections[channel_id]
-            logger.info(f"WebSocket desconectado do canal: {channel_id}.")
-        else:
-            logger.warning(f"Tentativa de desconectar WebSocket de um canal inexistente ou já vazio: {channel_id}")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast_to_channel(self, message: str, channel_id: str):
-        if channel_id in self.active_connections:
-            living_connections = set()
-            for connection in self.active_connections[channel_id]:
-                try:
-                    await connection.send_text(message)
-                    living_connections.add(connection)
-                except WebSocketDisconnect:
-                    logger.info(f"WebSocket desconectado (durante broadcast) do canal: {channel_id}")
-                except Exception as e:
-                    logger.error(f"Erro ao enviar mensagem para WebSocket no canal {channel_id}: {e}")
-                    # Pode ser necessário remover a conexão aqui também se o erro for persistente
-            self.active_connections[channel_id] = living_connections
-            if not self.active_connections[channel_id]:
-                 del self.active_connections[channel_id]
-
-manager = ConnectionManager()
-
-# Canal para notificações da equipe (staff)
-STAFF_NOTIFICATION_CHANNEL = "staff_notifications"
-
-# Função para escutar o Redis e transmitir para WebSockets
-async def redis_listener_task(channel_pattern: str, target_manager_channel_prefix: str = ""):
-    pubsub = None
-    while True: # Loop para tentar reconectar em caso de falha
-        try:
-            pubsub = await redis_service_instance.subscribe_to_channel(channel_pattern)
-            if not pubsub:
-                logger.error(f"Não foi possível se inscrever no canal Redis {channel_pattern}. Tentando novamente em 10s.")
-                await asyncio.sleep(10)
-                continue
-            
-            logger.info(f"Escutando canal Redis: {channel_pattern} para transmitir via WebSocket")
-            while True:
-                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                if message and message["type"] == "message":
-                    logger.debug(f"Mensagem recebida do Redis no canal {message['channel']}: {message['data']}")
-                    try:
-                        # A mensagem do Redis já deve ser um JSON string de WebSocketMessage
-                        data_json = message["data"]
-                        # O canal de destino do WebSocket pode ser o mesmo do Redis ou um prefixado
-                        ws_channel_id = f"{target_manager_channel_prefix}{message['channel']}"
-                        await manager.broadcast_to_channel(data_json, ws_channel_id)
-                    except json.JSONDecodeError:
-                        logger.error(f"Erro ao decodificar JSON da mensagem do Redis: {message['data']}")
-                    except Exception as e:
-                        logger.error(f"Erro ao processar mensagem do Redis para WebSocket: {e}")
-                await asyncio.sleep(0.01) # Pequena pausa para não sobrecarregar
-        except redis.exceptions.ConnectionError as e:
-            logger.error(f"Conexão com Redis perdida no listener para {channel_pattern}: {e}. Tentando reconectar em 10s.")
-            if pubsub: # Tenta limpar o pubsub antigo
-                try: await pubsub.close()
-                except: pass
-            await asyncio.sleep(10)
-        except Exception as e:
-            logger.error(f"Erro inesperado no listener Redis para {channel_pattern}: {e}. Tentando reiniciar em 10s.")
-            if pubsub: 
-                try: await pubsub.close()
-                except: pass
-            await asyncio.sleep(10)
-
-# Iniciar a tarefa de escuta do Redis para notificações da equipe em background
-# Isso normalmente seria feito no startup da aplicação FastAPI
-# asyncio.create_task(redis_listener_task(STAFF_NOTIFICATION_CHANNEL, target_manager_channel_prefix=""))
-# asyncio.create_task(redis_listener_task("comanda_status:*", target_manager_channel_prefix="")) # Para status de comandas
+# As mensagens chegam aos sockets pelo hub compartilhado (app/core/notifications.py),
+# iniciado no lifespan da aplicação em app/main.py.
+
+@router.get("/stats", dependencies=[Depends(get_current_active_superuser)])
+async def websocket_stats() -> Dict[str, Any]:
+    """
+    Estatísticas do hub de WebSockets deste worker: conexões, profundidade das filas de saída
+    e quantidade de mensagens descartadas / conexões derrubadas por consumidores lentos.
+    """
+    return manager.stats()
+
+async def _autenticar_token(token: str) -> Optional[User]:
+    """Valida o JWT de acesso informado na conexão (navegadores não enviam Authorization em WebSockets)."""
+    token_data = decode_token(token)
+    if not token_data or not token_data.email:
+        return None
+    async with AsyncSessionFactory() as db:
+        user = await user_service.get_user_by_email(db, email=token_data.email)
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _parse_mesas(mesas: Optional[str]) -> List[str]:
+    return [mesa.strip() for mesa in (mesas or "").split(",") if mesa.strip()]
+
 
 @router.websocket("/staff/notifications")
-async def staff_notifications_ws(websocket: WebSocket):
-    await manager.connect(websocket, STAFF_NOTIFICATION_CHANNEL)
+async def staff_notifications_ws(
+    websocket: WebSocket,
+    last_event_id: Optional[str] = None,
+    token: Optional[str] = None,
+    papel: Optional[str] = None,
+    mesas: Optional[str] = None,
+    encoding: Optional[str] = None,
+    pong: bool = False,
+):
+    """
+    Canal de notificações da equipe.
+    - last_event_id: ao reconectar, o cliente recebe apenas os eventos que perdeu
+    - token: JWT de acesso; habilita mensagens direcionadas ao usuário (target_user_id)
+    - papel: função do dispositivo (garcom, cozinha, bar, caixa, gerente); sem papel, recebe tudo
+    - mesas: IDs das mesas atendidas, separados por vírgula, para chamadas de mesa
+    - encoding: "msgpack" para receber frames binários MessagePack (também via subprotocolo "msgpack")
+    - pong: true se o cliente responde ao ping do hub; então o silêncio por WS_HEARTBEAT_TIMEOUT_SECONDS derruba a conexão
+    """
+    user_id = None
+    if token:
+        user = await _autenticar_token(token)
+        if user is None:
+            logger.warning("Conexão WebSocket da equipe recusada: token inválido ou usuário inativo.")
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        user_id = str(user.id)
+    if papel is not None and papel not in STAFF_ROLES:
+        logger.warning(f"Conexão WebSocket da equipe recusada: papel desconhecido '{papel}'.")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await manager.connect(
+        websocket, STAFF_NOTIFICATION_CHANNEL, last_event_id=last_event_id,
+        user_id=user_id, role=papel, mesas=_parse_mesas(mesas), encoding=encoding, expects_pong=pong,
+    )
     # Envia uma mensagem de boas-vindas ou status inicial se necessário
     welcome_message = WebSocketMessage(type="info", payload={"message": "Conectado ao canal de notificações da equipe."})
     await manager.send_personal_message(welcome_message.model_dump_json(), websocket)
     try:
-        while True:
-            # Apenas mantém a conexão aberta para receber broadcasts do Redis via manager
-            # Poderia receber mensagens do staff também, se necessário (ex: confirmação de leitura)
-            data = await websocket.receive_text() # Bloqueia até receber algo ou desconectar
-            logger.debug(f"Mensagem recebida no WebSocket da equipe (não esperado): {data}")
+        # Mantém a conexão aberta respondendo ao heartbeat; os broadcasts chegam pelo hub
+        await manager.receive_until_disconnect(websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket, STAFF_NOTIFICATION_CHANNEL)
     except Exception as e:
         logger.error(f"Erro no WebSocket da equipe: {e}")
         manager.disconnect(websocket, STAFF_NOTIFICATION_CHANNEL)
 
+@router.websocket("/cozinha/{estacao}")
+async def cozinha_fila_ws(
+    websocket: WebSocket,
+    estacao: str,
+    token: Optional[str] = None,
+    last_event_id: Optional[str] = None,
+    encoding: Optional[str] = None,
+    pong: bool = False,
+):
+    """
+    Tela de preparo de uma estação (cozinha, bar).
+    Ao conectar recebe a fila completa (snapshot) e depois apenas deltas versionados. Se um delta
+    chegar com versão diferente da esperada, a tela envia {"action": "snapshot"} e recebe a fila de novo.
+    Com last_event_id, recebe só os deltas perdidos desde então.
+    """
+    user = await _autenticar_token(token) if token else None
+    if user is None or estacao not in ESTACOES:
+        logger.warning(f"Conexão WebSocket da estação '{estacao}' recusada: token inválido ou estação desconhecida.")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    channel_id = cozinha_channel(estacao)
+
+    async def enviar_snapshot():
+        snapshot = await fila_cozinha_service.snapshot(estacao)
+        await manager.send_personal_message(
+            WebSocketMessage(type="status_update", payload=snapshot).model_dump_json(), websocket
+        )
+
+    async def on_message(data: str):
+        try:
+            frame = json.loads(data)
+        except ValueError:
+            return
+        if isinstance(frame, dict) and frame.get("action") == "snapshot":
+            await enviar_snapshot()
+
+    # Registro, snapshot inicial e leitura sob o mesmo finally: uma falha no Redis ou uma
+    # desconexão durante o snapshot não deixa a conexão (e sua tarefa escritora) presa no hub
+    try:
+        await manager.connect(
+            websocket, channel_id, last_event_id=last_event_id, user_id=str(user.id), role=estacao,
+            encoding=encoding, expects_pong=pong,
+        )
+        if not last_event_id:
+            await enviar_snapshot()
+        await manager.receive_until_disconnect(websocket, on_message=on_message)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Erro no WebSocket da estação {estacao}: {e}")
+    finally:
+        manager.disconnect(websocket, channel_id)
+
+# Canais que um socket multiplexado da equipe pode assinar: "comanda:<id>", "comanda_diff:<id>",
+# "mesa:<id>", "pedido:<id>" ou "staff"
+_CANAIS_ASSINAVEIS = {
+    "comanda": comanda_status_channel,
+    "comanda_diff": comanda_diff_channel,
+    "mesa": mesa_status_channel,
+    "pedido": pedido_status_channel,
+}
+
+
+def _resolver_canal(nome: str) -> Optional[str]:
+    if nome == "staff":
+        return STAFF_NOTIFICATION_CHANNEL
+    tipo, _, identificador = nome.partition(":")
+    construtor = _CANAIS_ASSINAVEIS.get(tipo)
+    if construtor is None or not identificador.isdigit():
+        return None
+    return construtor(int(identificador))
+
+
+@router.websocket("/staff/stream")
+async def staff_multiplex_ws(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    papel: Optional[str] = None,
+    mesas: Optional[str] = None,
+    encoding: Optional[str] = None,
+    pong: bool = False,
+):
+    """
+    Socket único e autenticado da equipe, com várias assinaturas.
+    Em vez de um socket por comanda, o cliente envia frames
+    {"action": "subscribe" | "unsubscribe", "channels": ["comanda:12", "mesa:3", "pedido:45", "staff"],
+     "last_event_ids": {"comanda:12": "<event_id>"}} e recebe as mensagens com o campo `channel`.
+    Não há consulta ao banco por assinatura: o acesso é garantido pela autenticação da equipe.
+    """
+    user = await _autenticar_token(token) if token else None
+    if user is None:
+        logger.warning("Conexão WebSocket multiplexada recusada: token ausente, inválido ou usuário inativo.")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if papel is not None and papel not in STAFF_ROLES:
+        logger.warning(f"Conexão WebSocket multiplexada recusada: papel desconhecido '{papel}'.")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    # Canal pessoal do usuário: mantém a conexão registrada mesmo sem outras assinaturas
+    base_channel = user_channel(str(user.id))
+    await manager.connect(
+        websocket, base_channel, user_id=str(user.id), role=papel, mesas=_parse_mesas(mesas), encoding=encoding,
+        expects_pong=pong,
+    )
+
+    async def responder(message_type: str, payload: Dict[str, Any]):
+        await manager.send_personal_message(WebSocketMessage(type=message_type, payload=payload).model_dump_json(), websocket)
+
+    async def processar_frame(data: str):
+        try:
+            frame = json.loads(data)
+        except ValueError:
+            await responder("error", {"message": "Frame inválido: JSON esperado."})
+            return
+        if not isinstance(frame, dict):
+            await responder("error", {"message": "Frame inválido: objeto JSON esperado."})
+            return
+        action = frame.get("action")
+        canais = frame.get("channels")
+        if action not in ("subscribe", "unsubscribe") or not isinstance(canais, list):
+            await responder("error", {"message": "Use {\"action\": \"subscribe\"|\"unsubscribe\", \"channels\": [...]}."})
+            return
+        last_event_ids = frame.get("last_event_ids") or {}
+
+        aceitos, recusados = [], []
+        for nome in canais:
+            nome = str(nome)
+            channel_id = _resolver_canal(nome)
+            if channel_id is None:
+                recusados.append(nome)
+                continue
+            if action == "unsubscribe":
+                manager.unsubscribe(websocket, channel_id)
+                aceitos.append(nome)
+                continue
+
+            atuais = manager.channels_of(websocket)
+            if channel_id not in atuais and len(atuais) - 1 >= settings.WS_MAX_SUBSCRIPTIONS_PER_CONNECTION:
+                recusados.append(nome)
+                continue
+            manager.subscribe(websocket, channel_id)
+            aceitos.append(nome)
+            if isinstance(last_event_ids, dict) and last_event_ids.get(nome):
+                await manager.replay(websocket, channel_id, str(last_event_ids[nome]))
+
+        evento = "subscribed" if action == "subscribe" else "unsubscribed"
+        await responder("info", {"event": evento, "channels": aceitos, "rejected": recusados})
+
+    try:
+        await manager.receive_until_disconnect(websocket, on_message=processar_frame)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Erro no WebSocket multiplexado da equipe (usuário {user.id}): {e}")
+    finally:
+        for channel_id in manager.channels_of(websocket):
+            manager.disconnect(websocket, channel_id)
+
+
+async def _carregar_snapshot(comanda_identificador: str) -> Optional[ComandaSnapshotPayload]:
+    """
+    Localiza a comanda e retorna seu resumo atual (do cache), ou None se ela não existir.
+    comanda_identificador pode ser o ID numérico ou o qr_code_comanda_hash.
+    """
+    # Sessão curta: não mantém uma conexão do pool aberta durante toda a vida do socket
+    async with AsyncSessionFactory() as db:
+        if comanda_identificador.isdigit():
+            comanda_id = int(comanda_identificador)
+        else:
+            comanda = await comanda_service.get_comanda_by_qr_hash(db, comanda_identificador)
+            if not comanda:
+                return None
+            comanda_id = comanda.id
+        return await comanda_service.get_formatted_comanda_status_for_ws(db, comanda_id)
+
+
+def _snapshot_message(snapshot: ComandaSnapshotPayload) -> str:
+    return WebSocketMessage(type="status_update", payload=snapshot, comanda_id=snapshot.comanda_id).model_dump_json()
+
+
+def _canal_da_comanda(comanda_id: int, modo: Optional[str]) -> str:
+    # modo=diff: o cliente recebe patches JSON versionados do resumo em vez dos eventos de status
+    if modo == "diff":
+        return comanda_diff_channel(comanda_id)
+    return comanda_status_channel(comanda_id)
+
+
 @router.websocket("/comanda/{comanda_identificador}/status")
-async def comanda_status_ws(websocket: WebSocket, comanda_identificador: str, db: AsyncSession = Depends(get_db_session)):
-    # comanda_identificador pode ser o ID numérico ou o qr_code_comanda_hash
-    # Precisa validar e obter o ID canônico da comanda para usar como channel_id
-    comanda = None
-    if comanda_identificador.isdigit():
-        comanda = await comanda_service.get_comanda_by_id(db, int(comanda_identificador))
-    else:
-        comanda = await comanda_service.get_comanda_by_qr_hash(db, comanda_identificador) # Supõe este método no service
-
-    if not comanda:
+async def comanda_status_ws(
+    websocket: WebSocket,
+    comanda_identificador: str,
+    last_event_id: Optional[str] = None,
+    modo: Optional[str] = None,
+    encoding: Optional[str] = None,
+    pong: bool = False,
+):
+    snapshot = await _carregar_snapshot(comanda_identificador)
+
+    if not snapshot:
         logger.warning(f"Tentativa de conexão WebSocket para comanda inválida/não encontrada: {comanda_identificador}")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    channel_id = f"comanda_status:{comanda.id}" # Usar ID da comanda como parte do canal
-    await manager.connect(websocket, channel_id)
-    
-    # Envia o status atual da comanda ao conectar
-    # (O service precisaria de um método para buscar o status formatado)
-    # current_status_payload = await comanda_service.get_formatted_comanda_status_for_ws(db, comanda.id)
-    # if current_status_payload:
-    #    initial_status_msg = WebSocketMessage(type="status_update", payload=current_status_payload)
-    #    await manager.send_personal_message(initial_status_msg.model_dump_json(), websocket)
-    # else:
-    initial_info_msg = WebSocketMessage(type="info", payload={"message": f"Conectado ao canal de status da comanda {comanda.id}."})
-    await manager.send_personal_message(initial_info_msg.model_dump_json(), websocket)
+    comanda_id = int(snapshot.comanda_id)
+    channel_id = _canal_da_comanda(comanda_id, modo) # Usar ID da comanda como parte do canal
+    # Socket público: encerrado após WS_COMANDA_IDLE_TIMEOUT_SECONDS sem atividade
+    await manager.connect(
+        websocket, channel_id, idle_timeout=settings.WS_COMANDA_IDLE_TIMEOUT_SECONDS,
+        last_event_id=last_event_id, encoding=encoding, expects_pong=pong,
+    )
+
+    if not last_event_id:
+        # Estado atual já na conexão: o cliente não precisa buscar a comanda completa via REST.
+        # Quem reconecta com last_event_id recebe apenas os eventos perdidos.
+        await manager.send_personal_message(_snapshot_message(snapshot), websocket)
+
+    async def on_message(data: str):
+        # Cliente em modo diff que perdeu a sequência de versões pede o resumo completo de novo
+        try:
+            frame = json.loads(data)
+        except ValueError:
+            return
+        if isinstance(frame, dict) and frame.get("action") == "snapshot":
+            atual = await _carregar_snapshot(str(comanda_id))
+            if atual:
+                await manager.send_personal_message(_snapshot_message(atual), websocket)
 
     try:
-        while True:
-            # Apenas mantém a conexão aberta para receber broadcasts do Redis via manager
-            data = await websocket.receive_text() # Bloqueia até receber algo ou desconectar
-            logger.debug(f"Mensagem recebida no WebSocket da comanda {comanda.id} (não esperado): {data}")
+        await manager.receive_until_disconnect(websocket, on_message=on_message)
     except WebSocketDisconnect:
         manager.disconnect(websocket, channel_id)
     except Exception as e:
-        logger.error(f"Erro no WebSocket da comanda {comanda.id}: {e}")
+        logger.error(f"Erro no WebSocket da comanda {comanda_id}: {e}")
         manager.disconnect(websocket, channel_id)
 
-# É crucial que as tarefas de escuta do Redis (redis_listener_task)
-# sejam iniciadas no evento de startup da aplicação FastAPI.
-# Exemplo em main.py:
-# from contextlib import asynccontextmanager
-# from app.api.v1.websocket_routes import redis_listener_task, STAFF_NOTIFICATION_CHANNEL
-#
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     # Startup
-#     asyncio.create_task(redis_listener_task(STAFF_NOTIFICATION_CHANNEL))
-#     asyncio.create_task(redis_listener_task("comanda_status:*")) # Para status de comandas
-#     logger.info("Tarefas de escuta do Redis iniciadas.")
-#     yield
-#     # Shutdown
-#     await redis_service_instance.close_redis_client()
-#     logger.info("Conexão com Redis fechada.")
-#
-# app = FastAPI(lifespan=lifespan, ...)
 
+@router.get("/comanda/{comanda_identificador}/events")
+async def comanda_status_sse(
+    comanda_identificador: str,
+    last_event_id: Optional[str] = None,
+    modo: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Versão Server-Sent Events de comanda_status_ws: canal somente de leitura, mais leve para
+    os celulares dos clientes. Recebe os mesmos eventos do canal da comanda pelo hub compartilhado.
+    O navegador reenvia o cabeçalho Last-Event-ID ao reconectar e recebe apenas o que perdeu.
+    """
+    snapshot = await _carregar_snapshot(comanda_identificador)
+    if not snapshot:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comanda não encontrada")
+
+    channel_id = _canal_da_comanda(int(snapshot.comanda_id), modo)
+    resume_from = last_event_id_header or last_event_id
+    subscriber = SSESubscriber()
+
+    async def event_stream():
+        # Registro dentro do gerador: se a resposta nunca começar, nada fica registrado no hub
+        try:
+            await manager.connect(
+                subscriber,
+                channel_id,
+                idle_timeout=settings.WS_COMANDA_IDLE_TIMEOUT_SECONDS,
+                last_event_id=resume_from,
+                expects_pong=False,
+            )
+            yield "retry: 5000\n\n"
+            if not resume_from:
+                yield format_sse_event(_snapshot_message(snapshot))
+            async for event in subscriber.events():
+                yield event
+        finally:
+            # Cliente desconectou (o Starlette cancela o gerador) ou o hub encerrou a assinatura
+            manager.disconnect(subscriber, channel_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,234 @@
+# app/core/captura_trafego.py
+"""
+Captura opcional do tráfego HTTP real, para ser reproduzido depois por scripts/replay_trafego.py.
+
+Ativada por TRAFFIC_CAPTURE_ENABLED. Cada requisição vira uma linha JSON compacta num arquivo
+gzip por worker (TRAFFIC_CAPTURE_DIR/trafego-<início>-<pid>.jsonl.gz):
+
+    {"t": 12.345, "m": "POST", "r": "/api/v1/pedidos/", "p": {...}, "q": {...}, "b": {...},
+     "a": 1, "s": 201, "d": 18.2}
+
+t é o instante em segundos desde o início da captura, r o template da rota (nunca a URL real),
+p/q/b a forma dos parâmetros de caminho, da query string e do corpo JSON, a indica se havia
+Authorization, s o status e d a duração em ms.
+
+Os registros são anonimizados:
+    - IDs (campos e parâmetros id_*/*_id, além de qr_code_hash) viram pseudônimos ordinais por
+      entidade, estáveis dentro da captura: "~r:comanda:3" é sempre a mesma comanda, mas nunca o
+      seu ID real;
+    - textos viram apenas o tamanho ("~s:11"), exceto valores de enums do domínio (status,
+      métodos de pagamento...) e datas, que não identificam ninguém;
+    - na query string e nos demais parâmetros de caminho, números (skip, limit...) e as opções
+      fixas da API (periodo, comparacao, estacao...) também são mantidos: sem eles o replay
+      receberia 422 em vez de repetir o trabalho real;
+    - números e booleanos são mantidos (quantidades e valores definem o custo da requisição);
+    - cabeçalhos, IPs e tokens nunca são gravados.
+"""
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, get_args
+from urllib.parse import parse_qsl
+
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config.settings import settings
+from app.models.comanda import StatusComanda
+from app.models.fiado import StatusFiado
+from app.models.item_pedido import StatusPedidoEnum
+from app.models.mesa import StatusMesa
+from app.models.pagamento import MetodoPagamento, StatusPagamento
+from app.models.pedido import StatusPedido, TipoPedido
+from app.schemas.cozinha_schemas import EstacaoPreparo
+from app.schemas.websocket_schemas import StaffRole
+
+# Textos que podem ser gravados como estão: valores (e nomes) dos enums do domínio
+_TEXTOS_PRESERVADOS = frozenset(
+    texto
+    for enum in (
+        StatusComanda, StatusFiado, StatusPedidoEnum, StatusMesa,
+        MetodoPagamento, StatusPagamento, StatusPedido, TipoPedido,
+    )
+    for membro in enum
+    for texto in (membro.name, str(membro.value))
+)
+_DATA = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+)?(Z|[+-]\d{2}:?\d{2})?$")
+_NUMERO = re.compile(r"^-?\d+(\.\d+)?$")
+
+# Opções fixas aceitas pela API em parâmetros de query/caminho: gravadas como estão
+_OPCOES_POR_PARAMETRO = {
+    "periodo": frozenset({"hoje", "semanal", "mensal", "anual"}),
+    "comparacao": frozenset({"semanal", "mensal_ano_anterior", "personalizado"}),
+    "modo": frozenset({"diff"}),
+    "encoding": frozenset({"json", "msgpack"}),
+    "papel": frozenset(get_args(StaffRole)),
+    "estacao": frozenset(get_args(EstacaoPreparo)),
+}
+
+# Campos cujo nome não leva direto à entidade referenciada
+_ENTIDADES_ALIAS = {
+    "cliente_associado": "cliente",
+    "usuario_registrou": "usuario",
+    "user": "usuario",
+    "target_user": "usuario",
+    "comanda_identificador": "comanda",
+}
+# Parâmetros que identificam uma entidade sem seguir o padrão id_*/*_id
+_CHAVES_DE_ENTIDADE = frozenset({"qr_code_hash"})
+
+MARCADOR_REFERENCIA = "~r:"
+MARCADOR_TEXTO = "~s:"
+MAX_ITENS_LISTA = 50
+
+
+def entidade_do_campo(campo: str) -> Optional[str]:
+    """'id_comanda' / 'comanda_id' -> 'comanda'. None para campos que não são referências."""
+    if campo.startswith("id_"):
+        nome = campo[3:]
+    elif campo.endswith("_id"):
+        nome = campo[:-3]
+    else:
+        return None
+    return _ENTIDADES_ALIAS.get(nome, nome)
+
+
+class GravadorTrafego:
+    """Anonimiza e grava os registros de um worker. O arquivo só é aberto no primeiro registro."""
+
+    def __init__(self, diretorio: str, max_corpo_bytes: int):
+        self.diretorio = Path(diretorio)
+        self.max_corpo_bytes = max_corpo_bytes
+        self._arquivo = None
+        self._inicio = 0.0
+        self._pseudonimos: Dict[str, Dict[str, int]] = {}
+
+    def _abrir(self):
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        agora = datetime.now(timezone.utc)
+        caminho = self.diretorio / f"trafego-{agora.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl.gz"
+        self._arquivo = gzip.open(caminho, "at", encoding="utf-8", compresslevel=6)
+        self._inicio = time.monotonic()
+        # Cabeçalho: permite intercalar os arquivos de vários workers pela hora de início
+        self._arquivo.write(json.dumps({"v": 1, "inicio": agora.timestamp(), "pid": os.getpid()}) + "\n")
+        logger.info(f"Captura de tráfego ativa: gravando em {caminho}")
+
+    def _referencia(self, entidade: str, valor: Any) -> str:
+        pseudonimos = self._pseudonimos.setdefault(entidade, {})
+        # str(): o mesmo ID chega como texto no caminho e como número no corpo
+        ordinal = pseudonimos.setdefault(str(valor), len(pseudonimos))
+        return f"{MARCADOR_REFERENCIA}{entidade}:{ordinal}"
+
+    def _texto(self, texto: str) -> str:
+        if texto in _TEXTOS_PRESERVADOS or _DATA.match(texto):
+            return texto
+        return f"{MARCADOR_TEXTO}{len(texto)}"
+
+    def parametro(self, nome: str, valor: str) -> str:
+        """Forma anonimizada de um parâmetro de caminho ou da query string (sempre texto na URL)."""
+        entidade = entidade_do_campo(nome) or _ENTIDADES_ALIAS.get(nome)
+        if entidade is None and nome in _CHAVES_DE_ENTIDADE:
+            entidade = nome
+        if entidade is not None:
+            return self._referencia(entidade, valor)
+        if _NUMERO.match(valor) or valor in _OPCOES_POR_PARAMETRO.get(nome, ()):
+            return valor
+        return self._texto(valor)
+
+    def forma(self, valor: Any, campo: Optional[str] = None) -> Any:
+        """Forma anonimizada de um valor JSON (ver docstring do módulo)."""
+        entidade = entidade_do_campo(campo) if campo else None
+        if isinstance(valor, dict):
+            return {chave: self.forma(item, chave) for chave, item in valor.items()}
+        if isinstance(valor, list):
+            return [self.forma(item, campo) for item in valor[:MAX_ITENS_LISTA]]
+        if entidade is not None and valor is not None and not isinstance(valor, bool):
+            return self._referencia(entidade, valor)
+        if isinstance(valor, str):
+            return self._texto(valor)
+        return valor
+
+    def registrar(self, scope: Scope, corpo: bytes, status_code: int, duracao_ms: float):
+        if self._arquivo is None:
+            self._abrir()
+        rota = scope.get("route")
+        registro: Dict[str, Any] = {
+            "t": round(time.monotonic() - self._inicio, 4),
+            "m": scope["method"],
+            "r": getattr(rota, "path", None),
+        }
+        parametros = scope.get("path_params") or {}
+        if parametros:
+            registro["p"] = {nome: self.parametro(nome, str(valor)) for nome, valor in parametros.items()}
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        if query:
+            registro["q"] = {nome: self.parametro(nome, valor) for nome, valor in query}
+        if corpo:
+            try:
+                registro["b"] = self.forma(json.loads(corpo))
+            except ValueError:
+                registro["b"] = f"{MARCADOR_TEXTO}{len(corpo)}"
+        if any(nome == b"authorization" for nome, _ in scope.get("headers", ())):
+            registro["a"] = 1
+        registro["s"] = status_code
+        registro["d"] = round(duracao_ms, 2)
+        self._arquivo.write(json.dumps(registro, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class CapturaTrafegoMiddleware:
+    """
+    Middleware ASGI puro: observa o corpo à medida que a aplicação o lê (sem consumi-lo
+    antes dela) e o status da resposta, e grava o registro quando a requisição termina.
+    """
+
+    def __init__(self, app: ASGIApp, gravador: GravadorTrafego):
+        self.app = app
+        self.gravador = gravador
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        corpo = bytearray()
+        status_code = 500
+        limite = self.gravador.max_corpo_bytes
+
+        async def receive_observando() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and len(corpo) <= limite:
+                corpo.extend(message.get("body", b""))
+            return message
+
+        async def send_observando(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_observando, send_observando)
+        finally:
+            try:
+                self.gravador.registrar(
+                    scope,
+                    bytes(corpo) if len(corpo) <= limite else b"",
+                    status_code,
+                    (time.perf_counter() - inicio) * 1000,
+                )
+            except Exception as e:
+                # A captura nunca pode derrubar a requisição
+                logger.warning(f"Falha ao gravar o registro de tráfego: {e}")
+
+
+gravador_trafego = GravadorTrafego(settings.TRAFFIC_CAPTURE_DIR, settings.TRAFFIC_CAPTURE_MAX_BODY_BYTES)
@@ -30,6 +30,40 @@ class AppSettings(BaseAppSettings):
 
     # Redis
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 50  # Tamanho máximo do pool compartilhado pela aplicação
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30  # Conexões ociosas há mais tempo que isso recebem PING antes do uso
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5.0
+
+    # WebSockets (hub de conexões compartilhado entre workers via Redis pub/sub)
+    WS_REDIS_CHANNEL_PREFIX: str = "ws:"
+    WS_REDIS_RECONNECT_MIN_BACKOFF_SECONDS: float = 1.0
+    WS_REDIS_RECONNECT_MAX_BACKOFF_SECONDS: float = 30.0
+    WS_SEND_QUEUE_MAX_SIZE: int = 256  # Limite da fila de saída de cada conexão
+    WS_SEND_QUEUE_HIGH_WATER: int = 64  # Acima disso a conexão é considerada lenta
+    WS_SLOW_CONSUMER_GRACE_SECONDS: float = 5.0  # Tempo tolerado acima do high-water antes de derrubar
+    WS_COALESCE_WINDOW_MS: int = 50  # Janela para agrupar atualizações de status por canal (0 desativa)
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = 25.0  # Intervalo entre pings e varreduras de conexões mortas
+    WS_HEARTBEAT_TIMEOUT_SECONDS: float = 60.0  # Clientes que declararam ?pong=true e ficam mudos por esse tempo são derrubados
+    WS_COMANDA_IDLE_TIMEOUT_SECONDS: float = 1800.0  # Sockets públicos de comanda sem atividade são encerrados
+    WS_STREAM_KEY_PREFIX: str = "ws:stream:"  # Redis Streams com o histórico recente de cada canal
+    WS_STREAM_MAXLEN: int = 1000  # Tamanho aproximado máximo de cada stream (XADD MAXLEN ~)
+    WS_STREAM_REPLAY_MAX: int = 500  # Máximo de eventos reenviados a um cliente que reconecta
+    WS_COMANDA_SNAPSHOT_CACHE_TTL_SECONDS: int = 30  # Validade do resumo de comanda enviado na conexão
+    WS_MAX_SUBSCRIPTIONS_PER_CONNECTION: int = 200  # Limite de canais assinados por um socket multiplexado
+
+    # Captura de tráfego (reproduzida por scripts/replay_trafego.py)
+    TRAFFIC_CAPTURE_ENABLED: bool = False  # Grava traços anonimizados de todas as requisições HTTP
+    TRAFFIC_CAPTURE_DIR: str = "logs/trafego"  # Um arquivo .jsonl.gz por worker
+    TRAFFIC_CAPTURE_MAX_BODY_BYTES: int = 65536  # Corpos maiores são registrados sem a forma
+
+    # Idempotency-Key nas criações (POST /pedidos e /pagamentos)
+    IDEMPOTENCY_KEY_PREFIX: str = "idem:"
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # Por quanto tempo a resposta gravada é reenviada às repetições
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 60  # Reserva da chave; renovada a cada TTL/3 enquanto a primeira tentativa roda
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = 30.0  # Espera máxima de uma repetição concorrente (depois, 409)
+
+    # Fila das telas de preparo (cozinha / bar)
+    KDS_KEY_PREFIX: str = "kds:"
 
     # JWT
     SECRET_KEY: str
@@ -0,0 +1,230 @@
+# app/core/idempotencia.py
+"""
+Idempotência das criações via cabeçalho Idempotency-Key.
+
+Os tablets dos garçons repetem POST /pedidos e POST /pagamentos quando a resposta demora; sem
+isso cada repetição gera outro pedido ou pagamento. Para as rotas configuradas, a primeira
+requisição com uma chave "reserva" a chave no Redis (SET NX) e, ao terminar, grava a resposta
+com TTL. Depois disso:
+    - repetições com a mesma chave e o mesmo corpo recebem a resposta gravada
+      (com o cabeçalho Idempotent-Replayed: true), sem tocar no banco;
+    - repetições que chegam enquanto a primeira ainda roda esperam por ela;
+    - a mesma chave com outro corpo é rejeitada com 422.
+Respostas 5xx (ou exceções) liberam a chave, para que a próxima tentativa execute de novo.
+Enquanto a primeira tentativa roda, a reserva é renovada periodicamente; assim ela não expira
+no meio de uma requisição lenta (o que deixaria uma repetição executar em paralelo).
+
+As chaves são separadas por rota e por credencial (hash do Authorization). Sem Redis, a
+requisição segue normalmente, sem proteção.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config.settings import settings
+from app.services.redis_service import redis_service_instance
+
+CABECALHO_CHAVE = b"idempotency-key"
+ESTADO_EM_ANDAMENTO = "em_andamento"
+ESTADO_CONCLUIDA = "concluida"
+# Não fazem sentido numa resposta repetida (ou são recalculados no envio)
+_CABECALHOS_DESCARTADOS = frozenset({b"content-length", b"date", b"server", b"set-cookie"})
+_INTERVALO_ESPERA_SEGUNDOS = 0.05
+
+# Renova o TTL da reserva apenas se ela ainda for desta tentativa
+RENOVAR_RESERVA_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _cabecalho(scope: Scope, nome: bytes) -> Optional[bytes]:
+    for chave, valor in scope.get("headers", ()):
+        if chave == nome:
+            return valor
+    return None
+
+
+async def _responder(send: Send, status_code: int, headers: List[Tuple[bytes, bytes]], corpo: bytes):
+    headers = headers + [(b"content-length", str(len(corpo)).encode("latin-1"))]
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def _responder_erro(send: Send, status_code: int, detalhe: str):
+    corpo = json.dumps({"detail": detalhe}, ensure_ascii=False).encode("utf-8")
+    await _responder(send, status_code, [(b"content-type", b"application/json")], corpo)
+
+
+class IdempotenciaMiddleware:
+    """Middleware ASGI aplicado só às rotas (método, caminho) informadas."""
+
+    def __init__(self, app: ASGIApp, rotas: Iterable[Tuple[str, str]]):
+        self.app = app
+        self.rotas = {(metodo.upper(), caminho.rstrip("/")) for metodo, caminho in rotas}
+        # Requisições em andamento neste worker: duplicatas locais esperam sem consultar o Redis
+        self._em_andamento: Dict[str, asyncio.Event] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or (scope["method"], scope["path"].rstrip("/")) not in self.rotas:
+            await self.app(scope, receive, send)
+            return
+        chave_cliente = _cabecalho(scope, CABECALHO_CHAVE)
+        if not chave_cliente:
+            await self.app(scope, receive, send)
+            return
+
+        corpo = await self._ler_corpo(receive)
+        credencial = hashlib.sha256(_cabecalho(scope, b"authorization") or b"").hexdigest()[:16]
+        # Caminho exato: o redirect de /pedidos para /pedidos/ não pode ser repetido para a própria URL final
+        chave = (
+            f"{settings.IDEMPOTENCY_KEY_PREFIX}{scope['method']}:{scope['path']}:"
+            f"{credencial}:{chave_cliente.decode('latin-1')}"
+        )
+        impressao = hashlib.sha256(corpo).hexdigest()
+
+        executou = False
+        try:
+            client = await redis_service_instance.get_redis_client()
+            loop = asyncio.get_running_loop()
+            prazo = loop.time() + settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS
+            while True:
+                reserva = json.dumps(
+                    {"estado": ESTADO_EM_ANDAMENTO, "impressao": impressao, "token": uuid.uuid4().hex}
+                )
+                if await client.set(chave, reserva, nx=True, ex=settings.IDEMPOTENCY_LOCK_TTL_SECONDS):
+                    executou = True
+                    await self._executar(scope, corpo, receive, send, client, chave, impressao, reserva)
+                    return
+
+                bruto = await client.get(chave)
+                if bruto is None:
+                    continue  # A tentativa anterior falhou e liberou a chave: esta assume
+                registro = json.loads(bruto)
+                if registro["impressao"] != impressao:
+                    await _responder_erro(
+                        send, 422, "Idempotency-Key já usada em uma requisição com outro conteúdo."
+                    )
+                    return
+                if registro["estado"] == ESTADO_CONCLUIDA:
+                    headers = [
+                        (nome.encode("latin-1"), valor.encode("latin-1")) for nome, valor in registro["headers"]
+                    ]
+                    headers.append((b"idempotent-replayed", b"true"))
+                    await _responder(send, registro["status"], headers, base64.b64decode(registro["corpo"]))
+                    return
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    await _responder_erro(
+                        send, 409, "Uma requisição com esta Idempotency-Key ainda está em processamento."
+                    )
+                    return
+                await self._aguardar(chave, restante)
+        except (RedisError, OSError) as e:
+            if executou:
+                raise
+            logger.warning(f"Redis indisponível; {scope['path']} segue sem idempotência: {e}")
+            await self.app(scope, self._receive_com(corpo, receive), send)
+
+    async def _aguardar(self, chave: str, restante: float):
+        """Espera a tentativa em andamento terminar, sem passar do que resta do prazo da repetição."""
+        evento = self._em_andamento.get(chave)
+        if evento is None:
+            # A primeira tentativa roda em outro worker
+            await asyncio.sleep(min(_INTERVALO_ESPERA_SEGUNDOS, restante))
+            return
+        try:
+            await asyncio.wait_for(evento.wait(), timeout=restante)
+        except asyncio.TimeoutError:
+            pass
+
+    @staticmethod
+    async def _renovar_reserva(client, chave: str, reserva: str):
+        """Mantém a reserva viva enquanto a primeira tentativa roda (renova a cada terço do TTL)."""
+        ttl = settings.IDEMPOTENCY_LOCK_TTL_SECONDS
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                if not await client.eval(RENOVAR_RESERVA_SCRIPT, 1, chave, reserva, ttl):
+                    return  # A reserva não é mais desta tentativa
+            except (RedisError, OSError) as e:
+                logger.warning(f"Falha ao renovar a reserva da Idempotency-Key {chave}: {e}")
+
+    async def _executar(
+            self, scope: Scope, corpo: bytes, receive: Receive, send: Send, client, chave: str, impressao: str,
+            reserva: str,
+    ):
+        evento = self._em_andamento[chave] = asyncio.Event()
+        renovacao = asyncio.create_task(self._renovar_reserva(client, chave, reserva))
+        resposta = {"status": 500, "headers": [], "corpo": bytearray()}
+
+        async def send_gravando(message: Message):
+            if message["type"] == "http.response.start":
+                resposta["status"] = message["status"]
+                resposta["headers"] = [
+                    (nome.decode("latin-1"), valor.decode("latin-1"))
+                    for nome, valor in message.get("headers", ())
+                    if nome.lower() not in _CABECALHOS_DESCARTADOS
+                ]
+            elif message["type"] == "http.response.body":
+                resposta["corpo"].extend(message.get("body", b""))
+            await send(message)
+
+        concluida = False
+        try:
+            await self.app(scope, self._receive_com(corpo, receive), send_gravando)
+            concluida = resposta["status"] < 500
+        finally:
+            renovacao.cancel()
+            try:
+                if concluida:
+                    registro = {
+                        "estado": ESTADO_CONCLUIDA,
+                        "impressao": impressao,
+                        "status": resposta["status"],
+                        "headers": resposta["headers"],
+                        "corpo": base64.b64encode(bytes(resposta["corpo"])).decode("ascii"),
+                    }
+                    await client.set(chave, json.dumps(registro), ex=settings.IDEMPOTENCY_TTL_SECONDS)
+                else:
+                    await client.delete(chave)
+            except Exception as e:
+                logger.warning(f"Falha ao gravar o resultado da Idempotency-Key {chave}: {e}")
+            finally:
+                self._em_andamento.pop(chave, None)
+                evento.set()
+
+    @staticmethod
+    async def _ler_corpo(receive: Receive) -> bytes:
+        corpo = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            corpo.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return bytes(corpo)
+
+    @staticmethod
+    def _receive_com(corpo: bytes, receive: Receive) -> Receive:
+        """Entrega à aplicação o corpo já lido e, depois dele, as mensagens seguintes (ex.: disconnect)."""
+        entregue = False
+
+        async def receive_repetindo() -> Message:
+            nonlocal entregue
+            if not entregue:
+                entregue = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            return await receive()
+
+        return receive_repetindo
@@ -1,20 +1,860 @@
 # app/core/notifications.py
-from fastapi import WebSocket
-from typing import List
+import asyncio
+import json
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union, get_args
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from loguru import logger
+
+from app.core.config.settings import settings
+from app.schemas.websocket_schemas import StaffRole, StatusBatchPayload, WebSocketMessage
+from app.services.redis_service import parse_stream_id, redis_service_instance
+
+try:
+    import msgpack
+except ImportError:  # Dependência opcional: sem ela, todos os clientes recebem JSON
+    msgpack = None
+
+# Canal padrão para conexões que não informam um canal específico
+DEFAULT_CHANNEL = "notificacoes"
+
+# Canal para notificações da equipe (staff)
+STAFF_NOTIFICATION_CHANNEL = "staff_notifications"
+
+
+def comanda_status_channel(comanda_id: int) -> str:
+    return f"comanda_status:{comanda_id}"
+
+
+def comanda_diff_channel(comanda_id: int) -> str:
+    # Alterações da comanda como JSON Patch versionado (modo diff)
+    return f"comanda_diff:{comanda_id}"
+
+
+def mesa_status_channel(mesa_id: int) -> str:
+    return f"mesa_status:{mesa_id}"
+
+
+def pedido_status_channel(pedido_id: int) -> str:
+    return f"pedido_status:{pedido_id}"
+
+
+def cozinha_channel(estacao: str) -> str:
+    # Fila da tela de preparo de uma estação (snapshot e deltas versionados)
+    return f"cozinha:{estacao}"
+
+
+def user_channel(user_id: str) -> str:
+    return f"usuario:{user_id}"
+
+
+def status_channels(comanda_id: int, pedido_id: Optional[int] = None, mesa_id: Optional[int] = None) -> List[str]:
+    """Canais que recebem uma atualização de status: equipe, comanda e, se houver, pedido e mesa."""
+    channels = [STAFF_NOTIFICATION_CHANNEL, comanda_status_channel(comanda_id)]
+    if pedido_id is not None:
+        channels.append(pedido_status_channel(pedido_id))
+    if mesa_id is not None:
+        channels.append(mesa_status_channel(mesa_id))
+    return channels
+
+
+STAFF_ROLES = frozenset(get_args(StaffRole))
+# Funções que recebem todas as mensagens direcionadas a funções específicas
+SUPERVISOR_ROLES = frozenset({"gerente"})
+# Chave do índice por mesa para conexões que atendem todas as mesas
+ALL_MESAS = "*"
+
+# Mensagem de heartbeat enviada pelo hub a todas as conexões
+PING_MESSAGE = WebSocketMessage(type="info", payload={"event": "ping"}).model_dump_json()
+
+# Encodings de saída negociados na conexão (?encoding=msgpack ou subprotocolo "msgpack")
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# Frame pronto para envio: texto JSON ou bytes MessagePack
+Frame = Union[str, bytes]
+
+
+def negotiate_encoding(websocket: WebSocket, requested: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Define o encoding da conexão a partir do parâmetro de query ou do subprotocolo pedido pelo cliente.
+    Retorna (encoding, subprotocolo a confirmar no accept). Sem o pacote msgpack, cai para JSON.
+    """
+    subprotocols = (getattr(websocket, "scope", None) or {}).get("subprotocols") or []
+    if requested != ENCODING_MSGPACK and MSGPACK_SUBPROTOCOL not in subprotocols:
+        return ENCODING_JSON, None
+    if msgpack is None:
+        logger.warning("Cliente pediu MessagePack, mas o pacote msgpack não está instalado; usando JSON.")
+        return ENCODING_JSON, None
+    return ENCODING_MSGPACK, MSGPACK_SUBPROTOCOL if MSGPACK_SUBPROTOCOL in subprotocols else None
+
+
+def encode_frame(message: str, encoding: str) -> Frame:
+    """Converte uma mensagem JSON para o encoding da conexão."""
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(json.loads(message), use_bin_type=True)
+    return message
+
+
+@lru_cache(maxsize=256)
+def format_sse_event(data: str) -> str:
+    """
+    Converte uma mensagem serializada em um evento Server-Sent Events (id, event, data).
+    Em cache: a mesma mensagem é formatada uma única vez para todos os assinantes SSE do processo.
+    """
+    if data == PING_MESSAGE:
+        return ": ping\n\n"
+    try:
+        parsed = json.loads(data)
+    except ValueError:
+        parsed = {}
+    linhas = []
+    if parsed.get("event_id"):
+        linhas.append(f"id: {parsed['event_id']}")
+    if parsed.get("type"):
+        linhas.append(f"event: {parsed['type']}")
+    linhas.append(f"data: {data}")
+    return "\n".join(linhas) + "\n\n"
+
+
+class SSESubscriber:
+    """
+    Adapta um stream Server-Sent Events à interface de socket usada pelo hub
+    (accept / send_text / close), para que SSE e WebSocket compartilhem canais, filas e replay.
+    """
+
+    def __init__(self):
+        # Fila mínima: a contrapressão fica na fila da ClientConnection, sujeita ao high-water mark
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def accept(self, subprotocol: Optional[str] = None):
+        pass
+
+    async def send_text(self, data: str):
+        await self.queue.put(data)
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def events(self):
+        """Gera os eventos SSE até o hub encerrar a assinatura."""
+        while True:
+            data = await self.queue.get()
+            if data is None:
+                return
+            yield format_sse_event(data)
+
+
+class ClientConnection:
+    """Um socket com sua própria fila de saída limitada e uma tarefa escritora dedicada."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        idle_timeout: Optional[float] = None,
+        expects_pong: bool = False,
+        user_id: Optional[str] = None,
+        role: Optional[str] = None,
+        mesas: Optional[Iterable[str]] = None,
+        encoding: str = ENCODING_JSON,
+    ):
+        self.websocket = websocket
+        self.channels: Set[str] = set()
+        self.encoding = encoding
+        # Identidade usada no roteamento: usuário autenticado, função do dispositivo e mesas atendidas
+        self.user_id = user_id
+        self.role = role
+        self.mesas: Set[str] = set(mesas or ())
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_MAX_SIZE)
+        self.dropped_messages = 0
+        self.over_high_water_since: Optional[float] = None
+        self.writer_task: Optional[asyncio.Task] = None
+        # Heartbeat: último frame recebido do cliente e última atividade real (sem contar ping/pong)
+        self.idle_timeout = idle_timeout
+        self.expects_pong = expects_pong  # Só clientes que se declararam capazes de responder ao ping
+        self.last_received = time.monotonic()
+        self.last_activity = self.last_received
+        # Durante a reexecução do histórico, mensagens ao vivo ficam retidas aqui: [(event_id, mensagem)]
+        self.holding: Optional[List[Tuple[Optional[str], str]]] = None
+
+    def mark_received(self, activity: bool = True):
+        self.last_received = time.monotonic()
+        if activity:
+            self.last_activity = self.last_received
+
+    def enqueue(self, message: Frame, activity: bool = True) -> bool:
+        """
+        Enfileira sem bloquear quem está fazendo o broadcast.
+        Retorna False quando a conexão deve ser derrubada: fila cheia, ou acima do
+        high-water mark por mais tempo que WS_SLOW_CONSUMER_GRACE_SECONDS.
+        """
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped_messages += 1
+            return False
+
+        if activity:
+            self.last_activity = time.monotonic()
+
+        if self.queue.qsize() < settings.WS_SEND_QUEUE_HIGH_WATER:
+            self.over_high_water_since = None
+            return True
+        agora = time.monotonic()
+        if self.over_high_water_since is None:
+            self.over_high_water_since = agora
+        return agora - self.over_high_water_since <= settings.WS_SLOW_CONSUMER_GRACE_SECONDS
+
+    async def write_loop(self):
+        while True:
+            message = await self.queue.get()
+            if isinstance(message, bytes):
+                await self.websocket.send_bytes(message)
+            else:
+                await self.websocket.send_text(message)
+
 
 class ConnectionManager:
+    """
+    Hub único de conexões WebSocket do processo.
+
+    Cada worker mantém apenas os sockets conectados a ele. As mensagens são publicadas no Redis
+    (canal prefixado com WS_REDIS_CHANNEL_PREFIX) e um único listener por processo, via psubscribe,
+    recebe tudo e entrega aos sockets locais do canal correspondente. Assim, vários workers e nós
+    se comportam como um só.
+
+    O envio é concorrente: cada conexão tem uma fila de saída e uma tarefa escritora, então um
+    cliente lento não atrasa os demais. Conexões que ficam acima do high-water mark são derrubadas.
+
+    Atualizações de status publicadas com publish_coalesced() ficam retidas por WS_COALESCE_WINDOW_MS
+    e saem como uma única mensagem "status_batch" por canal, com apenas o último estado de cada entidade.
+
+    Heartbeat: a cada WS_HEARTBEAT_INTERVAL_SECONDS o hub envia {"type": "info", "payload": {"event": "ping"}}
+    e varre as conexões, removendo as ociosas além do idle_timeout da conexão. Responder ao ping é
+    opcional: só conexões abertas com expects_pong (o cliente se declara com ?pong=true) precisam
+    responder "pong" (ou {"type": "pong"}) e são removidas se ficarem mudas por WS_HEARTBEAT_TIMEOUT_SECONDS;
+    qualquer frame recebido conta como sinal de vida. As demais dependem do ping do protocolo
+    WebSocket feito pelo servidor (uvicorn --ws-ping-interval/--ws-ping-timeout) e da falha de envio
+    do próprio ping do hub para serem detectadas quando morrem.
+
+    Durabilidade: cada mensagem publicada também é gravada em um Redis Stream limitado por canal.
+    As mensagens entregues carregam event_id; um cliente que reconecta informa last_event_id e
+    recebe apenas o que perdeu (ou um aviso "replay_incompleto" se o histórico já foi descartado).
+
+    Roteamento: além do índice por canal, o hub indexa as conexões por usuário, função e mesa.
+    Mensagens com target_user_id vão apenas aos sockets daquele usuário; com target_role de uma
+    função da equipe (ex.: "garcom"), apenas a essa função, aos supervisores e a sockets sem função
+    declarada. Se a mensagem também tiver mesa_id, vai só a quem atende a mesa (ou a todos da função
+    quando ninguém a atende).
+
+    Encoding: o cliente pode negociar MessagePack na conexão (?encoding=msgpack ou subprotocolo
+    "msgpack"). Cada broadcast é codificado uma única vez por encoding e os mesmos bytes são
+    reaproveitados por todos os assinantes.
+    """
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Conexões ativas: { "canal": {websocket1, websocket2} }
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.channel_prefix = settings.WS_REDIS_CHANNEL_PREFIX
+        self.dropped_messages = 0
+        self.evicted_connections = 0
+        self._listener_task: Optional[asyncio.Task] = None
+        # Atualizações aguardando a janela de coalescência: { "canal": { "pedido:1": mensagem } }
+        self._pending_updates: Dict[str, Dict[str, WebSocketMessage]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self.coalesced_updates = 0
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self.reaped_dead_connections = 0
+        self.reaped_idle_connections = 0
+        # Índices de roteamento: { "id do usuário" | "função" | "mesa": {websocket, ...} }
+        self.by_user: Dict[str, Set[WebSocket]] = {}
+        self.by_role: Dict[Optional[str], Set[WebSocket]] = {}
+        self.by_mesa: Dict[str, Set[WebSocket]] = {}
+
+    # --- Conexões locais ---
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        channel_id: str = DEFAULT_CHANNEL,
+        idle_timeout: Optional[float] = None,
+        last_event_id: Optional[str] = None,
+        expects_pong: bool = False,
+        user_id: Optional[str] = None,
+        role: Optional[str] = None,
+        mesas: Optional[Iterable[str]] = None,
+        encoding: Optional[str] = None,
+    ):
+        encoding, subprotocol = negotiate_encoding(websocket, encoding)
+        await websocket.accept(subprotocol=subprotocol)
+        self.subscribe(
+            websocket, channel_id, idle_timeout=idle_timeout, expects_pong=expects_pong,
+            user_id=user_id, role=role, mesas=mesas, encoding=encoding,
+        )
+        logger.info(f"WebSocket conectado ao canal: {channel_id}. Total de conexões no canal: {len(self.active_connections[channel_id])}")
+        if last_event_id:
+            await self.replay(websocket, channel_id, last_event_id)
+
+    def subscribe(
+        self,
+        websocket: WebSocket,
+        channel_id: str,
+        idle_timeout: Optional[float] = None,
+        expects_pong: bool = False,
+        user_id: Optional[str] = None,
+        role: Optional[str] = None,
+        mesas: Optional[Iterable[str]] = None,
+        encoding: str = ENCODING_JSON,
+    ):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            connection = ClientConnection(
+                websocket, idle_timeout=idle_timeout, expects_pong=expects_pong,
+                user_id=user_id, role=role, mesas=mesas, encoding=encoding,
+            )
+            connection.writer_task = asyncio.create_task(self._run_writer(connection))
+            self.connections[websocket] = connection
+            self._index(connection)
+        connection.channels.add(channel_id)
+        self.active_connections.setdefault(channel_id, set()).add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket, channel_id: str):
+        """Remove o socket de um canal sem encerrar a conexão (sockets multiplexados)."""
+        connection = self.connections.get(websocket)
+        if connection is None or channel_id not in connection.channels:
+            return
+        self._remove_from_channel(websocket, channel_id)
+        connection.channels.discard(channel_id)
+
+    def channels_of(self, websocket: WebSocket) -> Set[str]:
+        connection = self.connections.get(websocket)
+        return set(connection.channels) if connection is not None else set()
+
+    def disconnect(self, websocket: WebSocket, channel_id: str = DEFAULT_CHANNEL):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            # Já removida (ex.: derrubada por ser um consumidor lento)
+            return
+        self._remove_from_channel(websocket, channel_id)
+        connection.channels.discard(channel_id)
+        if not connection.channels:
+            self._release(connection)
+        logger.info(f"WebSocket desconectado do canal: {channel_id}.")
+
+    def _remove_from_channel(self, websocket: WebSocket, channel_id: str):
+        connections = self.active_connections.get(channel_id)
+        if connections is None:
+            return
+        connections.discard(websocket)
+        if not connections:  # Se o canal ficar vazio, remove o canal
+            del self.active_connections[channel_id]
+
+    def _index(self, connection: ClientConnection):
+        websocket = connection.websocket
+        if connection.user_id is not None:
+            self.by_user.setdefault(connection.user_id, set()).add(websocket)
+        self.by_role.setdefault(connection.role, set()).add(websocket)
+        for mesa in connection.mesas or (ALL_MESAS,):
+            self.by_mesa.setdefault(mesa, set()).add(websocket)
+
+    def _unindex(self, connection: ClientConnection):
+        websocket = connection.websocket
+        if connection.user_id is not None:
+            self._discard(self.by_user, connection.user_id, websocket)
+        self._discard(self.by_role, connection.role, websocket)
+        for mesa in connection.mesas or (ALL_MESAS,):
+            self._discard(self.by_mesa, mesa, websocket)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[WebSocket]], key: Any, websocket: WebSocket):
+        sockets = index.get(key)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del index[key]
+
+    def _release(self, connection: ClientConnection):
+        """Remove a conexão de todos os canais e encerra sua tarefa escritora."""
+        if self.connections.pop(connection.websocket, None) is not None:
+            self._unindex(connection)
+        for channel_id in connection.channels:
+            self._remove_from_channel(connection.websocket, channel_id)
+        connection.channels.clear()
+        task = connection.writer_task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    async def _run_writer(self, connection: ClientConnection):
+        try:
+            await connection.write_loop()
+        except asyncio.CancelledError:
+            raise
+        except WebSocketDisconnect:
+            logger.info("WebSocket desconectado durante o envio.")
+            self._release(connection)
+        except Exception as e:
+            logger.error(f"Erro ao enviar mensagem para WebSocket: {e}")
+            self._release(connection)
+
+    def _evict(self, connection: ClientConnection):
+        """Derruba um consumidor lento sem bloquear o broadcast em andamento."""
+        self.evicted_connections += 1
+        self.dropped_messages += connection.dropped_messages + connection.queue.qsize()
+        logger.warning(
+            f"WebSocket derrubado por consumidor lento (fila: {connection.queue.qsize()}, "
+            f"canais: {sorted(connection.channels)})."
+        )
+        self._drop(connection, status.WS_1013_TRY_AGAIN_LATER)
+
+    def _drop(self, connection: ClientConnection, code: int):
+        """Remove a conexão do hub e fecha o socket em segundo plano."""
+        self._release(connection)
+        asyncio.create_task(self._close(connection.websocket, code))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            await websocket.send_text(message)
+        elif not connection.enqueue(encode_frame(message, connection.encoding)):
+            self._evict(connection)
+
+    async def broadcast_to_channel(
+        self,
+        message: str,
+        channel_id: str,
+        event_id: Optional[str] = None,
+        parsed: Optional[WebSocketMessage] = None,
+    ):
+        """
+        Enfileira a mensagem para os sockets deste processo inscritos no canal, sem aguardar os envios.
+        Com a mensagem já decodificada (parsed), aplica o roteamento por usuário, função e mesa.
+        """
+        websockets = self.active_connections.get(channel_id)
+        if not websockets:
+            return
+        if parsed is not None:
+            websockets = self._route(websockets, parsed)
+        frames: Dict[str, Frame] = {ENCODING_JSON: message}
+        for websocket in list(websockets):
+            connection = self.connections.get(websocket)
+            if connection is None:
+                continue
+            if connection.holding is not None:
+                connection.holding.append((event_id, message))
+            elif not connection.enqueue(self._frame(frames, message, connection.encoding)):
+                self._evict(connection)
+
+    @staticmethod
+    def _frame(frames: Dict[str, Frame], message: str, encoding: str) -> Frame:
+        """Codifica a mensagem no máximo uma vez por encoding e reaproveita o resultado."""
+        frame = frames.get(encoding)
+        if frame is None:
+            frame = frames[encoding] = encode_frame(message, encoding)
+        return frame
+
+    def _route(self, websockets: Set[WebSocket], message: WebSocketMessage) -> Set[WebSocket]:
+        """Restringe os sockets do canal aos destinatários da mensagem usando os índices."""
+        if message.target_user_id is not None:
+            return websockets & self.by_user.get(message.target_user_id, set())
+
+        role = message.target_role
+        if role not in STAFF_ROLES:
+            return websockets
+
+        destinatarios = websockets & self.by_role.get(role, set())
+        if message.mesa_id is not None and destinatarios:
+            da_mesa = destinatarios & (self.by_mesa.get(message.mesa_id, set()) | self.by_mesa.get(ALL_MESAS, set()))
+            # Ninguém da função atende a mesa: melhor avisar todos do que perder a chamada
+            destinatarios = da_mesa or destinatarios
+        for papel in (*SUPERVISOR_ROLES, None):
+            destinatarios |= websockets & self.by_role.get(papel, set())
+        return destinatarios
+
+    @staticmethod
+    def _accepts(connection: ClientConnection, message: WebSocketMessage) -> bool:
+        """Versão por conexão de _route, usada no replay (sem o fallback por mesa)."""
+        if message.target_user_id is not None:
+            return connection.user_id == message.target_user_id
+        role = message.target_role
+        if role not in STAFF_ROLES or connection.role is None or connection.role in SUPERVISOR_ROLES:
+            return True
+        return connection.role == role
+
+    async def replay(self, websocket: WebSocket, channel_id: str, last_event_id: str) -> int:
+        """
+        Reenvia ao socket os eventos do canal posteriores a last_event_id.
+        Mensagens ao vivo que chegam durante a leitura ficam retidas e são entregues em seguida,
+        sem duplicar eventos já reenviados. Retorna quantos eventos foram reenviados.
+        """
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return 0
+
+        connection.holding = []
+        try:
+            eventos, completo = await redis_service_instance.read_stream_after(
+                self.stream_key(channel_id), last_event_id, settings.WS_STREAM_REPLAY_MAX
+            )
+        except Exception as e:
+            logger.warning(f"Não foi possível recuperar o histórico do canal {channel_id} após {last_event_id}: {e}")
+            eventos, completo = [], False
+        finally:
+            retidas, connection.holding = connection.holding, None
+
+        mensagens: List[str] = []
+        if not completo:
+            # O cliente perdeu mais do que o stream guarda: deve recarregar o estado completo
+            aviso = WebSocketMessage(type="info", payload={"event": "replay_incompleto", "last_event_id": last_event_id})
+            mensagens.append(aviso.model_dump_json())
+        ultimo = last_event_id
+        reenviados = 0
+        for event_id, data in eventos:
+            ultimo = event_id
+            parsed = self._parse(data)
+            if parsed is None:
+                mensagens.append(data)
+            elif self._accepts(connection, parsed):
+                parsed.event_id = event_id
+                mensagens.append(parsed.model_dump_json())
+            else:
+                continue
+            reenviados += 1
+        for event_id, data in retidas:
+            if event_id is not None and self._is_replayed(event_id, ultimo):
+                continue
+            mensagens.append(data)
+
+        for message in mensagens:
+            if connection.websocket not in self.connections:
+                break
+            if not connection.enqueue(encode_frame(message, connection.encoding)):
+                self._evict(connection)
+                break
+        logger.info(f"{reenviados} eventos reenviados no canal {channel_id} após {last_event_id}.")
+        return reenviados
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+    @staticmethod
+    def _is_replayed(event_id: str, ultimo: str) -> bool:
+        try:
+            return parse_stream_id(event_id) <= parse_stream_id(ultimo)
+        except ValueError:
+            return False
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    @staticmethod
+    def _parse(data: str) -> Optional[WebSocketMessage]:
+        try:
+            return WebSocketMessage.model_validate_json(data)
+        except ValueError:
+            return None
+
+    def _unpack_event(self, raw: str) -> Tuple[Optional[str], str, Optional[WebSocketMessage]]:
+        """
+        Separa as mensagens publicadas como "<event_id>|<json>" (JSON puro não tem event_id) e
+        decodifica a mensagem uma única vez por processo, para roteamento e inclusão do event_id.
+        """
+        if raw.startswith("{"):
+            return None, raw, self._parse(raw)
+        event_id, _, data = raw.partition("|")
+        parsed = self._parse(data)
+        if parsed is None:
+            return event_id, data, None
+        parsed.event_id = event_id
+        return event_id, parsed.model_dump_json(), parsed
+
+    async def receive_until_disconnect(
+        self,
+        websocket: WebSocket,
+        on_message: Optional[Callable[[str], Awaitable[None]]] = None,
+    ):
+        """
+        Lê os frames do cliente até a desconexão, renovando o heartbeat da conexão.
+        Frames que não são pong vão para on_message, quando informado.
+        Levanta WebSocketDisconnect quando o cliente sai ou o socket é fechado pelo hub.
+        """
+        while True:
+            data = await self._receive_frame(websocket)
+            connection = self.connections.get(websocket)
+            if connection is None:
+                continue
+            is_pong = self._is_pong(data)
+            connection.mark_received(activity=not is_pong)
+            if is_pong:
+                continue
+            if on_message is not None:
+                await on_message(data)
+            else:
+                logger.debug(f"Mensagem recebida no WebSocket (não esperado): {data}")
+
+    @staticmethod
+    async def _receive_frame(websocket: WebSocket) -> str:
+        """Lê um frame de texto ou binário; frames MessagePack são convertidos para JSON."""
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+        if message.get("text") is not None:
+            return message["text"]
+        data = message.get("bytes") or b""
+        if msgpack is not None:
+            try:
+                return json.dumps(msgpack.unpackb(data, raw=False))
+            except Exception:
+                pass
+        return data.decode("utf-8", errors="replace")
+
+    @staticmethod
+    def _is_pong(data: str) -> bool:
+        data = data.strip()
+        if data.lower() == "pong":
+            return True
+        if data.startswith("{"):
+            try:
+                return json.loads(data).get("type") == "pong"
+            except (ValueError, AttributeError):
+                return False
+        return False
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        Remove conexões mortas (que prometeram pong e estão sem frames além de WS_HEARTBEAT_TIMEOUT_SECONDS) e ociosas
+        (sem atividade além do idle_timeout da conexão) e envia um ping às demais.
+        """
+        agora = time.monotonic()
+        mortas = ociosas = 0
+        pings: Dict[str, Frame] = {ENCODING_JSON: PING_MESSAGE}
+        for connection in list(self.connections.values()):
+            if connection.expects_pong and agora - connection.last_received > settings.WS_HEARTBEAT_TIMEOUT_SECONDS:
+                mortas += 1
+                self._drop(connection, status.WS_1001_GOING_AWAY)
+            elif connection.idle_timeout is not None and agora - connection.last_activity > connection.idle_timeout:
+                ociosas += 1
+                self._drop(connection, status.WS_1000_NORMAL_CLOSURE)
+            elif not connection.enqueue(self._frame(pings, PING_MESSAGE, connection.encoding), activity=False):
+                self._evict(connection)
+
+        self.reaped_dead_connections += mortas
+        self.reaped_idle_connections += ociosas
+        if mortas or ociosas:
+            logger.info(
+                f"Varredura de WebSockets: {mortas} conexões mortas e {ociosas} ociosas removidas. "
+                f"Conexões ativas: {len(self.connections)}."
+            )
+        return {"mortas": mortas, "ociosas": ociosas}
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Erro na varredura de WebSockets: {e}")
 
     async def send_message(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        # Mantido para compatibilidade: envia ao canal padrão de notificações
+        await self.broadcast_to_channel(message, DEFAULT_CHANNEL)
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidade das filas de saída e contadores de descarte, para monitoramento."""
+        depths = [connection.queue.qsize() for connection in self.connections.values()]
+        encodings: Dict[str, int] = {}
+        for connection in self.connections.values():
+            encodings[connection.encoding] = encodings.get(connection.encoding, 0) + 1
+        return {
+            "connections": len(self.connections),
+            "channels": len(self.active_connections),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "connections_over_high_water": sum(1 for d in depths if d >= settings.WS_SEND_QUEUE_HIGH_WATER),
+            "dropped_messages": self.dropped_messages,
+            "evicted_connections": self.evicted_connections,
+            "pending_coalesced_channels": len(self._pending_updates),
+            "coalesced_updates": self.coalesced_updates,
+            "reaped_dead_connections": self.reaped_dead_connections,
+            "reaped_idle_connections": self.reaped_idle_connections,
+            "authenticated_users": len(self.by_user),
+            "connections_by_role": {str(role): len(sockets) for role, sockets in self.by_role.items()},
+            "connections_by_encoding": encodings,
+        }
+
+    # --- Publicação entre workers ---
+
+    @staticmethod
+    def stream_key(channel_id: str) -> str:
+        return f"{settings.WS_STREAM_KEY_PREFIX}{channel_id}"
+
+    async def publish(self, channel_id: str, message: WebSocketMessage):
+        """
+        Grava a mensagem no stream do canal e a publica para todos os workers via Redis.
+        Se o Redis estiver indisponível, entrega ao menos aos sockets locais (sem event_id).
+        """
+        # O canal de origem acompanha a mensagem para clientes com várias assinaturas no mesmo socket
+        message = message.model_copy(update={"channel": channel_id})
+        try:
+            event_id = await redis_service_instance.publish_event(
+                self.stream_key(channel_id),
+                f"{self.channel_prefix}{channel_id}",
+                message.model_dump_json(),
+                settings.WS_STREAM_MAXLEN,
+            )
+            logger.debug(f"Mensagem publicada no canal {channel_id}: {message.type} (evento {event_id})")
+        except Exception as e:
+            logger.warning(f"Redis indisponível, entregando mensagem apenas localmente no canal {channel_id}: {e}")
+            await self.broadcast_to_channel(message.model_dump_json(), channel_id, parsed=message)
+
+    async def publish_coalesced(self, channel_id: str, entity_key: str, message: WebSocketMessage):
+        """
+        Publica uma atualização de status agrupando-a com as demais do mesmo canal.
+
+        Dentro da janela WS_COALESCE_WINDOW_MS, uma nova atualização da mesma entidade
+        (ex.: "pedido:42") substitui a anterior. Ao fim da janela o canal recebe uma única mensagem.
+        """
+        window = settings.WS_COALESCE_WINDOW_MS / 1000
+        if window <= 0:
+            await self.publish(channel_id, message)
+            return
+
+        pending = self._pending_updates.setdefault(channel_id, {})
+        if pending.pop(entity_key, None) is not None:
+            self.coalesced_updates += 1
+        pending[entity_key] = message  # Reinsere para manter a ordem da atualização mais recente
+
+        if channel_id not in self._flush_tasks:
+            self._flush_tasks[channel_id] = asyncio.create_task(self._flush_after(channel_id, window))
+
+    async def publish_batch(self, channel_id: str, updates: Dict[str, WebSocketMessage]):
+        """
+        Publica agora, numa única mensagem, várias atualizações de status do mesmo canal
+        (entity_key -> mensagem), como as de uma operação em lote. Atualizações ainda na janela
+        de coalescência do canal vão junto, para que nenhuma delas chegue depois das novas.
+        """
+        pending = self._pending_updates.setdefault(channel_id, {})
+        for entity_key, message in updates.items():
+            if pending.pop(entity_key, None) is not None:
+                self.coalesced_updates += 1
+            pending[entity_key] = message
+        task = self._flush_tasks.pop(channel_id, None)
+        if task is not None:
+            task.cancel()
+        await self._flush(channel_id)
+
+    async def _flush_after(self, channel_id: str, window: float):
+        try:
+            await asyncio.sleep(window)
+        finally:
+            if self._flush_tasks.get(channel_id) is asyncio.current_task():
+                del self._flush_tasks[channel_id]
+        await self._flush(channel_id)
+
+    async def _flush(self, channel_id: str):
+        pending = self._pending_updates.pop(channel_id, None)
+        if not pending:
+            return
+        updates = list(pending.values())
+        if len(updates) == 1:
+            # Nada para agrupar: mantém o formato original da mensagem
+            await self.publish(channel_id, updates[0])
+            return
+
+        comanda_ids = {update.comanda_id for update in updates}
+        # O lote mantém o destino comum das atualizações; se divergirem, vai a todos do canal
+        roles = {update.target_role for update in updates}
+        mesa_ids = {update.mesa_id for update in updates}
+        batch = WebSocketMessage(
+            type="status_batch",
+            payload=StatusBatchPayload(updates=updates),
+            comanda_id=comanda_ids.pop() if len(comanda_ids) == 1 else None,
+            target_role=roles.pop() if len(roles) == 1 else None,
+            mesa_id=mesa_ids.pop() if len(mesa_ids) == 1 else None,
+        )
+        await self.publish(channel_id, batch)
+
+    async def _flush_all(self):
+        """Entrega imediatamente tudo o que ainda está na janela de coalescência."""
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        self._flush_tasks.clear()
+        for channel_id in list(self._pending_updates):
+            try:
+                await self._flush(channel_id)
+            except Exception as e:
+                logger.warning(f"Falha ao entregar atualizações pendentes do canal {channel_id}: {e}")
+
+    # --- Listener Redis (um por processo) ---
+
+    async def start(self):
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen(), name="websocket-hub-redis-listener")
+            logger.info("Hub de WebSockets iniciado.")
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.create_task(self._sweep_loop(), name="websocket-hub-heartbeat")
+
+    async def stop(self):
+        await self._flush_all()
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+            logger.info("Hub de WebSockets parado.")
+
+    async def _listen(self):
+        pattern = f"{self.channel_prefix}*"
+        backoff = settings.WS_REDIS_RECONNECT_MIN_BACKOFF_SECONDS
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis_service_instance.get_pubsub(ignore_subscribe_messages=True)
+                await pubsub.psubscribe(pattern)
+                logger.info(f"Hub de WebSockets escutando o padrão Redis: {pattern}")
+                backoff = settings.WS_REDIS_RECONNECT_MIN_BACKOFF_SECONDS
+
+                # get_message bloqueia na leitura do socket (sem sleep entre mensagens); o timeout só
+                # devolve o controle periodicamente para o PING de health check em canais quietos
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS
+                    )
+                    if message is None or message["type"] != "pmessage":
+                        continue
+                    channel_id = message["channel"][len(self.channel_prefix):]
+                    event_id, data, parsed = self._unpack_event(message["data"])
+                    await self.broadcast_to_channel(data, channel_id, event_id=event_id, parsed=parsed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Listener Redis do hub de WebSockets falhou: {e}. Reconectando em {backoff:.1f}s.")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, settings.WS_REDIS_RECONNECT_MAX_BACKOFF_SECONDS)
+
 
 manager = ConnectionManager()
@@ -1,4 +1,6 @@
+import json
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Security
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,6 +12,7 @@ from app.api.v1 import (
     categoria,
     clientes,
     comandas,
+    cozinha,
     fiado,
     mesas,
     pagamentos,
@@ -17,10 +20,15 @@ from app.api.v1 import (
     produtos,
     relatorios,
     users,
-    venda, venda_produto_item, notifications,
+    venda, venda_produto_item, notifications, websocket_routes,
 )
+from app.core.captura_trafego import CapturaTrafegoMiddleware, gravador_trafego
 from app.core.config.settings import settings
+from app.core.idempotencia import IdempotenciaMiddleware
 from app.core.logging.config import setup_logging
+from app.core.notifications import manager as websocket_hub
+from app.services.fila_cozinha_service import fila_cozinha_service
+from app.services.redis_service import redis_service_instance
 from app.services.user_service import create_first_superuser
 
 logger = logging.getLogger(__name__)
@@ -28,19 +36,43 @@ logger = logging.getLogger(__name__)
 # Configura o logging da aplicação
 setup_logging()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    await create_first_superuser()
+    try:
+        await redis_service_instance.connect()
+    except Exception:
+        # Sem Redis o hub entrega apenas aos sockets locais e reconecta em segundo plano
+        logger.warning("Redis indisponível no startup; seguindo sem pub/sub entre workers por enquanto.")
+    await websocket_hub.start()
+    try:
+        # Só reconstrói se o Redis ainda não tiver as filas das telas de preparo
+        await fila_cozinha_service.reconstruir()
+    except Exception as e:
+        logger.warning(f"Não foi possível carregar as filas de preparo no startup: {e}")
+    yield
+    # Shutdown
+    await websocket_hub.stop()
+    await redis_service_instance.close_redis_client()
+    gravador_trafego.fechar()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API para gerenciamento de barzinho, incluindo mesas, pedidos, comandas, produtos e relatórios.",
     version="1.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # OAuth2 scheme para o Swagger usar no botão "Authorize"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-@app.on_event("startup")
-async def on_startup():
-    await create_first_superuser()
+# Por dentro do CORS: respostas repetidas e erros de idempotência também recebem os cabeçalhos CORS
+app.add_middleware(
+    IdempotenciaMiddleware,
+    rotas=[("POST", f"{settings.API_V1_STR}/pedidos"), ("POST", f"{settings.API_V1_STR}/pagamentos")],
+)
 
 if settings.BACKEND_CORS_ORIGINS:
     try:
@@ -62,11 +94,16 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+if settings.TRAFFIC_CAPTURE_ENABLED:
+    # Adicionado por último para ficar por fora do CORS e medir a requisição inteira
+    app.add_middleware(CapturaTrafegoMiddleware, gravador=gravador_trafego)
+
 # Inclui suas rotas normalmente
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["Autenticação"])
 app.include_router(categoria.router, prefix=f"{settings.API_V1_STR}/categoria", tags=["Categoria"])
 app.include_router(clientes.router, prefix=f"{settings.API_V1_STR}/clientes", tags=["Clientes"])
 app.include_router(comandas.router, prefix=f"{settings.API_V1_STR}/comandas", tags=["Comandas"])
+app.include_router(cozinha.router, prefix=f"{settings.API_V1_STR}/cozinha", tags=["Cozinha"])
 app.include_router(fiado.router, prefix=f"{settings.API_V1_STR}/fiado", tags=["Fiado"])
 app.include_router(mesas.router, prefix=f"{settings.API_V1_STR}/mesas", tags=["Mesas"])
 app.include_router(pagamentos.router, prefix=f"{settings.API_V1_STR}/pagamentos", tags=["Pagamentos"])
@@ -77,6 +114,7 @@ app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["U
 app.include_router(venda.router, prefix=f"{settings.API_V1_STR}/venda", tags=["Vendas"])
 app.include_router(venda_produto_item.router, prefix=f"{settings.API_V1_STR}/venda_produto_item", tags=["Produtos por Venda"])
 app.include_router(notifications.router, prefix=f"{settings.API_V1_STR}/notifications", tags=["Notificações"])
+app.include_router(websocket_routes.router, prefix=settings.API_V1_STR)
 
 
 # Custom OpenAPI para incluir Bearer token no Swagger UI
@@ -9,6 +9,7 @@ class Categoria(Base):
     nome = Column(String(100), unique=True, nullable=False, index=True)
     descricao = Column(Text, nullable=True)
     imagem_url = Column(String(255), nullable=True)
+    estacao = Column(String(20), nullable=False, server_default="cozinha")  # Estação que prepara os produtos (cozinha, bar)
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     atualizado_em = Column(DateTime(timezone=True), onupdate=func.now())
 
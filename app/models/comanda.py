@@ -35,6 +35,8 @@ class Comanda(Base):
     motivo_cancelamento = Column(Text, nullable=True)
     observacoes = Column(Text, nullable=True)
     qr_code_comanda_hash = Column(String, unique=True, index=True, nullable=True)
+    # Incrementado a cada alteração publicada; clientes em modo diff aplicam JSON Patch sobre a versão anterior
+    versao = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional
 from datetime import datetime
 
+from app.schemas.cozinha_schemas import EstacaoPreparo
+
 class CategoriaBase(BaseModel):
     nome: str = Field(..., max_length=100, example="Eletrônicos")
     descricao: Optional[str] = Field(
@@ -14,6 +16,11 @@ class CategoriaBase(BaseModel):
         max_length=255,
         example="https://exemplo.com/imagem.jpg"
     )
+    estacao: EstacaoPreparo = Field(
+        "cozinha",
+        description="Estação de preparo que recebe os itens desta categoria",
+        example="bar"
+    )
 
     @validator('imagem_url')
     def validate_url(cls, v):
@@ -45,6 +52,7 @@ class CategoriaResponse(CategoriaBase):
                 "nome": "Eletrônicos",
                 "descricao": "Produtos eletrônicos em geral",
                 "imagem_url": "https://exemplo.com/imagem.jpg",
+                "estacao": "cozinha",
                 "criado_em": "2023-01-01T00:00:00",
                 "atualizado_em": "2023-01-02T00:00:00",
                 "produtos_count": 5
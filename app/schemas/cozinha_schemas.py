@@ -0,0 +1,35 @@
+# app/schemas/cozinha_schemas.py
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+# Estações de preparo; cada uma tem a sua fila e o seu canal de WebSocket
+EstacaoPreparo = Literal["cozinha", "bar"]
+
+class ItemFilaCozinha(BaseModel):
+    # Item em aberto como aparece na tela da estação; sem preços nem dados do cliente
+    id: int
+    pedido_id: int
+    comanda_id: int
+    mesa_id: Optional[int] = None
+    produto: str
+    quantidade: int
+    observacoes: Optional[str] = None
+    status: str
+    tipo_pedido: str
+    recebido_em: str
+    estacao: str
+
+class FilaCozinhaSnapshot(BaseModel):
+    # Fila completa da estação, do item mais antigo para o mais novo
+    tipo: Literal["snapshot"] = "snapshot"
+    estacao: str
+    versao: int
+    itens: List[ItemFilaCozinha] = []
+
+class FilaCozinhaDelta(BaseModel):
+    # Alterações sobre a versao anterior (versao - 1); fora de sequência, o cliente pede um snapshot
+    tipo: Literal["delta"] = "delta"
+    estacao: str
+    versao: int
+    itens: List[ItemFilaCozinha] = [] # Novos ou com status alterado
+    removidos: List[int] = []
@@ -51,6 +51,36 @@ class StatusPedidoUpdate(BaseModel):
     class Config:
         from_attributes = True
 
+# Schemas para atualização de status de vários pedidos de uma vez (telas de preparo)
+class StatusPedidoLoteItem(BaseModel):
+    pedido_id: int
+    status: StatusPedido
+
+class StatusPedidoLoteUpdate(BaseModel):
+    atualizacoes: List[StatusPedidoLoteItem] = Field(..., min_length=1, max_length=500)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "atualizacoes": [
+                    {"pedido_id": 101, "status": "Pronto para Entrega"},
+                    {"pedido_id": 102, "status": "Pronto para Entrega"},
+                    {"pedido_id": 98, "status": "Entregue na Mesa"}
+                ]
+            }
+        }
+
+class ResultadoStatusPedidoLote(BaseModel):
+    pedido_id: int
+    sucesso: bool
+    status: Optional[StatusPedido] = None  # Status do pedido após o lote (o novo, ou o atual se falhou)
+    erro: Optional[str] = None
+
+class StatusPedidoLoteResposta(BaseModel):
+    atualizados: int
+    falhas: int
+    resultados: List[ResultadoStatusPedidoLote]
+
 # Schema para criação de um pedido
 class PedidoCreate(BaseModel):
     id_comanda: int
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 from datetime import date
 
@@ -55,3 +55,50 @@ class RelatorioPedidosPorUsuarioSchemas(BaseModel):
     usuario_id: int
     nome_usuario: str
     pedidos: List[PedidoDetalhadoSchemas]
+
+# Relatório Comparativo entre Períodos
+class MetricasPeriodoSchemas(BaseModel):
+    data_inicio: date
+    data_fim: date
+    receita: float
+    total_comandas: int
+    ticket_medio: float
+    itens_por_comanda: float
+    taxa_servico: float
+    desconto: float
+    total_recebido: float
+    valor_fiado: float
+    participacao_fiado: float
+
+class RelatorioComparativoSchemas(BaseModel):
+    comparacao: str
+    periodo_atual: MetricasPeriodoSchemas
+    periodo_anterior: MetricasPeriodoSchemas
+    variacao_percentual: Dict[str, Optional[float]]
+
+# Relatório Heatmap (dia da semana x hora do dia)
+class RelatorioHeatmapSchemas(BaseModel):
+    data_inicio: date
+    data_fim: date
+    dias_semana: List[str]
+    horas: List[int]
+    pedidos: List[List[int]]
+    receita: List[List[float]]
+    valor_recebido: List[List[float]]
+    tempo_medio_preparo_minutos: List[List[Optional[float]]]
+
+# Relatório de Desempenho da Equipe
+class DesempenhoUsuarioSchemas(BaseModel):
+    usuario_id: Optional[int] = None
+    nome_usuario: str
+    total_pedidos: int
+    total_itens: int
+    receita: float
+    pedidos_cancelados: int
+    taxa_cancelamento: float
+    tempo_medio_entrega_minutos: Optional[float] = None
+
+class RelatorioDesempenhoEquipeSchemas(BaseModel):
+    data_inicio: date
+    data_fim: date
+    usuarios: List[DesempenhoUsuarioSchemas]
@@ -1,14 +1,19 @@
 # app/schemas/websocket_schemas.py
 from pydantic import BaseModel
-from typing import Any, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
+
+# Funções da equipe informadas pelos dispositivos ao conectar; usadas para rotear mensagens no hub
+StaffRole = Literal["garcom", "cozinha", "bar", "caixa", "gerente"]
 
 class WebSocketMessage(BaseModel):
-    type: Literal["notification", "status_update", "error", "info"]
+    type: Literal["notification", "status_update", "status_batch", "error", "info"]
     payload: Any
     target_user_id: Optional[str] = None # Para mensagens direcionadas
-    target_role: Optional[Literal["staff", "client"]] = None # Para mensagens a grupos
+    target_role: Optional[Union[Literal["staff", "client"], StaffRole]] = None # Para mensagens a grupos
     comanda_id: Optional[str] = None # Para filtrar atualizações de comanda
     mesa_id: Optional[str] = None # Para filtrar atualizações de mesa
+    event_id: Optional[str] = None # ID do evento no Redis Stream; enviado como last_event_id ao reconectar
+    channel: Optional[str] = None # Canal de origem, para clientes que multiplexam vários canais em um socket
 
 class NotificationPayload(BaseModel):
     title: str
@@ -22,8 +27,40 @@ class ComandaStatusUpdatePayload(BaseModel):
     status_item: Optional[str] = None # Usar o Enum StatusPedido do item_pedido
     message: Optional[str] = None
 
+class PedidoResumoPayload(BaseModel):
+    id: int
+    status: str
+
+class ComandaSnapshotPayload(BaseModel):
+    # Estado atual compacto da comanda, enviado ao conectar no lugar de um GET completo
+    tipo: Literal["snapshot"] = "snapshot"
+    comanda_id: str
+    status_comanda: str
+    mesa_id: Optional[str] = None
+    valor_itens: float
+    valor_taxa_servico: float
+    valor_desconto: float
+    valor_pago: float
+    saldo_devedor: float
+    itens_por_status: Dict[str, int] = {}
+    pedidos: List[PedidoResumoPayload] = []
+    atualizado_em: Optional[str] = None
+    versao: int = 0 # Versão da comanda; base para os patches do modo diff
+
+class ComandaPatchPayload(BaseModel):
+    # Operações JSON Patch (RFC 6902) sobre o resumo na versao_base; com outra versão local, pedir snapshot
+    tipo: Literal["patch"] = "patch"
+    comanda_id: str
+    versao_base: int
+    versao: int
+    ops: List[Dict[str, Any]]
+
 class ClientCallStaffPayload(BaseModel):
     mesa_id: str
     mesa_numero: str
     message: str = "Cliente solicitando atendimento."
 
+
+class StatusBatchPayload(BaseModel):
+    # Atualizações agrupadas na janela de coalescência: apenas o estado mais recente de cada entidade
+    updates: List[WebSocketMessage]
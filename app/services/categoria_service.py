@@ -4,6 +4,7 @@ from sqlalchemy.orm import selectinload
 
 from app.models.categoria import Categoria
 from app.schemas.categoria_schemas import CategoriaCreate, CategoriaUpdate
+from app.services.fila_cozinha_service import fila_cozinha_service
 
 
 async def get_all(db: AsyncSession):
@@ -26,6 +27,7 @@ async def create(db: AsyncSession, categoria: CategoriaCreate):
     db.add(db_categoria)
     await db.commit()
     await db.refresh(db_categoria)
+    await fila_cozinha_service.invalidar_estacoes()
     return db_categoria
 
 
@@ -43,6 +45,8 @@ async def update(db: AsyncSession, categoria_id: int, categoria_update: Categori
     db.add(db_categoria)
     await db.commit()
     await db.refresh(db_categoria)
+    if "estacao" in update_data:
+        await fila_cozinha_service.invalidar_estacoes()
     return db_categoria
 
 
@@ -55,4 +59,5 @@ async def delete(db: AsyncSession, categoria_id: int):
     # Removemos a categoria
     await db.delete(db_categoria)
     await db.commit()
+    await fila_cozinha_service.invalidar_estacoes()
     return True
\ No newline at end of file
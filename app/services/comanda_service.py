@@ -8,6 +8,8 @@ from typing import List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime
 
+from app.core.config.settings import settings
+from app.core.notifications import comanda_diff_channel, manager as websocket_hub
 from app.models import Cliente, Mesa
 from app.models.comanda import Comanda, StatusComanda
 from app.models.pagamento import Pagamento
@@ -17,6 +19,9 @@ from app.models.item_pedido import ItemPedido
 from app.schemas.comanda_schemas import ComandaCreate, ComandaUpdate
 from app.schemas.pagamento_schemas import PagamentoCreateSchema
 from app.schemas.fiado_schemas import FiadoCreate
+from app.schemas.websocket_schemas import ComandaPatchPayload, ComandaSnapshotPayload, PedidoResumoPayload, WebSocketMessage
+from app.services.redis_service import redis_service_instance
+from app.utils.json_patch import gerar_json_patch
 
 logger = logging.getLogger(__name__)
 
@@ -367,12 +372,14 @@ class ComandaService:
             sanitizar_valores_monetarios_sync(comanda)
 
             # Commit para salvar todas as alterações
+            await marcar_alteracao_comanda(db, comanda_id)
             await db.commit()
 
             # Refresh para garantir que os dados estão atualizados
             await db.refresh(comanda)
             if cliente:
                 await db.refresh(cliente)
+            await publicar_alteracao_comanda(db, comanda_id)
 
             return comanda
 
@@ -467,11 +474,13 @@ class ComandaService:
             sanitizar_valores_monetarios_sync(comanda)
 
             # Commit para salvar todas as alterações
+            await marcar_alteracao_comanda(db, comanda_id)
             await db.commit()
 
             # Refresh para garantir que os dados estão atualizados
             await db.refresh(comanda)
             await db.refresh(cliente)
+            await publicar_alteracao_comanda(db, comanda_id)
 
             return comanda
 
@@ -533,8 +542,10 @@ class ComandaService:
             # ✅ CORRIGIDO: Usar função síncrona
             sanitizar_valores_monetarios_sync(comanda)
 
+            await marcar_alteracao_comanda(db, comanda_id)
             await db.commit()
             await db.refresh(comanda)
+            await publicar_alteracao_comanda(db, comanda_id)
 
             logger.info(f"✅ Fiado registrado: Comanda {comanda_id}, "
                         f"Valor fiado: {valor_a_fiar}, "
@@ -598,8 +609,10 @@ class ComandaService:
             # ✅ CORRIGIDO: Usar função síncrona
             sanitizar_valores_monetarios_sync(comanda)
 
+            await marcar_alteracao_comanda(db, comanda_id)
             await db.commit()
             await db.refresh(comanda)
+            await publicar_alteracao_comanda(db, comanda_id)
 
             logger.info(f"✅ Crédito registrado: Comanda {comanda_id}, "
                         f"Valor: {valor_credito}, "
@@ -659,8 +672,10 @@ class ComandaService:
             # ✅ CORRIGIDO: Usar função síncrona
             sanitizar_valores_monetarios_sync(comanda)
 
+            await marcar_alteracao_comanda(db, comanda_id)
             await db.commit()
             await db.refresh(comanda)
+            await publicar_alteracao_comanda(db, comanda_id)
 
             logger.info(f"✅ Comanda fechada com sucesso: ID {comanda_id}")
             return comanda
@@ -768,8 +783,10 @@ class ComandaService:
             sanitizar_valores_monetarios_sync(comanda)
 
             # Commit da transação e refresh para garantir dados atualizados
+            await marcar_alteracao_comanda(db, comanda_id)
             await db.commit()
             await db.refresh(comanda)
+            await publicar_alteracao_comanda(db, comanda_id)
 
             logger.info(
                 f"✅ Desconto aplicado: Comanda {comanda_id}, "
@@ -882,6 +899,49 @@ class ComandaService:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def montar_resumo_comanda(db: AsyncSession, comanda_id: int) -> Optional[ComandaSnapshotPayload]:
+        """
+        Monta o resumo compacto da comanda para WebSockets/SSE com consultas leves
+        (colunas da comanda, contagem de itens por status e status dos pedidos), sem carregar relacionamentos.
+        """
+        result = await db.execute(
+            select(
+                Comanda.id, Comanda.id_mesa, Comanda.status_comanda, Comanda.valor_final_comanda,
+                Comanda.valor_taxa_servico, Comanda.valor_desconto, Comanda.valor_pago,
+                Comanda.valor_total_calculado, Comanda.updated_at, Comanda.versao,
+            ).where(Comanda.id == comanda_id)
+        )
+        comanda = result.one_or_none()
+        if comanda is None:
+            return None
+
+        itens = await db.execute(
+            select(ItemPedido.status, func.count(ItemPedido.id))
+            .where(ItemPedido.id_comanda == comanda_id)
+            .group_by(ItemPedido.status)
+        )
+        pedidos = await db.execute(
+            select(Pedido.id, Pedido.status_geral_pedido)
+            .where(Pedido.id_comanda == comanda_id)
+            .order_by(Pedido.id)
+        )
+
+        return ComandaSnapshotPayload(
+            comanda_id=str(comanda.id),
+            status_comanda=comanda.status_comanda.value,
+            mesa_id=str(comanda.id_mesa) if comanda.id_mesa else None,
+            valor_itens=float(comanda.valor_final_comanda or 0),
+            valor_taxa_servico=float(comanda.valor_taxa_servico or 0),
+            valor_desconto=float(comanda.valor_desconto or 0),
+            valor_pago=float(comanda.valor_pago or 0),
+            saldo_devedor=float(comanda.valor_total_calculado or 0),
+            itens_por_status={status_item.value: quantidade for status_item, quantidade in itens.all()},
+            pedidos=[PedidoResumoPayload(id=pedido_id, status=status_pedido.value) for pedido_id, status_pedido in pedidos.all()],
+            atualizado_em=comanda.updated_at.isoformat() if comanda.updated_at else None,
+            versao=comanda.versao or 0,
+        )
+
     @staticmethod
     async def recalcular_totais_comanda(db: AsyncSession, comanda_id: int, fazer_commit: bool = True) -> Optional[
         Comanda]:
@@ -935,7 +995,8 @@ class ComandaService:
                     valor_final_comanda=total_itens,
                     valor_taxa_servico=valor_taxa,
                     valor_total_calculado=valor_total_calculado,
-                    updated_at=datetime.now()
+                    updated_at=datetime.now(),
+                    versao=Comanda.versao + 1,
                 )
             )
 
@@ -946,6 +1007,12 @@ class ComandaService:
             else:
                 await db.flush()
 
+            if fazer_commit:
+                await publicar_alteracao_comanda(db, comanda_id)
+            else:
+                # Ainda não confirmado: apenas descarta o resumo; o próximo patch cai no snapshot completo
+                await invalidar_resumo_comanda(comanda_id)
+
             # ✅ BUSCAR COMANDA ATUALIZADA PARA RETORNO
             comanda_atualizada = await ComandaService.buscar_comanda_por_id(db, comanda_id)
             return comanda_atualizada
@@ -969,6 +1036,11 @@ async def get_comanda_by_id(db: AsyncSession, comanda_id: int) -> Optional[Coman
     return await ComandaService.buscar_comanda_por_id(db, comanda_id)
 
 
+async def get_comanda_by_qr_hash(db: AsyncSession, qr_code_comanda_hash: str) -> Optional[Comanda]:
+    result = await db.execute(select(Comanda).where(Comanda.qr_code_comanda_hash == qr_code_comanda_hash))
+    return result.scalar_one_or_none()
+
+
 async def get_comanda_by_id_detail(db: AsyncSession, comanda_id: int) -> Optional[Comanda]:
     return await ComandaService.buscar_comanda_completa(db, comanda_id)
 
@@ -1018,3 +1090,125 @@ async def usar_credito_cliente_na_comanda(db: AsyncSession, comanda_id: int,
 async def adicionar_credito_ao_cliente(db: AsyncSession, cliente_id: int, valor_credito: Decimal,
                                        observacoes: Optional[str] = None) -> Cliente:
     return await ComandaService.adicionar_credito_cliente(db, cliente_id, valor_credito, observacoes)
+
+
+def _chave_resumo_comanda(comanda_id: int) -> str:
+    return f"comanda:resumo:{comanda_id}"
+
+
+async def get_formatted_comanda_status_for_ws(db: AsyncSession, comanda_id: int) -> Optional[ComandaSnapshotPayload]:
+    """
+    Resumo atual da comanda para o snapshot enviado na conexão de WebSocket/SSE.
+    Servido do cache no Redis (WS_COMANDA_SNAPSHOT_CACHE_TTL_SECONDS); só consulta o banco em caso de miss.
+    """
+    chave = _chave_resumo_comanda(comanda_id)
+    try:
+        client = await redis_service_instance.get_redis_client()
+        cached = await client.get(chave)
+        if cached:
+            return ComandaSnapshotPayload.model_validate_json(cached)
+    except Exception as e:
+        client = None
+        logger.warning(f"Cache de resumo da comanda {comanda_id} indisponível: {e}")
+
+    resumo = await ComandaService.montar_resumo_comanda(db, comanda_id)
+    if resumo is not None and client is not None:
+        await _salvar_resumo_no_cache(client, resumo)
+    return resumo
+
+
+# Grava o resumo apenas se a versão for maior ou igual à que está no cache,
+# para que um worker atrasado não sobrescreva um estado mais novo
+SALVAR_RESUMO_SCRIPT = """
+local atual = redis.call('GET', KEYS[1])
+if atual then
+    local versao = cjson.decode(atual)['versao']
+    if versao and tonumber(versao) > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+
+async def _salvar_resumo_no_cache(client, resumo: ComandaSnapshotPayload) -> None:
+    try:
+        await client.eval(
+            SALVAR_RESUMO_SCRIPT, 1, _chave_resumo_comanda(int(resumo.comanda_id)),
+            resumo.model_dump_json(), resumo.versao, settings.WS_COMANDA_SNAPSHOT_CACHE_TTL_SECONDS,
+        )
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o resumo da comanda {resumo.comanda_id} no cache: {e}")
+
+
+def _conteudo_resumo(resumo: ComandaSnapshotPayload) -> dict:
+    # Campos que o cliente exibe; versão e carimbo de tempo não entram na comparação/patch
+    return resumo.model_dump(mode="json", exclude={"versao", "atualizado_em"})
+
+
+async def marcar_alteracao_comanda(db: AsyncSession, *comanda_ids: int) -> None:
+    """
+    Incrementa a versão das comandas dentro da transação de quem as altera (chamar antes do commit).
+    Assim a versão muda junto com os dados; após o commit, publicar_alteracao_comanda envia o patch.
+    """
+    if not comanda_ids:
+        return
+    await db.execute(
+        update(Comanda)
+        .where(Comanda.id.in_(comanda_ids))
+        .values(versao=Comanda.versao + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def publicar_alteracao_comanda(db: AsyncSession, comanda_id: int) -> None:
+    """
+    Publica a alteração da comanda no canal do modo diff e atualiza o resumo em cache, após o commit.
+
+    A versão já foi incrementada na transação da alteração (marcar_alteracao_comanda). Se o resumo
+    em cache é exatamente a versão anterior, envia um JSON Patch dele para o atual; sem cache, ou
+    com outra versão, envia o snapshot completo. Aqui só há leituras: nada é gravado na sessão do chamador.
+    """
+    try:
+        client = await redis_service_instance.get_redis_client()
+        atual = await ComandaService.montar_resumo_comanda(db, comanda_id)
+        if atual is None:
+            return
+        cached = await client.get(_chave_resumo_comanda(comanda_id))
+        anterior = ComandaSnapshotPayload.model_validate_json(cached) if cached else None
+        if anterior is not None and anterior.versao > atual.versao:
+            return  # Uma versão mais nova já foi publicada
+        if anterior is not None and anterior.versao == atual.versao and _conteudo_resumo(anterior) == _conteudo_resumo(atual):
+            return  # Esta versão já foi publicada (ex.: por outro worker)
+
+        if anterior is not None and anterior.versao == atual.versao - 1:
+            payload = ComandaPatchPayload(
+                comanda_id=str(comanda_id),
+                versao_base=anterior.versao,
+                versao=atual.versao,
+                ops=gerar_json_patch(_conteudo_resumo(anterior), _conteudo_resumo(atual)),
+            )
+        else:
+            payload = atual
+        await _salvar_resumo_no_cache(client, atual)
+        await websocket_hub.publish(
+            comanda_diff_channel(comanda_id),
+            WebSocketMessage(type="status_update", payload=payload, comanda_id=str(comanda_id)),
+        )
+    except Exception as e:
+        logger.warning(f"Erro ao publicar alteração da comanda {comanda_id} (não crítico): {e}")
+        try:
+            await db.rollback()  # Não deixa a sessão do chamador numa transação com erro
+        except Exception as rollback_error:
+            logger.error(f"❌ Erro no rollback: {rollback_error}")
+        await invalidar_resumo_comanda(comanda_id)
+
+
+async def invalidar_resumo_comanda(comanda_id: int) -> None:
+    """Descarta o resumo em cache após mudanças na comanda, seus itens ou pedidos."""
+    try:
+        client = await redis_service_instance.get_redis_client()
+        await client.delete(_chave_resumo_comanda(comanda_id))
+    except Exception as e:
+        logger.warning(f"Não foi possível invalidar o resumo da comanda {comanda_id}: {e}")
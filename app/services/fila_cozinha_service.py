@@ -0,0 +1,320 @@
+# app/services/fila_cozinha_service.py
+"""
+Fila das telas de preparo (KDS): os ItemPedido em aberto de cada estação, em ordem de chegada.
+
+O estado vive no Redis e é compartilhado pelos workers:
+    <prefixo>itens            hash item_id -> dados fixos do item (JSON)
+    <prefixo>status           hash item_id -> status exibido
+    <prefixo>fila:<estacao>   sorted set item_id -> instante do pedido (prioridade: mais antigo primeiro)
+    <prefixo>versao:<estacao> contador incrementado a cada alteração da fila
+
+A fila é atualizada pela criação de pedidos e pelas mudanças de status de pedidos e itens; cada
+alteração é publicada como um delta versionado no canal cozinha:<estacao> do hub de WebSockets.
+A estação de cada item vem da categoria do produto (Categoria.estacao), resolvida por um mapa
+categoria -> estação em memória. O mapa só é relido do banco quando alguma categoria muda:
+categoria_service incrementa <prefixo>estacoes:versao e cada worker compara com a versão que carregou.
+As telas recebem um snapshot ao conectar e depois só os deltas, sem consultar o Postgres. Cada
+worker guarda o último snapshot montado e só o remonta quando a versão no Redis muda.
+
+O Postgres só é lido em reconstruir(), no startup, quando o Redis ainda não tem a fila.
+Falhas do Redis nunca interrompem o fluxo do pedido: são apenas registradas.
+"""
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, get_args
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.core.config.settings import settings
+from app.core.notifications import cozinha_channel, manager as websocket_hub
+from app.core.session import AsyncSessionFactory
+from app.models.categoria import Categoria as CategoriaModel
+from app.models.item_pedido import ItemPedido as ItemPedidoModel, StatusPedidoEnum
+from app.models.pedido import Pedido as PedidoModel, StatusPedido
+from app.models.produto import Produto as ProdutoModel
+from app.schemas.cozinha_schemas import EstacaoPreparo, FilaCozinhaDelta, FilaCozinhaSnapshot, ItemFilaCozinha
+from app.schemas.websocket_schemas import WebSocketMessage
+from app.services.redis_service import redis_service_instance
+
+ESTACOES = get_args(EstacaoPreparo)
+ESTACAO_PADRAO = "cozinha"
+
+# Itens que ainda aparecem nas telas
+ITEM_STATUS_ABERTOS = (StatusPedidoEnum.RECEBIDO, StatusPedidoEnum.PREPARANDO)
+PEDIDO_STATUS_ABERTOS = (StatusPedido.RECEBIDO, StatusPedido.EM_PREPARO)
+
+_LOCK_RECONSTRUCAO_SEGUNDOS = 60
+
+
+def _por_estacao(itens: Iterable[ItemFilaCozinha]) -> Dict[str, List[ItemFilaCozinha]]:
+    grupos: Dict[str, List[ItemFilaCozinha]] = defaultdict(list)
+    for item in itens:
+        grupos[item.estacao].append(item)
+    return grupos
+
+
+class FilaCozinhaService:
+
+    def __init__(self):
+        self.prefixo = settings.KDS_KEY_PREFIX
+        # Último snapshot montado por este worker, por estação
+        self._snapshots: Dict[str, FilaCozinhaSnapshot] = {}
+        # Mapa categoria_id -> estação e a versão do Redis em que foi carregado
+        self._estacoes: Dict[int, str] = {}
+        self._estacoes_versao: Optional[str] = None
+
+    # --- Chaves ---
+
+    def _chave_itens(self) -> str:
+        return f"{self.prefixo}itens"
+
+    def _chave_status(self) -> str:
+        return f"{self.prefixo}status"
+
+    def _chave_fila(self, estacao: str) -> str:
+        return f"{self.prefixo}fila:{estacao}"
+
+    def _chave_versao(self, estacao: str) -> str:
+        return f"{self.prefixo}versao:{estacao}"
+
+    def _chave_carregada(self) -> str:
+        return f"{self.prefixo}carregada"
+
+    def _chave_estacoes_versao(self) -> str:
+        return f"{self.prefixo}estacoes:versao"
+
+    # --- Estação de cada categoria ---
+
+    async def atualizar_estacoes(self, forcar: bool = False):
+        """Relê o mapa categoria -> estação se alguma categoria mudou desde a última leitura."""
+        try:
+            client = await redis_service_instance.get_redis_client()
+            versao = await client.get(self._chave_estacoes_versao()) or "0"
+        except Exception as e:
+            if self._estacoes_versao is not None and not forcar:
+                return  # Sem Redis não há como saber de mudanças: segue com o mapa atual
+            logger.warning(f"Redis indisponível ao verificar o mapa de estações: {e}")
+            versao = None
+        if not forcar and versao is not None and versao == self._estacoes_versao:
+            return
+        async with AsyncSessionFactory() as db:
+            linhas = (await db.execute(select(CategoriaModel.id, CategoriaModel.estacao))).all()
+        self._estacoes = {categoria_id: estacao for categoria_id, estacao in linhas}
+        self._estacoes_versao = versao
+        logger.debug(f"Mapa de estações carregado: {len(self._estacoes)} categoria(s), versão {versao}")
+
+    async def invalidar_estacoes(self):
+        """Chamado após criar, alterar ou excluir categorias: todos os workers relerão o mapa."""
+        self._estacoes_versao = None
+        try:
+            client = await redis_service_instance.get_redis_client()
+            await client.incr(self._chave_estacoes_versao())
+        except Exception as e:
+            logger.warning(f"Falha ao invalidar o mapa de estações nos demais workers: {e}")
+
+    # --- Montagem dos itens ---
+
+    def estacao_do_produto(self, produto: Optional[ProdutoModel]) -> str:
+        """Estação que prepara o produto, pelo mapa em memória (sem consulta ao banco)."""
+        if produto is None or produto.categoria_id is None:
+            return ESTACAO_PADRAO
+        estacao = self._estacoes.get(produto.categoria_id, ESTACAO_PADRAO)
+        return estacao if estacao in ESTACOES else ESTACAO_PADRAO
+
+    def montar_item(self, item: ItemPedidoModel, pedido: PedidoModel, produto: Optional[ProdutoModel]) -> ItemFilaCozinha:
+        recebido_em = pedido.created_at or item.created_at or datetime.now()
+        return ItemFilaCozinha(
+            id=item.id,
+            pedido_id=pedido.id,
+            comanda_id=item.id_comanda,
+            mesa_id=pedido.mesa_id,
+            produto=produto.nome if produto else f"Produto {item.id_produto}",
+            quantidade=item.quantidade,
+            observacoes=item.observacoes,
+            status=(item.status or StatusPedidoEnum.RECEBIDO).value,
+            tipo_pedido=pedido.tipo_pedido.value,
+            recebido_em=recebido_em.isoformat(),
+            estacao=self.estacao_do_produto(produto),
+        )
+
+    async def montar_itens(
+        self, linhas: Iterable[Tuple[ItemPedidoModel, PedidoModel, Optional[ProdutoModel]]]
+    ) -> List[ItemFilaCozinha]:
+        """Itens da fila com a estação resolvida pelo mapa atualizado."""
+        await self.atualizar_estacoes()
+        return [self.montar_item(item, pedido, produto) for item, pedido, produto in linhas]
+
+    async def itens_do_pedido(self, pedido: PedidoModel) -> List[ItemFilaCozinha]:
+        """Itens em aberto de um pedido com itens e produtos já carregados."""
+        if pedido.status_geral_pedido not in PEDIDO_STATUS_ABERTOS:
+            return []
+        return await self.montar_itens(
+            (item, pedido, item.produto) for item in pedido.itens if item.status in ITEM_STATUS_ABERTOS
+        )
+
+    # --- Alterações ---
+
+    async def adicionar(self, itens: List[ItemFilaCozinha]):
+        """Coloca os itens na fila das suas estações (ou atualiza os que já estão lá)."""
+        if not itens:
+            return
+        try:
+            client = await redis_service_instance.get_redis_client()
+            grupos = _por_estacao(itens)
+            async with client.pipeline(transaction=True) as pipe:
+                for item in itens:
+                    pipe.hset(self._chave_itens(), item.id, item.model_dump_json(exclude={"status"}))
+                    pipe.hset(self._chave_status(), item.id, item.status)
+                    prioridade = datetime.fromisoformat(item.recebido_em).timestamp()
+                    pipe.zadd(self._chave_fila(item.estacao), {item.id: prioridade})
+                for estacao in grupos:
+                    pipe.incr(self._chave_versao(estacao))
+                resultados = await pipe.execute()
+            versoes = resultados[-len(grupos):]
+            for (estacao, do_grupo), versao in zip(grupos.items(), versoes):
+                await self._publicar(FilaCozinhaDelta(estacao=estacao, versao=versao, itens=do_grupo))
+        except Exception as e:
+            logger.warning(f"Falha ao adicionar {len(itens)} item(ns) à fila de preparo: {e}")
+
+    async def atualizar_status(self, item_ids: Iterable[int], status: StatusPedidoEnum):
+        """Altera o status exibido dos itens que estão na fila; os demais são ignorados."""
+        if status not in ITEM_STATUS_ABERTOS:
+            await self.remover(item_ids)
+            return
+        try:
+            client = await redis_service_instance.get_redis_client()
+            itens = await self._carregar(client, item_ids, status=status.value)
+            if not itens:
+                return
+            grupos = _por_estacao(itens)
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(self._chave_status(), mapping={item.id: item.status for item in itens})
+                for estacao in grupos:
+                    pipe.incr(self._chave_versao(estacao))
+                resultados = await pipe.execute()
+            for (estacao, do_grupo), versao in zip(grupos.items(), resultados[1:]):
+                await self._publicar(FilaCozinhaDelta(estacao=estacao, versao=versao, itens=do_grupo))
+        except Exception as e:
+            logger.warning(f"Falha ao atualizar o status de itens na fila de preparo: {e}")
+
+    async def remover(self, item_ids: Iterable[int]):
+        """Tira os itens das telas (prontos, entregues, cancelados ou excluídos)."""
+        try:
+            client = await redis_service_instance.get_redis_client()
+            itens = await self._carregar(client, item_ids)
+            if not itens:
+                return
+            grupos = _por_estacao(itens)
+            ids = [item.id for item in itens]
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hdel(self._chave_itens(), *ids)
+                pipe.hdel(self._chave_status(), *ids)
+                for estacao, do_grupo in grupos.items():
+                    pipe.zrem(self._chave_fila(estacao), *[item.id for item in do_grupo])
+                for estacao in grupos:
+                    pipe.incr(self._chave_versao(estacao))
+                resultados = await pipe.execute()
+            versoes = resultados[-len(grupos):]
+            for (estacao, do_grupo), versao in zip(grupos.items(), versoes):
+                removidos = [item.id for item in do_grupo]
+                await self._publicar(FilaCozinhaDelta(estacao=estacao, versao=versao, removidos=removidos))
+        except Exception as e:
+            logger.warning(f"Falha ao remover itens da fila de preparo: {e}")
+
+    async def aplicar_status_pedido(self, item_ids: Iterable[int], status_pedido: StatusPedido):
+        """Reflete nas telas a mudança de status de um pedido inteiro."""
+        if status_pedido == StatusPedido.EM_PREPARO:
+            await self.atualizar_status(item_ids, StatusPedidoEnum.PREPARANDO)
+        elif status_pedido not in PEDIDO_STATUS_ABERTOS:
+            await self.remover(item_ids)
+
+    async def _carregar(self, client, item_ids: Iterable[int], status: Optional[str] = None) -> List[ItemFilaCozinha]:
+        """Itens da fila com esses IDs; com status informado, já com o novo status."""
+        ids = list(item_ids)
+        if not ids:
+            return []
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hmget(self._chave_itens(), ids)
+            pipe.hmget(self._chave_status(), ids)
+            dados, status_atuais = await pipe.execute()
+        return [
+            ItemFilaCozinha(**json.loads(dado), status=status or status_atual or StatusPedidoEnum.RECEBIDO.value)
+            for dado, status_atual in zip(dados, status_atuais)
+            if dado is not None
+        ]
+
+    async def _publicar(self, payload):
+        message = WebSocketMessage(type="status_update", payload=payload)
+        await websocket_hub.publish(cozinha_channel(payload.estacao), message)
+
+    # --- Leitura ---
+
+    async def snapshot(self, estacao: str) -> FilaCozinhaSnapshot:
+        """Fila atual da estação. Sem alterações desde a última montagem, não sai deste worker além do GET da versão."""
+        client = await redis_service_instance.get_redis_client()
+        versao = int(await client.get(self._chave_versao(estacao)) or 0)
+        atual = self._snapshots.get(estacao)
+        if atual is not None and atual.versao == versao:
+            return atual
+
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.get(self._chave_versao(estacao))
+            pipe.zrange(self._chave_fila(estacao), 0, -1, withscores=True)
+            versao, membros = await pipe.execute()
+        ids = [membro for membro, _ in sorted(membros, key=lambda par: (par[1], int(par[0])))]
+        itens = await self._carregar(client, ids)
+        atual = FilaCozinhaSnapshot(estacao=estacao, versao=int(versao or 0), itens=itens)
+        self._snapshots[estacao] = atual
+        return atual
+
+    # --- Reconstrução a partir do banco ---
+
+    async def reconstruir(self, forcar: bool = False) -> bool:
+        """
+        Monta a fila a partir dos pedidos em aberto no Postgres. Sem forcar, só roda se o Redis
+        ainda não tiver a fila (primeiro startup ou Redis limpo). Apenas um worker reconstrói por vez.
+        """
+        client = await redis_service_instance.get_redis_client()
+        if not forcar and await client.exists(self._chave_carregada()):
+            return False
+        trava = f"{self.prefixo}reconstruindo"
+        if not await client.set(trava, "1", nx=True, ex=_LOCK_RECONSTRUCAO_SEGUNDOS):
+            return False
+        try:
+            async with AsyncSessionFactory() as db:
+                linhas = (await db.execute(
+                    select(ItemPedidoModel, PedidoModel, ProdutoModel)
+                    .join(PedidoModel, ItemPedidoModel.id_pedido == PedidoModel.id)
+                    .join(ProdutoModel, ItemPedidoModel.id_produto == ProdutoModel.id)
+                    .where(
+                        PedidoModel.status_geral_pedido.in_(PEDIDO_STATUS_ABERTOS),
+                        ItemPedidoModel.status.in_(ITEM_STATUS_ABERTOS),
+                    )
+                )).all()
+            await self.atualizar_estacoes(forcar=True)
+            itens = [self.montar_item(item, pedido, produto) for item, pedido, produto in linhas]
+
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(self._chave_itens(), self._chave_status(), *[self._chave_fila(e) for e in ESTACOES])
+                for item in itens:
+                    pipe.hset(self._chave_itens(), item.id, item.model_dump_json(exclude={"status"}))
+                    pipe.hset(self._chave_status(), item.id, item.status)
+                    prioridade = datetime.fromisoformat(item.recebido_em).timestamp()
+                    pipe.zadd(self._chave_fila(item.estacao), {item.id: prioridade})
+                for estacao in ESTACOES:
+                    pipe.incr(self._chave_versao(estacao))
+                pipe.set(self._chave_carregada(), datetime.now().isoformat())
+                await pipe.execute()
+            logger.info(f"Fila de preparo reconstruída com {len(itens)} item(ns) em aberto.")
+
+            # Telas já conectadas trocam o que têm pela fila reconstruída
+            for estacao in ESTACOES:
+                await self._publicar(await self.snapshot(estacao))
+            return True
+        finally:
+            await client.delete(trava)
+
+
+fila_cozinha_service = FilaCozinhaService()
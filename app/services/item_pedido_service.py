@@ -5,11 +5,14 @@ from fastapi import HTTPException, status
 from typing import List, Optional, Dict
 from datetime import datetime
 
+from app.core.notifications import manager as websocket_hub, status_channels
 from app.models.item_pedido import ItemPedido as ItemPedidoModel
 from app.models.pedido import Pedido as PedidoModel, StatusPedido
 from app.models.produto import Produto as ProdutoModel
 from app.schemas.item_pedido_schemas import ItemPedidoCreate, ItemPedidoUpdate
+from app.schemas.websocket_schemas import WebSocketMessage
 from app.services import produto_service, comanda_service
+from app.services.fila_cozinha_service import fila_cozinha_service
 from loguru import logger
 
 
@@ -102,6 +105,11 @@ class ItemPedidoService:
             await db.commit()
             await db.refresh(novo_item)
 
+            try:
+                await fila_cozinha_service.adicionar(await fila_cozinha_service.montar_itens([(novo_item, pedido, produto)]))
+            except Exception as e:
+                logger.warning(f"Erro ao enviar o item {novo_item.id} à tela de preparo (não crítico): {e}")
+
             return novo_item
         except HTTPException:
             raise
@@ -194,6 +202,10 @@ class ItemPedidoService:
             await db.commit()
             await db.refresh(item)
 
+            if item_update.status is not None:
+                await self._notificar_atualizacao_status_item(db, item)
+                await fila_cozinha_service.atualizar_status([item.id], item.status)
+
             return item
         except HTTPException:
             raise
@@ -262,6 +274,7 @@ class ItemPedidoService:
 
             # Commit das alterações
             await db.commit()
+            await fila_cozinha_service.remover([item_id])
 
             return True
         except Exception as e:
@@ -348,6 +361,35 @@ class ItemPedidoService:
                 detail=f"Erro interno ao obter item: {str(e)}"
             )
 
+    async def _notificar_atualizacao_status_item(self, db: AsyncSession, item: ItemPedidoModel):
+        """
+        Notifica a equipe e a comanda sobre a mudança de status de um item.
+        Passa pela janela de coalescência do hub, então marcar vários itens como prontos
+        em sequência gera uma única mensagem por canal.
+        """
+        try:
+            message = WebSocketMessage(
+                type="status_update",
+                payload={
+                    "tipo": "status_item_atualizado",
+                    "item_id": item.id,
+                    "pedido_id": item.id_pedido,
+                    "comanda_id": item.id_comanda,
+                    "novo_status": item.status.value,
+                    "timestamp": datetime.now().isoformat()
+                },
+                comanda_id=str(item.id_comanda),
+            )
+
+            # Atualiza o resumo da comanda e envia o patch aos clientes em modo diff
+            await comanda_service.publicar_alteracao_comanda(db, item.id_comanda)
+
+            entity_key = f"item:{item.id}"
+            for channel_id in status_channels(item.id_comanda, pedido_id=item.id_pedido):
+                await websocket_hub.publish_coalesced(channel_id, entity_key, message)
+        except Exception as e:
+            logger.warning(f"Erro ao notificar atualização de status do item (não crítico): {e}")
+
 
 # Instância do serviço para uso nas rotas
 item_pedido_service = ItemPedidoService()
\ No newline at end of file
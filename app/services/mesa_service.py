@@ -65,6 +65,13 @@ async def get_mesa(db_session: AsyncSession, mesa_id: int):
     return result.scalars().first()
 
 
+# Função para obter uma mesa pelo hash do QR code (acesso público)
+async def get_mesa_by_qr_code_hash(db_session: AsyncSession, qr_code_hash: str):
+    query = select(Mesa).where(Mesa.qr_code_hash == qr_code_hash)
+    result = await db_session.execute(query)
+    return result.scalars().first()
+
+
 # Função para obter todas as mesas
 async def get_mesas(db_session: AsyncSession, skip: int = 0, limit: int = 100):
     query = select(Mesa).offset(skip).limit(limit)
@@ -12,6 +12,8 @@ from app.models import Cliente, User, Pedido, Venda
 from app.models.comanda import Comanda, StatusComanda
 from app.models.fiado import Fiado, StatusFiado
 from app.schemas.pagamento_schemas import PagamentoCreateSchema, PagamentoUpdateSchema
+from app.services.comanda_service import marcar_alteracao_comanda, publicar_alteracao_comanda
+from app.services.relatorio_service import invalidar_rollup_horario
 
 
 # MODIFICAÇÃO: Função auxiliar atualizada para nova lógica onde valor_total_calculado é o saldo devedor restante
@@ -208,12 +210,14 @@ async def criar_pagamento(db_session: AsyncSession, pagamento_data: PagamentoCre
             db_session.add(novo_fiado_record)
 
         await db_session.flush()
+        await marcar_alteracao_comanda(db_session, comanda.id)
         await db_session.commit()
 
         await db_session.refresh(novo_pagamento)
         await db_session.refresh(comanda)
         if novo_fiado_record:
             await db_session.refresh(novo_fiado_record)
+        await publicar_alteracao_comanda(db_session, comanda.id)
 
         if comanda.id_cliente_associado and comanda.valor_total_calculado == Decimal("0.00"):
             cliente_query = select(Cliente).where(Cliente.id == comanda.id_cliente_associado)
@@ -342,10 +346,14 @@ async def atualizar_pagamento(db_session: AsyncSession, pagamento_id: int, dados
         if fiado_record_para_criar is not None:
             db_session.add(fiado_record_para_criar)
 
+        if atualizar_valores_comanda:
+            await marcar_alteracao_comanda(db_session, comanda.id)
         await db_session.commit()
         await db_session.refresh(pagamento_db)
         if atualizar_valores_comanda:
             await db_session.refresh(comanda)
+            await publicar_alteracao_comanda(db_session, comanda.id)
+        await invalidar_rollup_horario(pagamento_db.data_pagamento)
 
         return pagamento_db
     except HTTPException as http_exc:
@@ -410,7 +418,11 @@ async def deletar_pagamento(db_session: AsyncSession, pagamento_id: int):
         if fiado_record_para_deletar_stmt is not None:
             await db_session.execute(fiado_record_para_deletar_stmt)
 
+        data_pagamento = pagamento_db.data_pagamento
+        await marcar_alteracao_comanda(db_session, comanda.id)
         await db_session.commit()
+        await publicar_alteracao_comanda(db_session, comanda.id)
+        await invalidar_rollup_horario(data_pagamento)
 
         return {"message": f"Pagamento ID {pagamento_id} deletado com sucesso e valores da comanda atualizados."}
 
@@ -475,9 +487,11 @@ async def aplicar_credito_cliente_na_comanda(db_session: AsyncSession, comanda_i
 
         db_session.add(comanda)
         db_session.add(cliente)
+        await marcar_alteracao_comanda(db_session, comanda.id)
         await db_session.commit()
         await db_session.refresh(comanda)
         await db_session.refresh(cliente)
+        await publicar_alteracao_comanda(db_session, comanda.id)
 
         return {
             "message": f"Crédito de {credito_a_aplicar:.2f} aplicado com sucesso.",
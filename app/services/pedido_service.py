@@ -1,5 +1,5 @@
-import redis
-import json
+import asyncio
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update, delete
@@ -19,9 +19,11 @@ from app.models.mesa import Mesa as MesaModel
 from app.schemas.pedido_schemas import PedidoCreate, Pedido, ComandaEmPedido, UsuarioEmPedido, MesaEmPedido
 from app.schemas.item_pedido_schemas import ItemPedido as ItemPedidoSchema
 from app.services import comanda_service, produto_service
+from app.services.fila_cozinha_service import fila_cozinha_service
+from app.services.relatorio_service import invalidar_rollup_horario
 
-from app.services.redis_service import redis_service_instance, WebSocketMessage
-from app.schemas.websocket_schemas import ComandaStatusUpdatePayload, NotificationPayload
+from app.core.notifications import STAFF_NOTIFICATION_CHANNEL, manager as websocket_hub, status_channels
+from app.schemas.websocket_schemas import NotificationPayload, WebSocketMessage
 
 from loguru import logger
 
@@ -133,6 +135,12 @@ class PedidoService:
             result = await db.execute(query)
             pedido_completo = result.scalars().first()
 
+            # Leva cada item à fila da sua estação (cozinha, bar) antes de montar a resposta
+            try:
+                await fila_cozinha_service.adicionar(await fila_cozinha_service.itens_do_pedido(pedido_completo))
+            except Exception as e:
+                logger.warning(f"Erro ao enviar o pedido {novo_pedido.id} às telas de preparo (não crítico): {e}")
+
             # 7. CONVERTER PARA DICIONÁRIO
             pedido_dict = {
                 "id": pedido_completo.id,
@@ -177,24 +185,20 @@ class PedidoService:
 
             # 8. NOTIFICAÇÃO (opcional)
             try:
-                # Usar a instância de serviço Redis existente
-                # Assumindo que redis_service_instance é um cliente Redis assíncrono
-                # e que ele já lida com a conexão e disponibilidade.
-                # Se não for, o erro pode persistir e a refatoração de redis_service será necessária.
-
+                # Publica pelo hub de WebSockets, que usa o pool compartilhado do Redis
                 message = WebSocketMessage(
-                    type="NEW_ORDER",
+                    type="notification",
                     payload=NotificationPayload(
                         title="Novo Pedido Recebido!",
-                        body=f"Pedido #{pedido_data['id']} para comanda {pedido_data['comanda']['id']} foi criado.",
-                        data=pedido_data
-                    )
+                        message=f"Pedido #{novo_pedido.id} para comanda {comanda.id} foi criado.",
+                        details=pedido_dict
+                    ),
+                    comanda_id=str(comanda.id),
+                    target_role="garcom",
+                    mesa_id=str(novo_pedido.mesa_id) if novo_pedido.mesa_id else None,
                 )
-                redis_service_instance.publish(
-                    channel="new_orders",
-                    message=message.model_dump_json()
-                )
-                logger.info(f"Notificação de novo pedido {pedido_data['id']} enviada via Redis.")
+                await websocket_hub.publish(STAFF_NOTIFICATION_CHANNEL, message)
+                logger.info(f"Notificação de novo pedido {novo_pedido.id} enviada via Redis.")
             except Exception as e:
                 logger.warning(f"Erro ao notificar novo pedido via Redis (não crítico): {e}")
 
@@ -329,36 +333,7 @@ class PedidoService:
             )
 
         # Converter para dicionário para evitar acesso lazy fora do contexto assíncrono
-        pedido_dict = {
-            "id": pedido.id,
-            "id_comanda": pedido.id_comanda,
-            "id_usuario_registrou": pedido.id_usuario_registrou,
-            "mesa_id": pedido.mesa_id,
-            "tipo_pedido": pedido.tipo_pedido.value,
-            "status_geral_pedido": pedido.status_geral_pedido.value,
-            "observacoes_pedido": pedido.observacoes_pedido,
-            "motivo_cancelamento": pedido.motivo_cancelamento,
-            "created_at": pedido.created_at.isoformat() if pedido.created_at else None,
-            "updated_at": pedido.updated_at.isoformat() if pedido.updated_at else None,
-            "itens": []
-        }
-
-        # Adicionar itens ao dicionário
-        for item in pedido.itens:
-            item_dict = {
-                "id": item.id,
-                "id_pedido": item.id_pedido,
-                "id_comanda": item.id_comanda,
-                "id_produto": item.id_produto,
-                "quantidade": item.quantidade,
-                "preco_unitario": float(item.preco_unitario),
-                "preco_total": float(item.preco_total),
-                "observacoes": item.observacoes,
-                "status": item.status.value,
-                "created_at": item.created_at.isoformat() if item.created_at else None,
-                "updated_at": item.updated_at.isoformat() if item.updated_at else None
-            }
-            pedido_dict["itens"].append(item_dict)
+        pedido_dict = self._pedido_para_dict(pedido)
 
         return pedido_dict
 
@@ -403,47 +378,119 @@ class PedidoService:
                 item.status = StatusPedidoEnum.CANCELADO
                 item.updated_at = datetime.now()
 
-        # Commit das alterações
+        # Commit das alterações (a versão da comanda sobe na mesma transação)
+        await comanda_service.marcar_alteracao_comanda(db, pedido.id_comanda)
         await db.commit()
         await db.refresh(pedido)
 
         # Notificar sobre a atualização de status
-        await self._notificar_atualizacao_status_pedido(pedido)
+        await self._notificar_atualizacao_status_pedido(db, pedido)
+        await fila_cozinha_service.aplicar_status_pedido([item.id for item in pedido.itens], novo_status)
+        await invalidar_rollup_horario(pedido.created_at)
 
         # Converter para dicionário para evitar acesso lazy fora do contexto assíncrono
-        pedido_dict = {
-            "id": pedido.id,
-            "id_comanda": pedido.id_comanda,
-            "id_usuario_registrou": pedido.id_usuario_registrou,
-            "mesa_id": pedido.mesa_id,
-            "tipo_pedido": pedido.tipo_pedido.value,
-            "status_geral_pedido": pedido.status_geral_pedido.value,
-            "observacoes_pedido": pedido.observacoes_pedido,
-            "motivo_cancelamento": pedido.motivo_cancelamento,
-            "created_at": pedido.created_at.isoformat() if pedido.created_at else None,
-            "updated_at": pedido.updated_at.isoformat() if pedido.updated_at else None,
-            "itens": []
-        }
-
-        # Adicionar itens ao dicionário
-        for item in pedido.itens:
-            item_dict = {
-                "id": item.id,
-                "id_pedido": item.id_pedido,
-                "id_comanda": item.id_comanda,
-                "id_produto": item.id_produto,
-                "quantidade": item.quantidade,
-                "preco_unitario": float(item.preco_unitario),
-                "preco_total": float(item.preco_total),
-                "observacoes": item.observacoes,
-                "status": item.status.value,
-                "created_at": item.created_at.isoformat() if item.created_at else None,
-                "updated_at": item.updated_at.isoformat() if item.updated_at else None
-            }
-            pedido_dict["itens"].append(item_dict)
+        pedido_dict = self._pedido_para_dict(pedido)
 
         return pedido_dict, f"Status do pedido atualizado para {novo_status.value}"
 
+    async def atualizar_status_pedidos_em_lote(
+            self,
+            db: AsyncSession,
+            atualizacoes: List[Tuple[int, StatusPedido]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Atualiza o status de vários pedidos numa única transação.
+        Cada transição é validada individualmente; as válidas são aplicadas com um UPDATE por
+        status de destino e as inválidas voltam como falha, sem impedir as demais.
+        Retorna um resultado por pedido, na ordem recebida.
+        """
+        resultados: List[Dict[str, Any]] = []
+        vistos = set()
+        for pedido_id, novo_status in atualizacoes:
+            resultado = {"pedido_id": pedido_id, "sucesso": False, "status": None, "erro": None}
+            if pedido_id <= 0:
+                resultado["erro"] = "ID de pedido inválido"
+            elif pedido_id in vistos:
+                resultado["erro"] = "Pedido repetido no lote"
+            vistos.add(pedido_id)
+            resultados.append(resultado)
+
+        # Uma leitura para todos, travando as linhas até o commit para que a validação continue valendo
+        ids = [r["pedido_id"] for r in resultados if r["erro"] is None]
+        linhas = (await db.execute(
+            select(
+                PedidoModel.id, PedidoModel.id_comanda, PedidoModel.mesa_id,
+                PedidoModel.status_geral_pedido, PedidoModel.created_at,
+            )
+            .where(PedidoModel.id.in_(ids))
+            .with_for_update()
+        )).all() if ids else []
+        pedidos = {linha.id: linha for linha in linhas}
+
+        por_status: Dict[StatusPedido, List[int]] = {}
+        for (pedido_id, novo_status), resultado in zip(atualizacoes, resultados):
+            if resultado["erro"] is not None:
+                continue
+            pedido = pedidos.get(pedido_id)
+            if pedido is None:
+                resultado["erro"] = f"Pedido com ID {pedido_id} não encontrado"
+                continue
+            novo_status = StatusPedido(novo_status.value)
+            resultado["status"] = pedido.status_geral_pedido.value
+            if not self._validar_transicao_status(pedido.status_geral_pedido, novo_status):
+                resultado["erro"] = (
+                    f"Transição de status inválida: {pedido.status_geral_pedido.value} -> {novo_status.value}"
+                )
+                continue
+            por_status.setdefault(novo_status, []).append(pedido_id)
+            resultado.update(sucesso=True, status=novo_status.value)
+
+        if not por_status:
+            await db.rollback()
+            return resultados
+
+        agora = datetime.now()
+        for novo_status, pedido_ids in por_status.items():
+            await db.execute(
+                update(PedidoModel)
+                .where(PedidoModel.id.in_(pedido_ids))
+                .values(status_geral_pedido=novo_status, updated_at=agora)
+                .execution_options(synchronize_session=False)
+            )
+            # Mesma regra da atualização individual: pedido cancelado cancela os seus itens
+            if novo_status == StatusPedido.CANCELADO:
+                await db.execute(
+                    update(ItemPedidoModel)
+                    .where(ItemPedidoModel.id_pedido.in_(pedido_ids))
+                    .values(status=StatusPedidoEnum.CANCELADO, updated_at=agora)
+                    .execution_options(synchronize_session=False)
+                )
+        atualizados = [pedido_id for pedido_ids in por_status.values() for pedido_id in pedido_ids]
+        itens = (await db.execute(
+            select(ItemPedidoModel.id, ItemPedidoModel.id_pedido).where(ItemPedidoModel.id_pedido.in_(atualizados))
+        )).all()
+        await comanda_service.marcar_alteracao_comanda(
+            db, *sorted({pedidos[pedido_id].id_comanda for pedido_id in atualizados})
+        )
+        await db.commit()
+
+        novos_status = {pedido_id: novo_status for novo_status, pedido_ids in por_status.items() for pedido_id in pedido_ids}
+        await self._notificar_status_pedidos_em_lote(db, [pedidos[pedido_id] for pedido_id in atualizados], novos_status)
+
+        itens_por_status: Dict[StatusPedido, List[int]] = {}
+        for item_id, pedido_id in itens:
+            itens_por_status.setdefault(novos_status[pedido_id], []).append(item_id)
+        for novo_status, item_ids in itens_por_status.items():
+            try:
+                await fila_cozinha_service.aplicar_status_pedido(item_ids, novo_status)
+            except Exception as e:
+                logger.warning(f"Erro ao atualizar as telas de preparo (não crítico): {e}")
+
+        await invalidar_rollup_horario(*(pedidos[pedido_id].created_at for pedido_id in atualizados))
+
+        logger.info(f"Status atualizado em lote: {len(atualizados)} pedido(s), {len(resultados) - len(atualizados)} falha(s)")
+        return resultados
+
     async def cancelar_pedido(self, db: AsyncSession, pedido_id: int) -> Optional[Dict[str, Any]]:
         """
         Cancela um pedido e todos os seus itens.
@@ -497,38 +544,7 @@ class PedidoService:
         # Converter para lista de dicionários
         pedidos_list = []
         for pedido in pedidos:
-            pedido_dict = {
-                "id": pedido.id,
-                "id_comanda": pedido.id_comanda,
-                "id_usuario_registrou": pedido.id_usuario_registrou,
-                "mesa_id": pedido.mesa_id,
-                "tipo_pedido": pedido.tipo_pedido.value,
-                "status_geral_pedido": pedido.status_geral_pedido.value,
-                "observacoes_pedido": pedido.observacoes_pedido,
-                "motivo_cancelamento": pedido.motivo_cancelamento,
-                "created_at": pedido.created_at.isoformat() if pedido.created_at else None,
-                "updated_at": pedido.updated_at.isoformat() if pedido.updated_at else None,
-                "itens": []
-            }
-
-            # Adicionar itens ao dicionário
-            for item in pedido.itens:
-                item_dict = {
-                    "id": item.id,
-                    "id_pedido": item.id_pedido,
-                    "id_comanda": item.id_comanda,
-                    "id_produto": item.id_produto,
-                    "quantidade": item.quantidade,
-                    "preco_unitario": float(item.preco_unitario),
-                    "preco_total": float(item.preco_total),
-                    "observacoes": item.observacoes,
-                    "status": item.status.value,
-                    "created_at": item.created_at.isoformat() if item.created_at else None,
-                    "updated_at": item.updated_at.isoformat() if item.updated_at else None
-                }
-                pedido_dict["itens"].append(item_dict)
-
-            pedidos_list.append(pedido_dict)
+            pedidos_list.append(self._pedido_para_dict(pedido))
 
         return pedidos_list
 
@@ -570,6 +586,43 @@ class PedidoService:
 
         return novo_status in transicoes_validas.get(status_atual, [])
 
+    def _pedido_para_dict(self, pedido: PedidoModel) -> Dict[str, Any]:
+        """
+        Converte o pedido (com os itens já carregados) em dicionário de resposta.
+        """
+        pedido_dict = {
+            "id": pedido.id,
+            "id_comanda": pedido.id_comanda,
+            "id_usuario_registrou": pedido.id_usuario_registrou,
+            "mesa_id": pedido.mesa_id,
+            "tipo_pedido": pedido.tipo_pedido.value,
+            "status_geral_pedido": pedido.status_geral_pedido.value,
+            "observacoes_pedido": pedido.observacoes_pedido,
+            "motivo_cancelamento": pedido.motivo_cancelamento,
+            "created_at": pedido.created_at.isoformat() if pedido.created_at else None,
+            "updated_at": pedido.updated_at.isoformat() if pedido.updated_at else None,
+            "itens": []
+        }
+
+        # Adicionar itens ao dicionário
+        for item in pedido.itens:
+            item_dict = {
+                "id": item.id,
+                "id_pedido": item.id_pedido,
+                "id_comanda": item.id_comanda,
+                "id_produto": item.id_produto,
+                "quantidade": item.quantidade,
+                "preco_unitario": float(item.preco_unitario),
+                "preco_total": float(item.preco_total),
+                "observacoes": item.observacoes,
+                "status": item.status.value,
+                "created_at": item.created_at.isoformat() if item.created_at else None,
+                "updated_at": item.updated_at.isoformat() if item.updated_at else None
+            }
+            pedido_dict["itens"].append(item_dict)
+
+        return pedido_dict
+
 
 
     async def _notificar_novo_pedido_seguro(self, pedido_data: dict):
@@ -581,43 +634,79 @@ class PedidoService:
         except Exception as e:
             logger.warning(f"Falha na notificação Redis (não crítico): {e}")
 
-    async def _notificar_atualizacao_status_pedido(self, pedido):
+    @staticmethod
+    def _mensagem_status_pedido(
+            pedido_id: int, comanda_id: int, mesa_id: Optional[int], novo_status: StatusPedido
+    ) -> WebSocketMessage:
+        return WebSocketMessage(
+            type="status_update",
+            payload={
+                "tipo": "status_pedido_atualizado",
+                "pedido_id": pedido_id,
+                "comanda_id": comanda_id,
+                "novo_status": novo_status.value,
+                "timestamp": datetime.now().isoformat()
+            },
+            comanda_id=str(comanda_id),
+            # Na equipe, vai aos garçons da mesa (e gerentes); nos canais de cliente, a todos
+            target_role="garcom",
+            mesa_id=str(mesa_id) if mesa_id else None,
+        )
+
+    async def _notificar_atualizacao_status_pedido(self, db: AsyncSession, pedido):
         """
-        Notifica sobre atualização de status de pedido via Redis.
+        Notifica a equipe e a comanda sobre a atualização de status do pedido.
+        As atualizações passam pela janela de coalescência do hub: várias transições seguidas
+        do mesmo pedido chegam aos clientes como uma só, com o estado mais recente.
         """
         try:
-            if not self._verificar_redis_disponivel():
-                logger.info("Redis não disponível. Pulando notificação de atualização de status.")
-                return
-
-            redis_client = redis.Redis(
-                host='localhost',
-                port=6379,
-                db=0,
-                decode_responses=True,
-                socket_connect_timeout=2,
-                socket_timeout=2
+            message = self._mensagem_status_pedido(
+                pedido.id, pedido.id_comanda, pedido.mesa_id, pedido.status_geral_pedido
             )
 
-            # Preparar dados para notificação
-            message = {
-                "tipo": "status_pedido_atualizado",
-                "pedido_id": pedido.id,
-                "comanda_id": pedido.id_comanda,
-                "novo_status": pedido.status_geral_pedido.value,
-                "timestamp": datetime.now().isoformat()
-            }
-
-            message_json = json.dumps(message, default=str)
+            # Atualiza o resumo da comanda e envia o patch aos clientes em modo diff
+            await comanda_service.publicar_alteracao_comanda(db, pedido.id_comanda)
 
-            # Publicar no canal Redis
-            channel = "status_pedidos"
-            redis_client.publish(channel, message_json)
-            logger.info(f"Notificação de status atualizado publicada - Pedido ID: {pedido.id}")
+            entity_key = f"pedido:{pedido.id}"
+            for channel_id in status_channels(pedido.id_comanda, pedido_id=pedido.id, mesa_id=pedido.mesa_id):
+                await websocket_hub.publish_coalesced(channel_id, entity_key, message)
+            logger.info(f"Notificação de status atualizado enfileirada - Pedido ID: {pedido.id}")
 
         except Exception as e:
             logger.warning(f"Erro ao notificar atualização de status (não crítico): {e}")
 
+    async def _notificar_status_pedidos_em_lote(
+            self, db: AsyncSession, pedidos: List[Any], novos_status: Dict[int, StatusPedido]
+    ):
+        """
+        Notifica um lote de atualizações de status: cada canal (equipe, comanda, pedido, mesa)
+        recebe uma única mensagem status_batch com as atualizações que lhe dizem respeito,
+        e o resumo de cada comanda envolvida é publicado uma vez.
+        """
+        try:
+            por_canal: Dict[str, Dict[str, WebSocketMessage]] = {}
+            for pedido in pedidos:
+                message = self._mensagem_status_pedido(
+                    pedido.id, pedido.id_comanda, pedido.mesa_id, novos_status[pedido.id]
+                )
+                for channel_id in status_channels(pedido.id_comanda, pedido_id=pedido.id, mesa_id=pedido.mesa_id):
+                    por_canal.setdefault(channel_id, {})[f"pedido:{pedido.id}"] = message
+
+            for comanda_id in sorted({pedido.id_comanda for pedido in pedidos}):
+                await comanda_service.publicar_alteracao_comanda(db, comanda_id)
+
+            resultados = await asyncio.gather(
+                *(websocket_hub.publish_batch(channel_id, updates) for channel_id, updates in por_canal.items()),
+                return_exceptions=True,
+            )
+            falhas = [r for r in resultados if isinstance(r, Exception)]
+            if falhas:
+                logger.warning(f"Falha ao notificar {len(falhas)} canal(is) do lote de status: {falhas[0]}")
+            logger.info(f"Notificação de status em lote enviada - {len(pedidos)} pedido(s), {len(por_canal)} canal(is)")
+
+        except Exception as e:
+            logger.warning(f"Erro ao notificar atualização de status em lote (não crítico): {e}")
+
 
 # Instância do serviço para uso nas rotas
 pedido_service = PedidoService()
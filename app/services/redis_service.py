@@ -1,57 +1,205 @@
 # app/services/redis_service.py
+import asyncio
 import redis.asyncio as redis
+from redis.asyncio.client import PubSub
 import json
-from typing import Any, Optional
+from typing import Any, Callable, List, Optional, Tuple
 from app.core.config.settings import settings # Supondo que settings.REDIS_URL exista
 from app.schemas.websocket_schemas import WebSocketMessage
 from loguru import logger
 
+# Grava o evento no stream (com tamanho limitado) e publica "<id do evento>|<dados>" no canal,
+# de forma atômica, para que a entrega ao vivo e o histórico usem o mesmo ID
+PUBLISH_EVENT_SCRIPT = """
+local event_id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('PUBLISH', KEYS[2], event_id .. '|' .. ARGV[2])
+return event_id
+"""
+
+
+def parse_stream_id(event_id: str) -> Tuple[int, int]:
+    """Converte um ID de Redis Stream ("1700000000000-0") em tupla comparável."""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
 class RedisService:
+    """
+    Cliente Redis assíncrono único da aplicação, apoiado em um pool de conexões.
+
+    O pool é aberto e fechado pelo lifespan (app/main.py) e verifica a saúde das conexões
+    ociosas antes de reutilizá-las (health_check_interval). Publicações feitas na mesma
+    volta do event loop são enviadas juntas em um único pipeline.
+
+    publish_event() também grava o evento em um Redis Stream limitado, permitindo que clientes
+    que reconectam recuperem o que perderam com read_stream_after().
+    """
+
     def __init__(self):
         self.redis_url = settings.REDIS_URL
+        self._pool: Optional[redis.ConnectionPool] = None
         self._redis_client: Optional[redis.Redis] = None
+        # Cliente separado para assinaturas (ver get_pubsub)
+        self._pubsub_client: Optional[redis.Redis] = None
+        self._publish_event_script = None
+        self._connect_lock = asyncio.Lock()
+        # Comandos aguardando o próximo envio em pipeline: (descrição, comando, futuro do chamador)
+        self._pending_publishes: List[Tuple[str, Callable[[Any], Any], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
 
-    async def get_redis_client(self) -> redis.Redis:
-        if self._redis_client is None or not self._redis_client.is_connected:
+    async def connect(self) -> redis.Redis:
+        """Cria o pool de conexões e valida o acesso ao Redis. Chamado no startup da aplicação."""
+        async with self._connect_lock:
+            if self._redis_client is not None:
+                return self._redis_client
+            pool = redis.ConnectionPool.from_url(
+                self.redis_url,
+                encoding="utf-8",
+                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_keepalive=True,
+            )
+            client = redis.Redis(connection_pool=pool)
             try:
-                self._redis_client = await redis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
-                await self._redis_client.ping() # Verificar conexão
-                logger.info("Conectado ao Redis com sucesso.")
+                await client.ping() # Verificar conexão
             except Exception as e:
                 logger.error(f"Falha ao conectar ao Redis: {e}")
-                # Em um cenário real, poderia tentar reconectar ou levantar uma exceção crítica
-                # Por agora, vamos permitir que falhe e as operações subsequentes também falharão.
-                self._redis_client = None # Garante que não tentaremos usar um cliente falho
+                await pool.aclose()
                 raise # Re-levanta a exceção para que o chamador saiba da falha
+            self._pool = pool
+            self._redis_client = client
+            self._publish_event_script = client.register_script(PUBLISH_EVENT_SCRIPT)
+            logger.info(f"Conectado ao Redis com sucesso (pool de até {settings.REDIS_MAX_CONNECTIONS} conexões).")
+            return client
+
+    async def get_redis_client(self) -> redis.Redis:
+        # O cliente é criado uma única vez; se o startup não conseguiu conectar, tenta novamente aqui
+        if self._redis_client is None:
+            return await self.connect()
         return self._redis_client
 
-    async def publish_message(self, channel: str, message: WebSocketMessage):
+    async def publish(self, channel: str, data: str) -> int:
+        """
+        Publica dados já serializados em um canal.
+        A publicação entra no pipeline da volta atual do event loop; o retorno é o número de assinantes.
+        Falhas de conexão são propagadas ao chamador.
+        """
+        return await self._enqueue(channel, lambda pipe: pipe.publish(channel, data))
+
+    async def publish_event(self, stream_key: str, channel: str, data: str, maxlen: int) -> str:
+        """
+        Grava o evento no stream (aprox. maxlen entradas) e o publica no canal como "<id>|<dados>".
+        Segue no mesmo pipeline das demais publicações; retorna o ID do evento no stream.
+        """
+        await self.get_redis_client()
+        script = self._publish_event_script
+        return await self._enqueue(
+            channel, lambda pipe: script(keys=[stream_key, channel], args=[maxlen, data], client=pipe)
+        )
+
+    async def read_stream_after(self, stream_key: str, last_event_id: str, count: int) -> Tuple[List[Tuple[str, str]], bool]:
+        """
+        Lê os eventos do stream posteriores a last_event_id, em ordem.
+        Retorna (eventos, completo). completo=False indica que parte do histórico foi descartada
+        pelo limite do stream ou que há mais de `count` eventos pendentes.
+        """
         client = await self.get_redis_client()
-        if not client:
-            logger.error("Cliente Redis não disponível. Não foi possível publicar a mensagem.")
-            return
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.xrange(stream_key, min="-", max="+", count=1)
+            pipe.xrange(stream_key, min=f"({last_event_id}", max="+", count=count + 1)
+            primeiro, entradas = await pipe.execute()
+
+        completo = len(entradas) <= count
+        if primeiro and parse_stream_id(primeiro[0][0]) > parse_stream_id(last_event_id):
+            # O evento mais antigo ainda guardado é posterior ao último visto: houve descarte
+            completo = False
+        eventos = [(event_id, campos["data"]) for event_id, campos in entradas[:count]]
+        return eventos, completo
+
+    async def _enqueue(self, channel: str, command: Callable[[Any], Any]):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_publishes.append((channel, command, future))
+        if self._flush_task is None:
+            # A tarefa só executa depois dos callbacks já agendados: tudo o que for publicado
+            # nesta volta do loop segue no mesmo pipeline
+            self._flush_task = loop.create_task(self._flush_publishes())
+        return await future
+
+    async def _flush_publishes(self):
+        batch, self._pending_publishes = self._pending_publishes, []
+        self._flush_task = None
         try:
-            await client.publish(channel, message.model_dump_json())
-            logger.info(f"Mensagem publicada no canal {channel}: {message.type}")
+            client = await self.get_redis_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for _, command, _ in batch:
+                    queued = command(pipe)
+                    if asyncio.iscoroutine(queued):
+                        await queued  # Scripts (evalsha) são enfileirados de forma assíncrona
+                results = await pipe.execute(raise_on_error=False)
         except Exception as e:
-            logger.error(f"Erro ao publicar mensagem no Redis no canal {channel}: {e}")
+            logger.error(f"Erro ao publicar {len(batch)} mensagem(ns) no Redis: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (channel, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                logger.error(f"Erro ao publicar mensagem no Redis no canal {channel}: {result}")
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        if len(batch) > 1:
+            logger.debug(f"{len(batch)} mensagens publicadas no Redis em um único pipeline.")
+
+    async def publish_message(self, channel: str, message: WebSocketMessage):
+        await self.publish(channel, message.model_dump_json())
+        logger.info(f"Mensagem publicada no canal {channel}: {message.type}")
+
+    def get_pubsub(self, **kwargs) -> PubSub:
+        """
+        PubSub num cliente próprio, sem socket_timeout: uma assinatura passa longos períodos sem
+        mensagens, e com o timeout do pool compartilhado a leitura de um canal quieto falharia a
+        cada REDIS_SOCKET_TIMEOUT_SECONDS. O health_check_interval continua enviando PING, e
+        detecta conexões mortas, sempre que o leitor usa get_message(timeout=...).
+        """
+        if self._pubsub_client is None:
+            self._pubsub_client = redis.Redis.from_url(
+                self.redis_url,
+                encoding="utf-8",
+                decode_responses=True,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+                socket_timeout=None,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_keepalive=True,
+            )
+        return self._pubsub_client.pubsub(**kwargs)
 
     async def subscribe_to_channel(self, channel: str):
-        client = await self.get_redis_client()
-        if not client:
-            logger.error("Cliente Redis não disponível. Não foi possível inscrever-se no canal.")
-            return None # Ou levantar uma exceção
-        
-        pubsub = client.pubsub()
+        pubsub = self.get_pubsub()
         await pubsub.subscribe(channel)
         logger.info(f"Inscrito no canal Redis: {channel}")
         return pubsub
 
     async def close_redis_client(self):
-        if self._redis_client and self._redis_client.is_connected:
-            await self._redis_client.close()
-            logger.info("Conexão com Redis fechada.")
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self._redis_client is not None:
+            await self._redis_client.aclose()
+            await self._pool.aclose()
+            logger.info("Pool de conexões do Redis fechado.")
             self._redis_client = None
+            self._publish_event_script = None
+            self._pool = None
+        if self._pubsub_client is not None:
+            await self._pubsub_client.aclose()
+            self._pubsub_client = None
 
 # Instância global do serviço Redis para ser usada na aplicação
 redis_service_instance = RedisService()
@@ -64,4 +212,3 @@ async def get_redis_service() -> RedisService:
 # Exemplo de como usar:
 # from app.services.redis_service import redis_service_instance
 # await redis_service_instance.publish_message("canal_de_teste", WebSocketMessage(type="info", payload={"data": "Olá Mundo"}))
-
@@ -1,17 +1,30 @@
+import json
+import numpy as np
+from loguru import logger
+from sqlalchemy import Date, and_, case, cast, extract, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import date
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
 from app.models.fiado import Fiado  # Ajuste conforme seu modelo de Fiado
 from app.models.venda import Venda  # Ajuste conforme seu modelo de Venda
 from app.models.produto import Produto  # Ajuste conforme seu modelo de Produto
 from app.models.pedido import Pedido  # Ajuste conforme seu modelo de Pedido
+from app.models.pedido import StatusPedido
+from app.models.comanda import Comanda
+from app.models.item_pedido import ItemPedido, StatusPedidoEnum
+from app.models.pagamento import Pagamento, MetodoPagamento, StatusPagamento
+from app.models.user import User
 from app.schemas.relatorio_schemas import (
     RelatorioFiadoSchemas,
     RelatorioVendasSchemas,
     RelatorioProdutosVendidosSchemas,
     RelatorioPedidosPorStatusSchemas,
     RelatorioPedidosPorUsuarioSchemas, ProdutoVendidoSchemas, PedidoDetalhadoSchemas, PedidoStatusSchemas, VendaSchemas,
-    FiadoSchemas,
+    FiadoSchemas, MetricasPeriodoSchemas, RelatorioComparativoSchemas, RelatorioHeatmapSchemas,
+    DesempenhoUsuarioSchemas, RelatorioDesempenhoEquipeSchemas,
 )
+from app.services.redis_service import redis_service_instance
 
 # Serviço para Relatório de Fiados
 def get_relatorio_fiado(db: Session, data_inicio: date, data_fim: date) -> RelatorioFiadoSchemas:
@@ -130,3 +143,418 @@ def get_relatorio_pedidos_por_usuario(db: Session, usuario_id: int, data_inicio:
         nome_usuario="Nome do Usuário",  # Ajuste para pegar o nome real do usuário
         pedidos=pedidos_detalhados
     )
+
+
+# Serviço para Relatório Comparativo entre Períodos
+Periodo = Tuple[date, date]
+
+
+def _filtro_periodos(coluna, periodos: Sequence[Periodo]):
+    """Monta o filtro SQL (OR) que cobre todos os períodos, com o dia final inclusivo."""
+    return or_(*[
+        and_(
+            coluna >= datetime.combine(inicio, time.min),
+            coluna < datetime.combine(fim + timedelta(days=1), time.min),
+        )
+        for inicio, fim in periodos
+    ])
+
+
+def _rotular_periodos(datas: np.ndarray, periodos: Sequence[Periodo]) -> np.ndarray:
+    """Retorna, para cada data, o índice do período a que pertence (-1 se nenhum)."""
+    rotulos = np.full(datas.shape, -1, dtype=np.int64)
+    # Percorre de trás para frente para que o período atual (índice 0) prevaleça em sobreposições
+    for indice in range(len(periodos) - 1, -1, -1):
+        inicio, fim = periodos[indice]
+        mascara = (datas >= np.datetime64(inicio, "D")) & (datas <= np.datetime64(fim, "D"))
+        rotulos[mascara] = indice
+    return rotulos
+
+
+def _colunas(rows: List[tuple], tipos: Sequence[str]) -> List[np.ndarray]:
+    """Transforma as linhas do resultado em um array NumPy por coluna."""
+    if not rows:
+        return [np.empty(0, dtype=tipo) for tipo in tipos]
+    return [np.asarray(coluna, dtype=tipo) for coluna, tipo in zip(zip(*rows), tipos)]
+
+
+def _dividir(numerador: np.ndarray, denominador: np.ndarray) -> np.ndarray:
+    return np.divide(numerador, denominador, out=np.zeros_like(numerador, dtype=np.float64), where=denominador != 0)
+
+
+def _variacao_percentual(atual: float, anterior: float) -> Optional[float]:
+    if anterior == 0:
+        return None
+    return round((atual - anterior) / abs(anterior) * 100, 2)
+
+
+async def get_relatorio_comparativo(
+    db: AsyncSession,
+    comparacao: str,
+    periodo_atual: Periodo,
+    periodo_anterior: Periodo,
+) -> RelatorioComparativoSchemas:
+    """
+    Compara dois períodos em uma única passada vetorizada.
+    Busca as colunas de itens e de pagamentos dos dois períodos uma só vez e calcula
+    todas as métricas com NumPy, em vez de uma consulta por métrica.
+    """
+    periodos = (periodo_atual, periodo_anterior)
+    n = len(periodos)
+
+    itens_result = await db.execute(
+        select(
+            ItemPedido.id_comanda,
+            cast(ItemPedido.created_at, Date),
+            ItemPedido.quantidade,
+            ItemPedido.preco_total,
+            Comanda.percentual_taxa_servico,
+            Comanda.valor_desconto,
+        )
+        .join(Comanda, Comanda.id == ItemPedido.id_comanda)
+        .where(
+            ItemPedido.status != StatusPedidoEnum.CANCELADO,
+            _filtro_periodos(ItemPedido.created_at, periodos),
+        )
+    )
+    id_comanda, data_item, quantidade, preco_total, percentual_taxa, desconto_comanda = _colunas(
+        itens_result.all(), ("int64", "datetime64[D]", "float64", "float64", "float64", "float64")
+    )
+
+    pagamentos_result = await db.execute(
+        select(
+            cast(Pagamento.data_pagamento, Date),
+            Pagamento.valor_pago,
+            case((Pagamento.metodo_pagamento == MetodoPagamento.FIADO, Pagamento.valor_pago), else_=0),
+        )
+        .where(
+            Pagamento.status_pagamento == StatusPagamento.APROVADO,
+            _filtro_periodos(Pagamento.data_pagamento, periodos),
+        )
+    )
+    data_pagamento, valor_pago, valor_fiado = _colunas(
+        pagamentos_result.all(), ("datetime64[D]", "float64", "float64")
+    )
+
+    # Itens: receita, quantidade e taxa de serviço por período
+    rotulo_item = _rotular_periodos(data_item, periodos)
+    validos = rotulo_item >= 0
+    rotulo_item, id_comanda = rotulo_item[validos], id_comanda[validos]
+    receita = np.bincount(rotulo_item, weights=preco_total[validos], minlength=n)
+    itens = np.bincount(rotulo_item, weights=quantidade[validos], minlength=n)
+    taxa_servico = np.bincount(
+        rotulo_item, weights=preco_total[validos] * percentual_taxa[validos] / 100, minlength=n
+    )
+
+    # Comandas distintas por período (o desconto é da comanda, então entra uma vez só)
+    _, primeira_ocorrencia = np.unique(id_comanda * n + rotulo_item, return_index=True)
+    rotulo_comanda = rotulo_item[primeira_ocorrencia]
+    total_comandas = np.bincount(rotulo_comanda, minlength=n)
+    desconto = np.bincount(rotulo_comanda, weights=desconto_comanda[validos][primeira_ocorrencia], minlength=n)
+
+    # Pagamentos: total recebido e parcela em fiado por período
+    rotulo_pagamento = _rotular_periodos(data_pagamento, periodos)
+    validos = rotulo_pagamento >= 0
+    recebido = np.bincount(rotulo_pagamento[validos], weights=valor_pago[validos], minlength=n)
+    fiado = np.bincount(rotulo_pagamento[validos], weights=valor_fiado[validos], minlength=n)
+
+    ticket_medio = _dividir(receita, total_comandas)
+    itens_por_comanda = _dividir(itens, total_comandas)
+    participacao_fiado = _dividir(fiado, recebido) * 100
+
+    metricas = [
+        MetricasPeriodoSchemas(
+            data_inicio=inicio,
+            data_fim=fim,
+            receita=round(float(receita[i]), 2),
+            total_comandas=int(total_comandas[i]),
+            ticket_medio=round(float(ticket_medio[i]), 2),
+            itens_por_comanda=round(float(itens_por_comanda[i]), 2),
+            taxa_servico=round(float(taxa_servico[i]), 2),
+            desconto=round(float(desconto[i]), 2),
+            total_recebido=round(float(recebido[i]), 2),
+            valor_fiado=round(float(fiado[i]), 2),
+            participacao_fiado=round(float(participacao_fiado[i]), 2),
+        )
+        for i, (inicio, fim) in enumerate(periodos)
+    ]
+
+    atual, anterior = metricas
+    campos = ("receita", "total_comandas", "ticket_medio", "itens_por_comanda",
+              "taxa_servico", "desconto", "total_recebido", "participacao_fiado")
+    variacao: Dict[str, Optional[float]] = {
+        campo: _variacao_percentual(getattr(atual, campo), getattr(anterior, campo)) for campo in campos
+    }
+
+    return RelatorioComparativoSchemas(
+        comparacao=comparacao,
+        periodo_atual=atual,
+        periodo_anterior=anterior,
+        variacao_percentual=variacao,
+    )
+
+
+# Serviço para Relatório Heatmap (dia da semana x hora do dia)
+DIAS_SEMANA = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+HEATMAP_CACHE_PREFIX = "relatorio:heatmap:dia:"
+HEATMAP_CACHE_TTL_SEGUNDOS = 60 * 60 * 24 * 30
+# Dias recentes ainda recebem ajustes (pagamentos estornados, itens e status corrigidos) por caminhos
+# que não invalidam o cache: ficam nele por pouco tempo
+HEATMAP_DIAS_RECENTES = 7
+HEATMAP_CACHE_TTL_RECENTE_SEGUNDOS = 10 * 60
+
+# Pedidos cujo ciclo de preparo já terminou (updated_at marca a última transição)
+STATUS_PREPARO_CONCLUIDO = [
+    StatusPedido.PRONTO_PARA_ENTREGA,
+    StatusPedido.ENTREGUE_NA_MESA,
+    StatusPedido.SAIU_PARA_ENTREGA_EXTERNA,
+    StatusPedido.ENTREGUE_CLIENTE_EXTERNO,
+]
+
+# Índices do acumulado por hora: [pedidos, receita, soma_preparo_segundos, pedidos_com_preparo, recebido]
+RollupHorario = Dict[str, List[float]]
+
+
+async def _calcular_rollup_horario(db: AsyncSession, data_inicio: date, data_fim: date) -> Dict[date, RollupHorario]:
+    """Agrega pedidos, itens e pagamentos por hora (date_trunc) no banco, agrupando o resultado por dia."""
+    inicio = datetime.combine(data_inicio, time.min)
+    fim = datetime.combine(data_fim + timedelta(days=1), time.min)
+
+    receita_por_pedido = (
+        select(ItemPedido.id_pedido, func.sum(ItemPedido.preco_total).label("receita"))
+        .where(ItemPedido.status != StatusPedidoEnum.CANCELADO)
+        .group_by(ItemPedido.id_pedido)
+        .subquery()
+    )
+    hora_pedido = func.date_trunc("hour", Pedido.created_at)
+    preparo_concluido = Pedido.status_geral_pedido.in_(STATUS_PREPARO_CONCLUIDO)
+    pedidos_result = await db.execute(
+        select(
+            hora_pedido,
+            func.count(Pedido.id),
+            func.coalesce(func.sum(receita_por_pedido.c.receita), 0),
+            func.coalesce(func.sum(case(
+                (preparo_concluido, extract("epoch", Pedido.updated_at - Pedido.created_at)),
+            )), 0),
+            func.count(case((preparo_concluido, Pedido.id))),
+        )
+        .outerjoin(receita_por_pedido, receita_por_pedido.c.id_pedido == Pedido.id)
+        .where(
+            Pedido.created_at >= inicio,
+            Pedido.created_at < fim,
+            Pedido.status_geral_pedido != StatusPedido.CANCELADO,
+        )
+        .group_by(hora_pedido)
+    )
+
+    hora_pagamento = func.date_trunc("hour", Pagamento.data_pagamento)
+    pagamentos_result = await db.execute(
+        select(hora_pagamento, func.sum(Pagamento.valor_pago))
+        .where(
+            Pagamento.data_pagamento >= inicio,
+            Pagamento.data_pagamento < fim,
+            Pagamento.status_pagamento == StatusPagamento.APROVADO,
+        )
+        .group_by(hora_pagamento)
+    )
+
+    rollup: Dict[date, RollupHorario] = {}
+    for hora, pedidos, receita, soma_preparo, com_preparo in pedidos_result.all():
+        acumulado = rollup.setdefault(hora.date(), {}).setdefault(hora.isoformat(), [0, 0.0, 0.0, 0, 0.0])
+        acumulado[0] += int(pedidos)
+        acumulado[1] += float(receita)
+        acumulado[2] += float(soma_preparo)
+        acumulado[3] += int(com_preparo)
+    for hora, recebido in pagamentos_result.all():
+        acumulado = rollup.setdefault(hora.date(), {}).setdefault(hora.isoformat(), [0, 0.0, 0.0, 0, 0.0])
+        acumulado[4] += float(recebido or 0)
+    return rollup
+
+
+def _trechos_continuos(dias: Sequence[date]) -> List[Tuple[date, date]]:
+    """Agrupa dias em intervalos [inicio, fim] de dias consecutivos."""
+    trechos: List[Tuple[date, date]] = []
+    for dia in sorted(dias):
+        if trechos and dia - trechos[-1][1] == timedelta(days=1):
+            trechos[-1] = (trechos[-1][0], dia)
+        else:
+            trechos.append((dia, dia))
+    return trechos
+
+
+def _ttl_rollup(dia: date, hoje: date) -> int:
+    if (hoje - dia).days <= HEATMAP_DIAS_RECENTES:
+        return HEATMAP_CACHE_TTL_RECENTE_SEGUNDOS
+    return HEATMAP_CACHE_TTL_SEGUNDOS
+
+
+async def invalidar_rollup_horario(*momentos: Optional[datetime]):
+    """
+    Descarta do cache do heatmap os dias desses momentos. Chamado após alterações que mexem em
+    dias passados: pagamentos alterados ou excluídos e mudanças de status de pedidos antigos.
+    """
+    hoje = date.today()
+    dias = {momento.date() for momento in momentos if momento is not None and momento.date() < hoje}
+    if not dias:
+        return
+    try:
+        client = await redis_service_instance.get_redis_client()
+        await client.delete(*[f"{HEATMAP_CACHE_PREFIX}{dia.isoformat()}" for dia in sorted(dias)])
+    except Exception as e:
+        logger.warning(f"Falha ao invalidar o cache do heatmap: {e}")
+
+
+async def _obter_rollup_horario(db: AsyncSession, data_inicio: date, data_fim: date) -> Dict[date, RollupHorario]:
+    """
+    Retorna o acumulado por hora de cada dia do intervalo.
+    Dias já encerrados ficam em cache no Redis; somente os dias ausentes (e o dia atual) vão ao banco,
+    uma consulta por sequência contínua de dias ausentes.
+    """
+    hoje = date.today()
+    dias = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+    dias_fechados = [dia for dia in dias if dia < hoje]
+
+    rollup: Dict[date, RollupHorario] = {}
+    client = None
+    try:
+        client = await redis_service_instance.get_redis_client()
+        if dias_fechados:
+            valores = await client.mget([f"{HEATMAP_CACHE_PREFIX}{dia.isoformat()}" for dia in dias_fechados])
+            for dia, valor in zip(dias_fechados, valores):
+                if valor is not None:
+                    rollup[dia] = json.loads(valor)
+    except Exception as e:
+        logger.warning(f"Cache do heatmap indisponível, calculando direto no banco: {e}")
+        client = None
+
+    faltantes = [dia for dia in dias if dia not in rollup]
+    if not faltantes:
+        return rollup
+
+    # Um intervalo por sequência de dias faltantes: as pontas de um ano não recalculam o ano inteiro
+    for inicio_trecho, fim_trecho in _trechos_continuos(faltantes):
+        calculado = await _calcular_rollup_horario(db, inicio_trecho, fim_trecho)
+        for offset in range((fim_trecho - inicio_trecho).days + 1):
+            dia = inicio_trecho + timedelta(days=offset)
+            rollup[dia] = calculado.get(dia, {})
+
+    if client is not None:
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for dia in faltantes:
+                    if dia < hoje:
+                        pipe.set(f"{HEATMAP_CACHE_PREFIX}{dia.isoformat()}", json.dumps(rollup[dia]),
+                                 ex=_ttl_rollup(dia, hoje))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache do heatmap: {e}")
+    return rollup
+
+
+async def get_relatorio_heatmap(db: AsyncSession, data_inicio: date, data_fim: date) -> RelatorioHeatmapSchemas:
+    """Monta as matrizes 7x24 (dia da semana x hora) de pedidos, receita, valor recebido e tempo médio de preparo."""
+    rollup = await _obter_rollup_horario(db, data_inicio, data_fim)
+
+    pedidos = [[0] * 24 for _ in range(7)]
+    receita = [[0.0] * 24 for _ in range(7)]
+    recebido = [[0.0] * 24 for _ in range(7)]
+    soma_preparo = [[0.0] * 24 for _ in range(7)]
+    com_preparo = [[0] * 24 for _ in range(7)]
+
+    for horas in rollup.values():
+        for hora_iso, (n_pedidos, valor_receita, segundos, n_preparo, valor_recebido) in horas.items():
+            hora = datetime.fromisoformat(hora_iso)
+            dia_semana, h = hora.weekday(), hora.hour
+            pedidos[dia_semana][h] += int(n_pedidos)
+            receita[dia_semana][h] += valor_receita
+            recebido[dia_semana][h] += valor_recebido
+            soma_preparo[dia_semana][h] += segundos
+            com_preparo[dia_semana][h] += int(n_preparo)
+
+    tempo_medio = [
+        [round(soma_preparo[d][h] / com_preparo[d][h] / 60, 2) if com_preparo[d][h] else None for h in range(24)]
+        for d in range(7)
+    ]
+
+    return RelatorioHeatmapSchemas(
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+        dias_semana=DIAS_SEMANA,
+        horas=list(range(24)),
+        pedidos=pedidos,
+        receita=[[round(v, 2) for v in linha] for linha in receita],
+        valor_recebido=[[round(v, 2) for v in linha] for linha in recebido],
+        tempo_medio_preparo_minutos=tempo_medio,
+    )
+
+
+# Serviço para Relatório de Desempenho da Equipe
+def _nome_usuario(first_name: Optional[str], last_name: Optional[str], username: Optional[str],
+                  email: Optional[str]) -> str:
+    nome_completo = " ".join(parte for parte in (first_name, last_name) if parte)
+    return nome_completo or username or email or "Não informado"
+
+
+async def get_relatorio_desempenho_equipe(db: AsyncSession, data_inicio: date,
+                                          data_fim: date) -> RelatorioDesempenhoEquipeSchemas:
+    """
+    Desempenho de todos os usuários no período em uma única consulta agregada:
+    pedidos, itens, receita, cancelamentos e tempo médio de Recebido até Entregue na Mesa.
+    O número de consultas não depende do tamanho da equipe nem do período.
+    """
+    inicio = datetime.combine(data_inicio, time.min)
+    fim = datetime.combine(data_fim + timedelta(days=1), time.min)
+
+    itens_por_pedido = (
+        select(
+            ItemPedido.id_pedido,
+            func.sum(ItemPedido.quantidade).label("itens"),
+            func.sum(ItemPedido.preco_total).label("receita"),
+        )
+        .where(ItemPedido.status != StatusPedidoEnum.CANCELADO)
+        .group_by(ItemPedido.id_pedido)
+        .subquery()
+    )
+    cancelado = Pedido.status_geral_pedido == StatusPedido.CANCELADO
+    entregue = Pedido.status_geral_pedido == StatusPedido.ENTREGUE_NA_MESA
+
+    # updated_at de um pedido Entregue na Mesa é o momento da entrega (é a última transição possível, exceto cancelamento)
+    result = await db.execute(
+        select(
+            Pedido.id_usuario_registrou,
+            User.first_name,
+            User.last_name,
+            User.username,
+            User.email,
+            func.count(Pedido.id),
+            func.coalesce(func.sum(case((~cancelado, itens_por_pedido.c.itens))), 0),
+            func.coalesce(func.sum(case((~cancelado, itens_por_pedido.c.receita))), 0),
+            func.count(case((cancelado, Pedido.id))),
+            func.avg(case((entregue, extract("epoch", Pedido.updated_at - Pedido.created_at)))),
+        )
+        .outerjoin(itens_por_pedido, itens_por_pedido.c.id_pedido == Pedido.id)
+        .outerjoin(User, User.id == Pedido.id_usuario_registrou)
+        .where(Pedido.created_at >= inicio, Pedido.created_at < fim)
+        .group_by(Pedido.id_usuario_registrou, User.first_name, User.last_name, User.username, User.email)
+    )
+
+    usuarios = []
+    for (usuario_id, first_name, last_name, username, email,
+         total_pedidos, total_itens, receita, cancelados, segundos_entrega) in result.all():
+        usuarios.append(
+            DesempenhoUsuarioSchemas(
+                usuario_id=usuario_id,
+                nome_usuario=_nome_usuario(first_name, last_name, username, email),
+                total_pedidos=int(total_pedidos),
+                total_itens=int(total_itens),
+                receita=round(float(receita), 2),
+                pedidos_cancelados=int(cancelados),
+                taxa_cancelamento=round(cancelados / total_pedidos * 100, 2) if total_pedidos else 0.0,
+                tempo_medio_entrega_minutos=(
+                    round(float(segundos_entrega) / 60, 2) if segundos_entrega is not None else None
+                ),
+            )
+        )
+    usuarios.sort(key=lambda u: u.receita, reverse=True)
+
+    return RelatorioDesempenhoEquipeSchemas(data_inicio=data_inicio, data_fim=data_fim, usuarios=usuarios)
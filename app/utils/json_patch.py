@@ -0,0 +1,38 @@
+from typing import Any, Dict, List
+
+
+def _escapar(chave: str) -> str:
+    # RFC 6901: "~" e "/" precisam ser escapados nos ponteiros JSON
+    return str(chave).replace("~", "~0").replace("/", "~1")
+
+
+def gerar_json_patch(antigo: Any, novo: Any, caminho: str = "") -> List[Dict[str, Any]]:
+    """
+    Gera as operações JSON Patch (RFC 6902) que transformam `antigo` em `novo`.
+
+    Objetos são comparados chave a chave; listas de mesmo tamanho, item a item. Listas que
+    mudaram de tamanho são substituídas por inteiro, o que mantém o patch simples e sempre válido.
+    """
+    if antigo == novo:
+        return []
+
+    if isinstance(antigo, dict) and isinstance(novo, dict):
+        ops: List[Dict[str, Any]] = []
+        for chave in antigo:
+            if chave not in novo:
+                ops.append({"op": "remove", "path": f"{caminho}/{_escapar(chave)}"})
+        for chave, valor in novo.items():
+            ponteiro = f"{caminho}/{_escapar(chave)}"
+            if chave not in antigo:
+                ops.append({"op": "add", "path": ponteiro, "value": valor})
+            else:
+                ops.extend(gerar_json_patch(antigo[chave], valor, ponteiro))
+        return ops
+
+    if isinstance(antigo, list) and isinstance(novo, list) and len(antigo) == len(novo):
+        ops = []
+        for indice, (item_antigo, item_novo) in enumerate(zip(antigo, novo)):
+            ops.extend(gerar_json_patch(item_antigo, item_novo, f"{caminho}/{indice}"))
+        return ops
+
+    return [{"op": "replace", "path": caminho, "value": novo}]
@@ -9,6 +9,7 @@ echo "Aplicando migrations com Alembic..."
 #alembic upgrade head
 
 echo "Iniciando servidor FastAPI..."
-exec uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000}
+# Ping do protocolo WebSocket: detecta sockets mortos de clientes que não respondem ao ping do hub
+exec uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000} --ws-ping-interval 20 --ws-ping-timeout 20
 
 
@@ -0,0 +1,256 @@
+# scripts/bench_dominio.py
+"""
+Micro-benchmarks dos caminhos quentes do domínio (Python puro, sem banco nem rede).
+
+Mede, por chamada, o tempo (mediana e mínimo entre repetições) e as alocações via tracemalloc
+(pico de memória e blocos que permanecem alocados) de:
+    - Comanda.atualizar_valores_comanda
+    - sanitizar_valores_monetarios_sync (valores já limpos e com None/float)
+    - pagamento_service._calcular_valores_e_status_comanda
+    - PedidoService._validar_transicao_status
+    - PedidoService._pedido_para_dict (serialização do pedido com itens)
+
+O resultado é comparado com a baseline em scripts/baselines/bench_dominio.json: se algum tempo
+piorar além da tolerância, o processo termina com código 1. Grave a baseline na máquina de
+referência com --gravar-baseline.
+
+Uso:
+    python -m scripts.bench_dominio
+    python -m scripts.bench_dominio --gravar-baseline
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.models import Comanda, ItemPedido, Pedido
+from app.models.item_pedido import StatusPedidoEnum
+from app.models.pedido import StatusPedido, TipoPedido
+from app.services.comanda_service import sanitizar_valores_monetarios_sync
+from app.services.pagamento_service import _calcular_valores_e_status_comanda
+from app.services.pedido_service import pedido_service
+from scripts.metricas import salvar_resultado
+
+BASELINE_PADRAO = Path(__file__).parent / "baselines" / "bench_dominio.json"
+
+
+def _nova_comanda(comanda_id: int = 1) -> Comanda:
+    return Comanda(
+        id=comanda_id,
+        id_mesa=1,
+        valor_final_comanda=Decimal("187.40"),
+        percentual_taxa_servico=Decimal("10.00"),
+        valor_desconto=Decimal("5.00"),
+        valor_pago=Decimal("60.00"),
+        valor_fiado=Decimal("0.00"),
+        valor_credito_usado=Decimal("0.00"),
+    )
+
+
+def _comanda_suja(comanda_id: int) -> Comanda:
+    """Comanda com valores como chegam de bancos/JSON antigos: None e float no lugar de Decimal."""
+    comanda = _nova_comanda(comanda_id)
+    comanda.valor_desconto = None
+    comanda.valor_pago = 60.0
+    comanda.valor_fiado = None
+    comanda.valor_credito_usado = 0
+    return comanda
+
+
+def _novo_pedido(itens: int = 5) -> Pedido:
+    agora = datetime(2025, 1, 1, 21, 30)
+    pedido = Pedido(
+        id=1,
+        id_comanda=1,
+        id_usuario_registrou=1,
+        mesa_id=1,
+        tipo_pedido=TipoPedido.INTERNO_MESA,
+        status_geral_pedido=StatusPedido.EM_PREPARO,
+        created_at=agora,
+        updated_at=agora,
+    )
+    pedido.itens = [
+        ItemPedido(
+            id=i,
+            id_pedido=1,
+            id_comanda=1,
+            id_produto=i,
+            quantidade=2,
+            preco_unitario=Decimal("12.90"),
+            preco_total=Decimal("25.80"),
+            status=StatusPedidoEnum.PREPARANDO,
+            created_at=agora,
+            updated_at=agora,
+        )
+        for i in range(1, itens + 1)
+    ]
+    return pedido
+
+
+def _executar_corrotina(corrotina):
+    """Conduz uma corrotina que não aguarda I/O sem o custo do event loop."""
+    try:
+        corrotina.send(None)
+    except StopIteration as fim:
+        return fim.value
+    raise RuntimeError("A corrotina aguardou I/O; não é um caminho de Python puro")
+
+
+def _casos() -> Dict[str, Callable[[int], Callable[[], Any]]]:
+    """
+    Cada caso recebe o número de chamadas da rodada e devolve a função a medir;
+    o preparo (objetos, listas) fica fora da medição.
+    """
+    transicoes = [(atual, novo) for atual in StatusPedido for novo in StatusPedido]
+
+    def atualizar_valores(numero):
+        comanda = _nova_comanda()
+        return lambda: comanda.atualizar_valores_comanda()
+
+    def sanitizar_limpa(numero):
+        comanda = _nova_comanda()
+        return lambda: sanitizar_valores_monetarios_sync(comanda)
+
+    def sanitizar_suja(numero):
+        comandas = iter([_comanda_suja(i) for i in range(numero)])
+        return lambda: sanitizar_valores_monetarios_sync(next(comandas))
+
+    def calcular_status(numero):
+        comanda = _nova_comanda()
+        return lambda: _executar_corrotina(_calcular_valores_e_status_comanda(comanda, None))
+
+    def validar_transicoes(numero):
+        def chamada():
+            for atual, novo in transicoes:
+                pedido_service._validar_transicao_status(atual, novo)
+        return chamada
+
+    def pedido_para_dict(numero):
+        pedido = _novo_pedido()
+        return lambda: pedido_service._pedido_para_dict(pedido)
+
+    return {
+        "comanda.atualizar_valores_comanda": atualizar_valores,
+        "sanitizar_valores_monetarios_sync.limpa": sanitizar_limpa,
+        "sanitizar_valores_monetarios_sync.suja": sanitizar_suja,
+        "pagamento._calcular_valores_e_status_comanda": calcular_status,
+        f"pedido._validar_transicao_status.x{len(transicoes)}": validar_transicoes,
+        "pedido._pedido_para_dict.5_itens": pedido_para_dict,
+    }
+
+
+def _medir_tempo(preparar: Callable[[int], Callable[[], Any]], numero: int, repeticoes: int) -> Dict[str, float]:
+    por_chamada: List[float] = []
+    for _ in range(repeticoes):
+        chamada = preparar(numero)
+        inicio = time.perf_counter_ns()
+        for _ in range(numero):
+            chamada()
+        por_chamada.append((time.perf_counter_ns() - inicio) / numero)
+    return {"ns_mediana": round(statistics.median(por_chamada), 1), "ns_min": round(min(por_chamada), 1)}
+
+
+def _medir_alocacoes(preparar: Callable[[int], Callable[[], Any]], numero: int) -> Dict[str, float]:
+    """Pico de memória e blocos retidos por chamada. Os resultados ficam vivos para serem contados."""
+    chamada = preparar(numero)
+    resultados = []
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        for _ in range(numero):
+            resultados.append(chamada())
+        _, pico = tracemalloc.get_traced_memory()
+        depois = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    # Ignora os próprios snapshots, alocados pelo módulo tracemalloc
+    sem_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diferencas = depois.filter_traces(sem_tracemalloc).compare_to(antes.filter_traces(sem_tracemalloc), "filename")
+    blocos = sum(stat.count_diff for stat in diferencas)
+    return {
+        "pico_bytes_por_chamada": round((pico - base) / numero, 1),
+        "blocos_retidos_por_chamada": round(max(0, blocos - 1) / numero, 2),  # -1: a própria lista de resultados
+    }
+
+
+def executar(numero: int, repeticoes: int, filtro: str = "") -> Dict[str, Dict[str, float]]:
+    resultados = {}
+    for nome, preparar in _casos().items():
+        if filtro and filtro not in nome:
+            continue
+        preparar(1)()  # Aquecimento: importações tardias e configuração dos mappers
+        resultados[nome] = {**_medir_tempo(preparar, numero, repeticoes), **_medir_alocacoes(preparar, min(numero, 1000))}
+    return resultados
+
+
+def comparar(atual: Dict[str, Dict], baseline: Dict[str, Dict], tolerancia: float) -> List[str]:
+    """Regressões de tempo (mediana) e de blocos retidos em relação à baseline."""
+    regressoes = []
+    for nome, medido in atual.items():
+        referencia = baseline.get(nome)
+        if referencia is None:
+            continue
+        limite = referencia["ns_mediana"] * (1 + tolerancia)
+        if medido["ns_mediana"] > limite:
+            variacao = medido["ns_mediana"] / referencia["ns_mediana"] - 1
+            regressoes.append(
+                f"{nome}: {medido['ns_mediana']}ns/chamada (+{variacao:.0%} sobre {referencia['ns_mediana']}ns)"
+            )
+        if medido["blocos_retidos_por_chamada"] > referencia["blocos_retidos_por_chamada"] + 0.5:
+            regressoes.append(
+                f"{nome}: {medido['blocos_retidos_por_chamada']} blocos retidos/chamada "
+                f"(baseline {referencia['blocos_retidos_por_chamada']})"
+            )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos quentes do domínio.")
+    parser.add_argument("--numero", type=int, default=20000, help="Chamadas por repetição")
+    parser.add_argument("--repeticoes", type=int, default=7, help="Repetições (usa a mediana)")
+    parser.add_argument("--filtro", default="", help="Executa só os casos cujo nome contém este texto")
+    parser.add_argument("--baseline", default=str(BASELINE_PADRAO), help="Arquivo de baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="Piora aceita sobre a baseline (0.20 = 20%%)")
+    parser.add_argument("--gravar-baseline", action="store_true", help="Grava o resultado como nova baseline")
+    parser.add_argument("--saida", default="resultados/bench_dominio.json", help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    resultados = executar(args.numero, args.repeticoes, args.filtro)
+    for nome, medido in resultados.items():
+        print(
+            f"{nome:<50} {medido['ns_mediana']:>10}ns  pico={medido['pico_bytes_por_chamada']}B "
+            f"blocos={medido['blocos_retidos_por_chamada']}"
+        )
+
+    parametros = {"numero": args.numero, "repeticoes": args.repeticoes}
+    if args.gravar_baseline:
+        destino = salvar_resultado(args.baseline, "bench_dominio", {"parametros": parametros, "casos": resultados})
+        print(f"Baseline gravada em {destino}")
+        return
+
+    baseline_path = Path(args.baseline)
+    regressoes: List[str] = []
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        regressoes = comparar(resultados, baseline.get("casos", {}), args.tolerancia)
+    else:
+        print(f"Baseline {baseline_path} não encontrada: nada a comparar (use --gravar-baseline).")
+
+    salvar_resultado(args.saida, "bench_dominio", {"parametros": parametros, "casos": resultados, "regressoes": regressoes})
+    if regressoes:
+        print("Regressões em relação à baseline:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+# scripts/gerar_dataset.py
+"""
+Gerador de massa de dados sintética para benchmarks e testes de capacidade.
+
+Gera N meses de movimento do bar usando as tabelas dos models: categorias, produtos, clientes e
+mesas, comandas fechadas com pedidos e itens, pagamentos com MetodoPagamento variados e fiados.
+A popularidade de produtos e clientes segue uma distribuição de Zipf (poucos itens concentram a
+maior parte dos pedidos) e o movimento é maior às sextas e sábados.
+
+A saída é determinística para a mesma semente sobre o mesmo banco de partida: os IDs são
+atribuídos a partir do maior ID existente em cada tabela e todo sorteio vem de random.Random(semente).
+No Postgres (asyncpg) as linhas entram via COPY; em outros bancos, via executemany. Ao final as
+sequências de ID são ajustadas.
+
+Uso:
+    python -m scripts.gerar_dataset --meses 6 --comandas-por-dia 150 --semente 7
+    python -m scripts.gerar_dataset --meses 1 --simular   # só gera e mostra contagens e checksum
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Table, func, select, text
+
+from app.core.session import engine
+from app.models import Categoria, Cliente, Comanda, Fiado, ItemPedido, Mesa, Pagamento, Pedido, Produto, User
+from app.models.comanda import StatusComanda
+from app.models.fiado import StatusFiado
+from app.models.item_pedido import StatusPedidoEnum
+from app.models.mesa import StatusMesa
+from app.models.pagamento import MetodoPagamento, StatusPagamento
+from app.models.pedido import StatusPedido, TipoPedido
+
+# Ordem de inserção (respeita as chaves estrangeiras)
+TABELAS: List[Table] = [
+    Categoria.__table__,
+    Produto.__table__,
+    Cliente.__table__,
+    Mesa.__table__,
+    Comanda.__table__,
+    Pedido.__table__,
+    ItemPedido.__table__,
+    Pagamento.__table__,
+    Fiado.__table__,
+]
+
+NOMES_CATEGORIAS = ["Cervejas", "Chopes", "Drinks", "Destilados", "Sem Álcool", "Porções", "Lanches", "Pratos", "Sobremesas"]
+CATEGORIAS_DO_BAR = {"Cervejas", "Chopes", "Drinks", "Destilados", "Sem Álcool"}
+
+# Movimento relativo por dia da semana (segunda = 0)
+FATOR_DIA_DA_SEMANA = {0: 0.6, 1: 0.6, 2: 0.8, 3: 1.0, 4: 1.5, 5: 1.8, 6: 1.1}
+
+METODOS_PAGAMENTO = [MetodoPagamento.PIX, MetodoPagamento.CARTAO_CREDITO, MetodoPagamento.CARTAO_DEBITO,
+                     MetodoPagamento.DINHEIRO, MetodoPagamento.OUTRO]
+PESOS_METODOS = list(itertools.accumulate([40, 25, 20, 12, 3]))
+
+CENTAVOS = Decimal("0.01")
+
+
+@dataclass
+class Parametros:
+    meses: int
+    semente: int
+    categorias: int
+    produtos: int
+    clientes: int
+    mesas: int
+    comandas_por_dia: int
+    zipf_s: float
+    fracao_com_cliente: float
+    fracao_fiado: float
+    fim: date
+
+
+def pesos_zipf(quantidade: int, s: float, rng: random.Random) -> List[float]:
+    """Pesos acumulados de Zipf, embaralhados para a popularidade não acompanhar o ID."""
+    pesos = [1 / (posicao ** s) for posicao in range(1, quantidade + 1)]
+    rng.shuffle(pesos)
+    return list(itertools.accumulate(pesos))
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class Gerador:
+    """Gera as linhas (dicts por tabela) com IDs explícitos a partir dos maiores IDs existentes."""
+
+    def __init__(self, parametros: Parametros, proximos_ids: Dict[str, int], usuarios: List[int]):
+        self.p = parametros
+        self.rng = random.Random(parametros.semente)
+        self.proximos_ids = dict(proximos_ids)
+        self.usuarios = usuarios or [None]
+        self.pendentes: Dict[str, List[Dict[str, Any]]] = {tabela.name: [] for tabela in TABELAS}
+        self.produtos: List[Dict[str, Any]] = []
+        self.clientes: List[int] = []
+        self.mesas: List[int] = []
+
+    def _novo_id(self, tabela: str) -> int:
+        novo = self.proximos_ids[tabela]
+        self.proximos_ids[tabela] = novo + 1
+        return novo
+
+    def _adicionar(self, tabela: str, linha: Dict[str, Any]) -> Dict[str, Any]:
+        linha["id"] = self._novo_id(tabela)
+        self.pendentes[tabela].append(linha)
+        return linha
+
+    def pendentes_total(self) -> int:
+        return sum(len(linhas) for linhas in self.pendentes.values())
+
+    def cadastros(self, agora: datetime):
+        rng = self.rng
+        categorias = []
+        for i in range(self.p.categorias):
+            categoria_id = self.proximos_ids["categorias"]
+            base = NOMES_CATEGORIAS[i % len(NOMES_CATEGORIAS)]
+            nome = f"{base} {categoria_id}"  # nome é único
+            estacao = "bar" if base in CATEGORIAS_DO_BAR else "cozinha"
+            categorias.append(self._adicionar(
+                "categorias", {"nome": nome, "descricao": None, "estacao": estacao, "criado_em": agora}
+            )["id"])
+
+        for i in range(self.p.produtos):
+            preco = Decimal(str(round(rng.lognormvariate(3.2, 0.5), 1))).quantize(CENTAVOS) + Decimal("0.90")
+            produto = self._adicionar("produtos", {
+                "nome": f"Produto {self.proximos_ids['produtos']}",
+                "descricao": None,
+                "preco_unitario": preco,
+                "disponivel": rng.random() > 0.05,
+                "categoria_id": rng.choice(categorias) if categorias else None,
+                "criado_em": agora,
+            })
+            self.produtos.append(produto)
+
+        for i in range(self.p.clientes):
+            cliente = self._adicionar("clientes", {
+                "nome": f"Cliente {self.proximos_ids['clientes']}",
+                "telefone": f"11{rng.randint(900000000, 999999999)}",
+                "saldo_credito": Decimal("0.00"),
+                "created_at": agora,
+                "updated_at": agora,
+            })
+            self.clientes.append(cliente["id"])
+
+        for i in range(self.p.mesas):
+            mesa = self._adicionar("mesas", {
+                "numero_identificador": f"M{self.proximos_ids['mesas']}",
+                "capacidade": rng.choice((2, 4, 4, 6, 8)),
+                "status": StatusMesa.DISPONIVEL,
+                "qr_code_hash": _uuid(rng),
+                "ativa_para_pedidos": True,
+                "criado_em": agora,
+            })
+            self.mesas.append(mesa["id"])
+
+        self.pesos_produtos = pesos_zipf(len(self.produtos), self.p.zipf_s, rng)
+        self.pesos_clientes = pesos_zipf(len(self.clientes), self.p.zipf_s, rng)
+
+    def dia(self, dia: date):
+        rng = self.rng
+        media = self.p.comandas_por_dia * FATOR_DIA_DA_SEMANA[dia.weekday()]
+        quantidade = max(0, round(rng.gauss(media, media * 0.15)))
+        abertura_do_bar = datetime.combine(dia, datetime.min.time()) + timedelta(hours=17)
+        idade_em_dias = (self.p.fim - dia).days
+        for _ in range(quantidade):
+            self._comanda(abertura_do_bar + timedelta(minutes=rng.uniform(0, 9 * 60)), idade_em_dias)
+
+    def _comanda(self, aberta_em: datetime, idade_em_dias: int):
+        rng = self.rng
+        comanda_id = self.proximos_ids["comandas"]
+        mesa_id = rng.choice(self.mesas)
+        cliente_id = None
+        if self.clientes and rng.random() < self.p.fracao_com_cliente:
+            cliente_id = rng.choices(self.clientes, cum_weights=self.pesos_clientes)[0]
+
+        momento = aberta_em
+        total_itens = Decimal("0.00")
+        pedidos, itens = [], []
+        for _ in range(rng.randint(1, 5)):
+            momento += timedelta(minutes=rng.uniform(5, 40))
+            cancelado = rng.random() < 0.04
+            pedido = {
+                "id": self._novo_id("pedidos"),
+                "id_comanda": comanda_id,
+                "id_usuario_registrou": rng.choice(self.usuarios),
+                "mesa_id": mesa_id,
+                "tipo_pedido": TipoPedido.INTERNO_MESA,
+                "status_geral_pedido": StatusPedido.CANCELADO if cancelado else StatusPedido.ENTREGUE_NA_MESA,
+                "motivo_cancelamento": "Cliente desistiu" if cancelado else None,
+                "created_at": momento,
+                "updated_at": momento + timedelta(minutes=rng.uniform(5, 30)),
+            }
+            pedidos.append(pedido)
+            for produto in rng.choices(self.produtos, cum_weights=self.pesos_produtos, k=rng.randint(1, 4)):
+                quantidade = rng.choices((1, 2, 3, 4, 6), cum_weights=(55, 80, 90, 97, 100))[0]
+                preco_total = produto["preco_unitario"] * quantidade
+                itens.append({
+                    "id": self._novo_id("itens_pedido"),
+                    "id_pedido": pedido["id"],
+                    "id_comanda": comanda_id,
+                    "id_produto": produto["id"],
+                    "quantidade": quantidade,
+                    "preco_unitario": produto["preco_unitario"],
+                    "preco_total": preco_total,
+                    "status": StatusPedidoEnum.CANCELADO if cancelado else StatusPedidoEnum.FINALIZADO,
+                    "created_at": momento,
+                    "updated_at": pedido["updated_at"],
+                })
+                if not cancelado:
+                    total_itens += preco_total
+
+        fechada_em = momento + timedelta(minutes=rng.uniform(10, 60))
+        taxa = (total_itens * Decimal("10.00") / Decimal("100")).quantize(CENTAVOS)
+        desconto = (total_itens * Decimal(rng.choice((5, 10))) / 100).quantize(CENTAVOS) if rng.random() < 0.05 else Decimal("0.00")
+        total = max(Decimal("0.00"), total_itens + taxa - desconto)
+
+        valor_fiado = Decimal("0.00")
+        if cliente_id is not None and total > 0 and rng.random() < self.p.fracao_fiado:
+            valor_fiado = (total * Decimal(rng.randint(30, 100)) / 100).quantize(CENTAVOS)
+        pagamentos = self._dividir_pagamentos(total - valor_fiado)
+        if valor_fiado > 0:
+            pagamentos.append((valor_fiado, MetodoPagamento.FIADO))
+
+        self._adicionar("comandas", {
+            "id_mesa": mesa_id,
+            "id_cliente_associado": cliente_id,
+            "status_comanda": StatusComanda.FECHADA,
+            "valor_total_calculado": Decimal("0.00"),
+            "percentual_taxa_servico": Decimal("10.00"),
+            "valor_taxa_servico": taxa,
+            "valor_desconto": desconto,
+            "valor_final_comanda": total_itens,
+            "valor_pago": total,  # Já inclui o fiado
+            "valor_fiado": valor_fiado,
+            "valor_credito_usado": Decimal("0.00"),
+            "qr_code_comanda_hash": _uuid(rng),
+            "versao": 0,
+            "created_at": aberta_em,
+            "updated_at": fechada_em,
+        })
+        self.pendentes["pedidos"].extend(pedidos)
+        self.pendentes["itens_pedido"].extend(itens)
+
+        for valor, metodo in pagamentos:
+            usuario = rng.choice(self.usuarios)
+            self._adicionar("pagamentos", {
+                "id_comanda": comanda_id,
+                "id_cliente": cliente_id,
+                "id_usuario_registrou": usuario,
+                "valor_pago": valor,
+                "metodo_pagamento": metodo,
+                "status_pagamento": StatusPagamento.APROVADO,
+                "data_pagamento": fechada_em,
+                "updated_at": fechada_em,
+            })
+            if metodo == MetodoPagamento.FIADO:
+                quitado = idade_em_dias > 45 and rng.random() < 0.7
+                self._adicionar("fiados", {
+                    "id_comanda": comanda_id,
+                    "id_cliente": cliente_id,
+                    "id_usuario_registrou": usuario,
+                    "valor_original": valor,
+                    "valor_devido": Decimal("0.00") if quitado else valor,
+                    "status_fiado": StatusFiado.PAGO_TOTALMENTE if quitado else StatusFiado.PENDENTE,
+                    "data_vencimento": (fechada_em + timedelta(days=30)).date(),
+                    "data_registro": fechada_em,
+                    "updated_at": fechada_em,
+                })
+
+    def _dividir_pagamentos(self, valor: Decimal) -> List[tuple]:
+        """Divide o valor em 1 a 3 pagamentos com métodos sorteados."""
+        rng = self.rng
+        if valor <= 0:
+            return []
+        partes = rng.choices((1, 2, 3), cum_weights=(70, 92, 100))[0]
+        pagamentos, restante = [], valor
+        for i in range(partes):
+            parte = restante if i == partes - 1 else (restante * Decimal(rng.randint(30, 70)) / 100).quantize(CENTAVOS)
+            if parte <= 0:
+                continue
+            pagamentos.append((parte, rng.choices(METODOS_PAGAMENTO, cum_weights=PESOS_METODOS)[0]))
+            restante -= parte
+        return pagamentos
+
+
+class Inseridor:
+    """Insere lotes por tabela: COPY no asyncpg, executemany nos demais drivers."""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.usa_copy = conexao.dialect.driver == "asyncpg"
+        self.linhas: Dict[str, int] = {}
+        self.segundos: Dict[str, float] = {}
+
+    async def inserir(self, tabela: Table, linhas: List[Dict[str, Any]]):
+        if not linhas:
+            return
+        inicio = time.perf_counter()
+        if self.usa_copy:
+            await self._copy(tabela, linhas)
+        else:
+            await self.conexao.execute(tabela.insert(), linhas)
+        self.linhas[tabela.name] = self.linhas.get(tabela.name, 0) + len(linhas)
+        self.segundos[tabela.name] = self.segundos.get(tabela.name, 0.0) + time.perf_counter() - inicio
+
+    async def _copy(self, tabela: Table, linhas: List[Dict[str, Any]]):
+        colunas = list(linhas[0])
+        com_fuso = {nome for nome in colunas if getattr(tabela.c[nome].type, "timezone", False)}
+        registros = [
+            tuple(_valor_para_copy(linha.get(nome), nome in com_fuso) for nome in colunas)
+            for linha in linhas
+        ]
+        bruta = await self.conexao.get_raw_connection()
+        await bruta.driver_connection.copy_records_to_table(tabela.name, records=registros, columns=colunas)
+
+
+def _valor_para_copy(valor: Any, com_fuso: bool) -> Any:
+    # O COPY recebe os valores já no formato do banco: enums pelo nome, como o SQLAlchemy grava
+    if isinstance(valor, Enum):
+        return valor.name
+    if com_fuso and isinstance(valor, datetime) and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+async def _proximos_ids(conexao) -> Dict[str, int]:
+    proximos = {}
+    for tabela in TABELAS:
+        maior = (await conexao.execute(select(func.max(tabela.c.id)))).scalar()
+        proximos[tabela.name] = (maior or 0) + 1
+    return proximos
+
+
+async def _ajustar_sequencias(conexao):
+    if conexao.dialect.name != "postgresql":
+        return
+    for tabela in TABELAS:
+        await conexao.execute(text(
+            f"SELECT setval('{tabela.name}_id_seq', COALESCE((SELECT MAX(id) FROM {tabela.name}), 0) + 1, false)"
+        ))
+
+
+async def _descarregar(gerador: Gerador, inseridor: Optional[Inseridor], resumo: hashlib.sha256, contagem: Dict[str, int]):
+    for tabela in TABELAS:
+        linhas = gerador.pendentes[tabela.name]
+        contagem[tabela.name] = contagem.get(tabela.name, 0) + len(linhas)
+        for linha in linhas:
+            resumo.update(repr(sorted(linha.items())).encode())
+        if inseridor is not None:
+            await inseridor.inserir(tabela, linhas)
+        gerador.pendentes[tabela.name] = []
+
+
+async def gerar(parametros: Parametros, lote: int, simular: bool) -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    resumo = hashlib.sha256()
+    contagem: Dict[str, int] = {}
+    primeiro_dia = parametros.fim - timedelta(days=30 * parametros.meses)
+    agora = datetime.combine(primeiro_dia, datetime.min.time())
+
+    async def produzir(gerador: Gerador, inseridor: Optional[Inseridor]):
+        gerador.cadastros(agora)
+        await _descarregar(gerador, inseridor, resumo, contagem)
+        for deslocamento in range((parametros.fim - primeiro_dia).days):
+            gerador.dia(primeiro_dia + timedelta(days=deslocamento))
+            if gerador.pendentes_total() >= lote:
+                await _descarregar(gerador, inseridor, resumo, contagem)
+        await _descarregar(gerador, inseridor, resumo, contagem)
+
+    inseridor = None
+    if simular:
+        await produzir(Gerador(parametros, {tabela.name: 1 for tabela in TABELAS}, []), None)
+    else:
+        async with engine.begin() as conexao:
+            usuarios = list((await conexao.execute(select(User.id).order_by(User.id).limit(20))).scalars())
+            inseridor = Inseridor(conexao)
+            await produzir(Gerador(parametros, await _proximos_ids(conexao), usuarios), inseridor)
+            await _ajustar_sequencias(conexao)
+        await engine.dispose()
+
+    duracao = time.perf_counter() - inicio
+    total = sum(contagem.values())
+    resultado = {
+        "linhas_por_tabela": contagem,
+        "linhas_total": total,
+        "segundos": round(duracao, 2),
+        "linhas_por_segundo": round(total / duracao) if duracao else 0,
+        "checksum": resumo.hexdigest(),
+    }
+    if inseridor is not None:
+        resultado["metodo"] = "COPY" if inseridor.usa_copy else "executemany"
+        resultado["linhas_por_segundo_na_insercao"] = {
+            nome: round(inseridor.linhas[nome] / segundos) for nome, segundos in inseridor.segundos.items() if segundos
+        }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera meses de movimento sintético do bar no banco configurado.")
+    parser.add_argument("--meses", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--categorias", type=int, default=9)
+    parser.add_argument("--produtos", type=int, default=150)
+    parser.add_argument("--clientes", type=int, default=2000)
+    parser.add_argument("--mesas", type=int, default=40)
+    parser.add_argument("--comandas-por-dia", type=int, default=120, help="Média em uma quinta-feira")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Expoente de Zipf da popularidade")
+    parser.add_argument("--fracao-com-cliente", type=float, default=0.3, help="Comandas com cliente identificado")
+    parser.add_argument("--fracao-fiado", type=float, default=0.15, help="Das comandas com cliente, quantas ficam em fiado")
+    parser.add_argument("--fim", type=date.fromisoformat, default=date.today(), help="Último dia gerado (AAAA-MM-DD); fixe-o para repetir a mesma massa")
+    parser.add_argument("--lote", type=int, default=50000, help="Linhas acumuladas antes de cada descarga")
+    parser.add_argument("--simular", action="store_true", help="Só gera as linhas (sem banco) e mostra o checksum")
+    args = parser.parse_args()
+
+    parametros = Parametros(
+        meses=args.meses, semente=args.semente, categorias=args.categorias, produtos=args.produtos,
+        clientes=args.clientes, mesas=args.mesas, comandas_por_dia=args.comandas_por_dia, zipf_s=args.zipf,
+        fracao_com_cliente=args.fracao_com_cliente, fracao_fiado=args.fracao_fiado, fim=args.fim,
+    )
+    resultado = asyncio.run(gerar(parametros, args.lote, args.simular))
+    for tabela, linhas in resultado["linhas_por_tabela"].items():
+        print(f"{tabela:<14} {linhas:>10}")
+    print(
+        f"Total: {resultado['linhas_total']} linhas em {resultado['segundos']}s "
+        f"({resultado['linhas_por_segundo']} linhas/s). Checksum: {resultado['checksum']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
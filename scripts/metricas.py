@@ -0,0 +1,73 @@
+# scripts/metricas.py
+"""Funções comuns às ferramentas de carga e benchmark: percentis e gravação de resultados em JSON."""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def percentil(ordenados, p: float) -> float:
+    """Percentil por interpolação linear sobre uma sequência já ordenada."""
+    if not ordenados:
+        return 0.0
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def resumo_latencias(valores: Iterable[float]) -> Dict[str, float]:
+    """Resumo em milissegundos: quantidade, média, p50, p95, p99 e máximo."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return {"amostras": 0, "media": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "amostras": len(ordenados),
+        "media": round(sum(ordenados) / len(ordenados), 3),
+        "p50": round(percentil(ordenados, 50), 3),
+        "p95": round(percentil(ordenados, 95), 3),
+        "p99": round(percentil(ordenados, 99), 3),
+        "max": round(ordenados[-1], 3),
+    }
+
+
+def rss_do_processo(pid: int) -> Optional[int]:
+    """Memória residente (bytes) de um processo, lida de /proc. None fora do Linux ou sem permissão."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for linha in status:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def salvar_resultado(caminho: str, ferramenta: str, dados: Dict[str, Any]) -> Path:
+    """
+    Grava o resultado com metadados (commit, data, versão do Python) para comparação entre versões.
+    """
+    destino = Path(caminho)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    resultado = {
+        "ferramenta": ferramenta,
+        "commit": _commit_atual(),
+        "executado_em": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        **dados,
+    }
+    destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    return destino
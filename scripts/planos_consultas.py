@@ -0,0 +1,240 @@
+# scripts/planos_consultas.py
+"""
+Verificação dos planos de execução das consultas quentes, para pegar regressões de índice ou de
+consulta antes do deploy.
+
+Executa os próprios services (não cópias das consultas) numa transação que é desfeita ao final,
+captura cada comando SQL emitido — incluindo os SELECTs extras dos selectinload — e roda
+EXPLAIN (FORMAT JSON) sobre ele com os mesmos parâmetros. Um caso falha se algum plano:
+    - fizer Seq Scan numa tabela grande (TABELAS_GRANDES);
+    - tiver custo estimado total acima do orçamento do caso em scripts/planos_consultas_budgets.json.
+
+Casos:
+    comanda_detalhe        get_comanda_by_id_detail (comanda com mesa, cliente, itens, pagamentos e fiados)
+    recalcular_totais      ComandaService.recalcular_totais_comanda (soma dos itens + UPDATE)
+    comanda_ativa_mesa     get_active_comanda_by_mesa_id
+    listar_pedidos         pedido_service.listar_pedidos com status e intervalo de um dia
+    refresh_token          auth_service.get_user_by_refresh_token (join users x refresh_tokens)
+    qr_code                get_comanda_by_qr_hash e a busca de mesa por qr_code_hash do cardápio público
+
+Os planos só dizem algo com volume realista: rode contra um banco local populado por
+scripts/gerar_dataset.py. As estatísticas são atualizadas com ANALYZE antes dos EXPLAINs.
+
+Uso:
+    python -m scripts.planos_consultas --saida resultados/planos_consultas.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.session import AsyncSessionFactory, engine
+from app.models import Comanda, Mesa, Pedido
+from app.models.comanda import StatusComanda
+from app.models.pedido import StatusPedido
+from app.models.refresh_tokens import RefreshToken
+from app.services import comanda_service
+from app.services.auth_service import auth_service
+from app.services.comanda_service import ComandaService
+from app.services.pedido_service import pedido_service
+from scripts.metricas import salvar_resultado
+
+# Tabelas que crescem com o movimento: nelas um Seq Scan numa consulta quente é regressão
+TABELAS_GRANDES = frozenset({
+    "comandas", "pedidos", "itens_pedido", "pagamentos", "fiados", "clientes", "refresh_tokens",
+})
+ORCAMENTOS_PADRAO = "scripts/planos_consultas_budgets.json"
+
+
+@dataclass
+class Valores:
+    """Parâmetros reais do banco usados nas consultas."""
+    comanda_id: int
+    mesa_id: int
+    data_inicio: datetime
+    data_fim: datetime
+    refresh_token: str
+    qr_comanda: str
+    qr_mesa: str
+
+
+class CapturaSQL:
+    """Guarda os comandos enviados ao driver enquanto estiver ativa."""
+
+    def __init__(self):
+        self.ativa = False
+        self.comandos: List[Tuple[str, Any]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.ativa and statement.lstrip()[:6].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT"):
+            self.comandos.append((statement, parameters))
+
+
+async def _buscar_mesa_por_qr(db: AsyncSession, qr_code_hash: str) -> Optional[Mesa]:
+    # Mesma busca feita pelas rotas públicas do cardápio
+    result = await db.execute(select(Mesa).where(Mesa.qr_code_hash == qr_code_hash))
+    return result.scalar_one_or_none()
+
+
+async def _qr_code(db: AsyncSession, valores: Valores):
+    await comanda_service.get_comanda_by_qr_hash(db, valores.qr_comanda)
+    await _buscar_mesa_por_qr(db, valores.qr_mesa)
+
+
+CASOS: Dict[str, Callable[[AsyncSession, Valores], Awaitable[Any]]] = {
+    "comanda_detalhe": lambda db, v: comanda_service.get_comanda_by_id_detail(db, v.comanda_id),
+    "recalcular_totais": lambda db, v: ComandaService.recalcular_totais_comanda(db, v.comanda_id, fazer_commit=False),
+    "comanda_ativa_mesa": lambda db, v: comanda_service.get_active_comanda_by_mesa_id(db, v.mesa_id),
+    "listar_pedidos": lambda db, v: pedido_service.listar_pedidos(
+        db, status=StatusPedido.EM_PREPARO.value,
+        data_inicio=v.data_inicio.isoformat(), data_fim=v.data_fim.isoformat(),
+    ),
+    "refresh_token": lambda db, v: auth_service.get_user_by_refresh_token(db, v.refresh_token),
+    "qr_code": _qr_code,
+}
+
+
+async def _valores(db: AsyncSession) -> Valores:
+    """Escolhe entidades existentes: a comanda mais recente, uma mesa com comanda aberta, o último dia com pedidos."""
+    comanda_id = (await db.execute(select(func.max(Comanda.id)))).scalar()
+    if comanda_id is None:
+        raise SystemExit("Banco sem comandas: popule-o com scripts.gerar_dataset antes")
+    mesa_id = (await db.execute(
+        select(Comanda.id_mesa)
+        .where(Comanda.status_comanda.in_([StatusComanda.ABERTA, StatusComanda.PAGA_PARCIALMENTE]))
+        .limit(1)
+    )).scalar()
+    if mesa_id is None:
+        mesa_id = (await db.execute(select(func.min(Mesa.id)))).scalar() or 1
+    ultimo_pedido = (await db.execute(select(func.max(Pedido.created_at)))).scalar() or datetime.now()
+    token = (await db.execute(select(RefreshToken.token).limit(1))).scalar()
+    qr_comanda = (await db.execute(
+        select(Comanda.qr_code_comanda_hash).where(Comanda.qr_code_comanda_hash.is_not(None)).limit(1)
+    )).scalar()
+    qr_mesa = (await db.execute(select(Mesa.qr_code_hash).where(Mesa.qr_code_hash.is_not(None)).limit(1))).scalar()
+    return Valores(
+        comanda_id=comanda_id,
+        mesa_id=mesa_id,
+        data_inicio=ultimo_pedido - timedelta(days=1),
+        data_fim=ultimo_pedido,
+        # Sem linha correspondente o plano é o mesmo: o que importa é o caminho de acesso
+        refresh_token=token or uuid.uuid4().hex,
+        qr_comanda=qr_comanda or str(uuid.uuid4()),
+        qr_mesa=qr_mesa or str(uuid.uuid4()),
+    )
+
+
+def _nos(plano: Dict[str, Any]):
+    yield plano
+    for filho in plano.get("Plans", ()):
+        yield from _nos(filho)
+
+
+def analisar_plano(plano: Dict[str, Any], custo_max: float) -> List[str]:
+    """Violações de um plano (o nó raiz do EXPLAIN em JSON)."""
+    violacoes = []
+    for no in _nos(plano):
+        tabela = no.get("Relation Name")
+        if no.get("Node Type") == "Seq Scan" and tabela in TABELAS_GRANDES:
+            violacoes.append(f"Seq Scan em {tabela} (~{no.get('Plan Rows')} linhas estimadas)")
+    if plano["Total Cost"] > custo_max:
+        violacoes.append(f"custo estimado {plano['Total Cost']} acima do orçamento de {custo_max}")
+    return violacoes
+
+
+async def _explicar(comando: str, parametros: Any) -> Dict[str, Any]:
+    async with engine.connect() as conexao:
+        resultado = await conexao.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {comando}", parametros)
+        bruto = resultado.scalar()
+    documento = json.loads(bruto) if isinstance(bruto, str) else bruto
+    return documento[0]["Plan"]
+
+
+async def executar(orcamentos: Dict[str, Any], filtro: str, analisar: bool) -> Dict[str, Any]:
+    captura = CapturaSQL()
+    event.listen(engine.sync_engine, "before_cursor_execute", captura)
+    try:
+        if analisar:
+            async with engine.begin() as conexao:
+                for tabela in sorted(TABELAS_GRANDES):
+                    await conexao.execute(text(f"ANALYZE {tabela}"))
+
+        async with AsyncSessionFactory() as db:
+            valores = await _valores(db)
+
+        casos = {}
+        for nome, caso in CASOS.items():
+            if filtro and filtro not in nome:
+                continue
+            custo_max = orcamentos.get("casos", {}).get(nome, orcamentos["custo_max_padrao"])
+            captura.comandos.clear()
+            async with AsyncSessionFactory() as db:
+                captura.ativa = True
+                try:
+                    await caso(db, valores)
+                finally:
+                    captura.ativa = False
+                    await db.rollback()
+
+            comandos = []
+            for comando, parametros in captura.comandos:
+                plano = await _explicar(comando, parametros)
+                comandos.append({
+                    "sql": " ".join(comando.split()),
+                    "custo_total": plano["Total Cost"],
+                    "nos": sorted({no["Node Type"] for no in _nos(plano)}),
+                    "violacoes": analisar_plano(plano, custo_max),
+                    "plano": plano,
+                })
+            casos[nome] = {
+                "custo_max": custo_max,
+                "comandos": comandos,
+                "violacoes": [v for c in comandos for v in c["violacoes"]] or ([] if comandos else ["nenhum SQL capturado"]),
+            }
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", captura)
+        await engine.dispose()
+
+    return {
+        "valores": {chave: str(valor) for chave, valor in vars(valores).items()},
+        "casos": casos,
+        "violacoes": {nome: caso["violacoes"] for nome, caso in casos.items() if caso["violacoes"]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica os planos de execução das consultas quentes.")
+    parser.add_argument("--orcamentos", default=ORCAMENTOS_PADRAO, help="JSON com o custo máximo por caso")
+    parser.add_argument("--filtro", default="", help="Executa só os casos cujo nome contém este texto")
+    parser.add_argument("--sem-analyze", action="store_true", help="Não roda ANALYZE antes dos EXPLAINs")
+    parser.add_argument("--saida", default="resultados/planos_consultas.json", help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    with open(args.orcamentos, encoding="utf-8") as arquivo:
+        orcamentos = json.load(arquivo)
+
+    resultado = asyncio.run(executar(orcamentos, args.filtro, analisar=not args.sem_analyze))
+    destino = salvar_resultado(args.saida, "planos_consultas", resultado)
+    for nome, caso in resultado["casos"].items():
+        custos = ", ".join(str(comando["custo_total"]) for comando in caso["comandos"])
+        situacao = "FALHOU" if caso["violacoes"] else "ok"
+        print(f"{nome:<22} {situacao:<7} custos=[{custos}] (máx {caso['custo_max']})")
+    print(f"Resultado em {destino}")
+
+    if resultado["violacoes"]:
+        print("Violações:")
+        for nome, violacoes in resultado["violacoes"].items():
+            for violacao in violacoes:
+                print(f"  - {nome}: {violacao}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# scripts/replay_trafego.py
+"""
+Reproduz uma captura de tráfego real (app/core/captura_trafego.py) contra uma instância local.
+
+Lê um ou mais arquivos trafego-*.jsonl.gz (um por worker, intercalados pela hora de início),
+reemite cada requisição no mesmo instante relativo, dividido por --velocidade (1x, 2x, 5x...),
+e compara por rota as latências da reprodução com as medidas durante a captura.
+
+Como a captura é anonimizada, a requisição é remontada com dados da instância local:
+    - cada referência "~r:<entidade>:<n>" vira a n-ésima entidade (módulo o total) listada
+      pela própria API no início (GET /comandas/, /mesas/, /produtos/...);
+    - textos "~s:<tamanho>" viram um texto qualquer do mesmo tamanho;
+    - logins são refeitos com --email/--senha, e todas as requisições que tinham
+      Authorization usam o token desse usuário.
+Requisições cuja referência não tem equivalente local são contadas como ignoradas.
+
+A reprodução escreve no banco (abre comandas, registra pedidos e pagamentos): use uma base
+descartável, por exemplo a gerada por scripts/gerar_dataset.py.
+
+Uso:
+    python -m scripts.replay_trafego logs/trafego/trafego-*.jsonl.gz --velocidade 2 \\
+        --saida resultados/replay_2x.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from app.core.captura_trafego import MARCADOR_REFERENCIA, MARCADOR_TEXTO
+from app.core.config.settings import settings
+from scripts.metricas import resumo_latencias, salvar_resultado
+
+# Entidade -> (rota de listagem, campo usado como valor)
+FONTES_DE_ENTIDADES = {
+    "comanda": ("/comandas/", "id"),
+    "mesa": ("/mesas/", "id"),
+    "qr_code_hash": ("/mesas/", "qr_code_hash"),
+    "produto": ("/produtos/", "id"),
+    "categoria": ("/categoria/", "id"),
+    "cliente": ("/clientes/", "id"),
+    "pedido": ("/pedidos/", "id"),
+    "pagamento": ("/pagamentos/", "id"),
+    "fiado": ("/fiado/", "id"),
+}
+_PARAMETRO_DE_ROTA = re.compile(r"\{(\w+)(?::\w+)?\}")
+
+
+class SemEquivalenteLocal(Exception):
+    """A captura referencia uma entidade que a instância local não tem."""
+
+
+@dataclass
+class Rota:
+    capturadas_ms: List[float] = field(default_factory=list)
+    reproduzidas_ms: List[float] = field(default_factory=list)
+    status_divergente: int = 0
+    erros: int = 0
+    ignoradas: int = 0
+
+
+def ler_capturas(caminhos: List[str]) -> List[Dict[str, Any]]:
+    """Registros de todos os arquivos, com "t" convertido para segundos desde o primeiro início."""
+    registros = []
+    for caminho in caminhos:
+        abrir = gzip.open if caminho.endswith(".gz") else open
+        inicio = None
+        with abrir(caminho, "rt", encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                registro = json.loads(linha)
+                if "v" in registro:
+                    # gzip em modo append: um novo cabeçalho a cada reinício do worker
+                    inicio = registro["inicio"]
+                    continue
+                if inicio is None or registro.get("r") is None:
+                    continue
+                registro["t"] += inicio
+                registros.append(registro)
+    registros.sort(key=lambda registro: registro["t"])
+    if registros:
+        origem = registros[0]["t"]
+        for registro in registros:
+            registro["t"] -= origem
+    return registros
+
+
+class Remontador:
+    """Troca pseudônimos e tamanhos da captura por valores válidos na instância local."""
+
+    def __init__(self, entidades: Dict[str, List[Any]]):
+        self.entidades = entidades
+
+    def _referencia(self, marcador: str) -> Any:
+        entidade, _, ordinal = marcador[len(MARCADOR_REFERENCIA):].rpartition(":")
+        valores = self.entidades.get(entidade)
+        if not valores:
+            raise SemEquivalenteLocal(entidade)
+        return valores[int(ordinal) % len(valores)]
+
+    def valor(self, forma: Any) -> Any:
+        if isinstance(forma, dict):
+            return {chave: self.valor(item) for chave, item in forma.items()}
+        if isinstance(forma, list):
+            return [self.valor(item) for item in forma]
+        if isinstance(forma, str):
+            if forma.startswith(MARCADOR_REFERENCIA):
+                return self._referencia(forma)
+            if forma.startswith(MARCADOR_TEXTO):
+                return "x" * int(forma[len(MARCADOR_TEXTO):])
+        return forma
+
+    def caminho(self, template: str, parametros: Dict[str, str]) -> str:
+        return _PARAMETRO_DE_ROTA.sub(lambda m: str(self.valor(parametros[m.group(1)])), template)
+
+
+async def _login(client: httpx.AsyncClient, email: str, senha: str) -> str:
+    resposta = await client.post(f"{settings.API_V1_STR}/auth/login", json={"email": email, "password": senha})
+    resposta.raise_for_status()
+    return resposta.json()["access_token"]
+
+
+async def _carregar_entidades(client: httpx.AsyncClient, cabecalhos: Dict[str, str], limite: int) -> Dict[str, List[Any]]:
+    entidades: Dict[str, List[Any]] = {}
+    listagens: Dict[str, List[dict]] = {}
+    for entidade, (rota, campo) in FONTES_DE_ENTIDADES.items():
+        if rota not in listagens:
+            resposta = await client.get(
+                f"{settings.API_V1_STR}{rota}", params={"skip": 0, "limit": limite}, headers=cabecalhos
+            )
+            listagens[rota] = resposta.json() if resposta.status_code == 200 else []
+        entidades[entidade] = [item[campo] for item in listagens[rota] if item.get(campo) is not None]
+    return entidades
+
+
+async def _reproduzir(
+    client: httpx.AsyncClient,
+    registro: Dict[str, Any],
+    rota: Rota,
+    remontador: Remontador,
+    cabecalhos: Dict[str, str],
+    credenciais: Dict[str, str],
+):
+    try:
+        url = remontador.caminho(registro["r"], registro.get("p", {}))
+        params = remontador.valor(registro.get("q")) or None
+        corpo = credenciais if registro["r"].endswith("/auth/login") else remontador.valor(registro.get("b"))
+    except (SemEquivalenteLocal, KeyError):
+        rota.ignoradas += 1
+        return
+    kwargs: Dict[str, Any] = {"params": params, "headers": cabecalhos if registro.get("a") else None}
+    if corpo is not None:
+        kwargs["json"] = corpo
+    inicio = time.perf_counter()
+    try:
+        resposta = await client.request(registro["m"], url, **kwargs)
+    except httpx.HTTPError:
+        rota.erros += 1
+        return
+    rota.reproduzidas_ms.append((time.perf_counter() - inicio) * 1000)
+    if resposta.status_code // 100 != registro["s"] // 100:
+        rota.status_divergente += 1
+
+
+def comparar(rotas: Dict[str, Rota]) -> Dict[str, Dict]:
+    """Resumo capturado x reproduzido por rota, com a razão entre os p95."""
+    comparacao = {}
+    for nome, rota in sorted(rotas.items()):
+        capturado = resumo_latencias(rota.capturadas_ms)
+        reproduzido = resumo_latencias(rota.reproduzidas_ms)
+        comparacao[nome] = {
+            "capturado_ms": capturado,
+            "reproduzido_ms": reproduzido,
+            "razao_p95": round(reproduzido["p95"] / capturado["p95"], 3) if capturado["p95"] else None,
+            "status_divergente": rota.status_divergente,
+            "erros": rota.erros,
+            "ignoradas": rota.ignoradas,
+        }
+    return comparacao
+
+
+async def executar(args: argparse.Namespace) -> Dict:
+    registros = ler_capturas(args.capturas)
+    if args.limite_registros:
+        registros = registros[:args.limite_registros]
+    if not registros:
+        raise SystemExit("Nenhum registro nas capturas informadas")
+
+    limites = httpx.Limits(max_connections=args.conexoes, max_keepalive_connections=args.conexoes)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as client:
+        token = await _login(client, args.email, args.senha)
+        cabecalhos = {"Authorization": f"Bearer {token}"}
+        remontador = Remontador(await _carregar_entidades(client, cabecalhos, args.entidades_por_tipo))
+
+        rotas: Dict[str, Rota] = defaultdict(Rota)
+        tarefas = []
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        for registro in registros:
+            rota = rotas[f"{registro['m']} {registro['r']}"]
+            rota.capturadas_ms.append(registro["d"])
+            # Laço aberto: cada requisição sai no seu instante, sem esperar as anteriores
+            atraso = inicio + registro["t"] / args.velocidade - loop.time()
+            if atraso > 0:
+                await asyncio.sleep(atraso)
+            tarefas.append(asyncio.create_task(
+                _reproduzir(client, registro, rota, remontador, cabecalhos, {"email": args.email, "password": args.senha})
+            ))
+        await asyncio.gather(*tarefas)
+        duracao = loop.time() - inicio
+
+    todas_capturadas = [d for rota in rotas.values() for d in rota.capturadas_ms]
+    todas_reproduzidas = [d for rota in rotas.values() for d in rota.reproduzidas_ms]
+    return {
+        "parametros": {
+            "capturas": [Path(caminho).name for caminho in args.capturas],
+            "url": args.url,
+            "velocidade": args.velocidade,
+            "registros": len(registros),
+        },
+        "duracao_capturada_segundos": round(registros[-1]["t"], 3),
+        "duracao_reproducao_segundos": round(duracao, 3),
+        "capturado_ms": resumo_latencias(todas_capturadas),
+        "reproduzido_ms": resumo_latencias(todas_reproduzidas),
+        "ignoradas": sum(rota.ignoradas for rota in rotas.values()),
+        "rotas": comparar(rotas),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz uma captura de tráfego contra uma instância local.")
+    parser.add_argument("capturas", nargs="+", help="Arquivos trafego-*.jsonl.gz gerados pela captura")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base da API")
+    parser.add_argument("--velocidade", type=float, default=1.0, help="Multiplicador do ritmo original (1, 2, 5...)")
+    parser.add_argument("--email", default=settings.FIRST_SUPERUSER, help="Usuário usado nas requisições autenticadas")
+    parser.add_argument("--senha", default=settings.FIRST_SUPERUSER_PASSWORD)
+    parser.add_argument("--entidades-por-tipo", type=int, default=500, help="Entidades locais carregadas por tipo")
+    parser.add_argument("--conexoes", type=int, default=200, help="Conexões HTTP simultâneas no máximo")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout de cada requisição, em segundos")
+    parser.add_argument("--limite-registros", type=int, default=0, help="Reproduz só os N primeiros registros")
+    parser.add_argument("--saida", default="resultados/replay_trafego.json", help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+    if args.velocidade <= 0:
+        parser.error("--velocidade deve ser positiva")
+
+    resultado = asyncio.run(executar(args))
+    destino = salvar_resultado(args.saida, "replay_trafego", resultado)
+    capturado, reproduzido = resultado["capturado_ms"], resultado["reproduzido_ms"]
+    print(
+        f"{args.velocidade}x: capturado p50={capturado['p50']}ms p95={capturado['p95']}ms p99={capturado['p99']}ms | "
+        f"reproduzido p50={reproduzido['p50']}ms p95={reproduzido['p95']}ms p99={reproduzido['p99']}ms "
+        f"ignoradas={resultado['ignoradas']} -> {destino}"
+    )
+
+
+if __name__ == "__main__":
+    main()
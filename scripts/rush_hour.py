@@ -0,0 +1,302 @@
+# scripts/rush_hour.py
+"""
+Teste de carga de ponta a ponta simulando o horário de pico do bar.
+
+Cada mesa virtual repete o fluxo real até o fim do teste: abre a comanda, faz rodadas de
+POST /pedidos, passa cada pedido pelos status da cozinha, paga parte da conta via /pagamentos,
+registra o restante como fiado (ou paga tudo) e fecha a comanda. Em paralelo, leitores de QR code
+consultam o cardápio. O resultado traz vazão e p50/p95/p99 por etapa e é comparado com os
+orçamentos de latência de scripts/rush_hour_budgets.json: se algum for ultrapassado, o processo
+termina com código 1 (útil em CI).
+
+O teste fala apenas HTTP: a API pode estar apontada para um Postgres local ou qualquer banco de
+testes. Os dados necessários (mesas, produtos e clientes) são criados pela própria API no início,
+com um prefixo único por execução.
+
+Uso:
+    python -m scripts.rush_hour --mesas 30 --leitores-qr 20 --duracao 120 \\
+        --orcamentos scripts/rush_hour_budgets.json --saida resultados/rush_hour.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config.settings import settings
+from app.models.pagamento import MetodoPagamento
+from app.models.pedido import StatusPedido
+from scripts.metricas import resumo_latencias, salvar_resultado
+
+# Transições da cozinha aplicadas a cada pedido, na ordem
+TRANSICOES_COZINHA = (StatusPedido.EM_PREPARO, StatusPedido.PRONTO_PARA_ENTREGA, StatusPedido.ENTREGUE_NA_MESA)
+
+
+@dataclass
+class Etapa:
+    latencias_ms: List[float] = field(default_factory=list)
+    status: Dict[str, int] = field(default_factory=dict)
+    erros: int = 0
+
+
+class Medidor:
+    """Latência e códigos de resposta por etapa do fluxo."""
+
+    def __init__(self):
+        self.etapas: Dict[str, Etapa] = {}
+        self.comandas_fechadas = 0
+
+    def registrar(self, etapa: str, inicio: float, codigo: str, erro: bool):
+        dados = self.etapas.setdefault(etapa, Etapa())
+        dados.latencias_ms.append((time.perf_counter() - inicio) * 1000)
+        dados.status[codigo] = dados.status.get(codigo, 0) + 1
+        if erro:
+            dados.erros += 1
+
+    def resumo(self, duracao: float) -> Dict[str, Dict]:
+        resultado = {}
+        for nome, dados in sorted(self.etapas.items()):
+            requisicoes = len(dados.latencias_ms)
+            resultado[nome] = {
+                "requisicoes": requisicoes,
+                "vazao_por_segundo": round(requisicoes / duracao, 2) if duracao else 0.0,
+                "erros": dados.erros,
+                "taxa_erro": round(dados.erros / requisicoes, 4) if requisicoes else 0.0,
+                "status": dados.status,
+                "latencia_ms": resumo_latencias(dados.latencias_ms),
+            }
+        return resultado
+
+
+@dataclass
+class Ambiente:
+    mesas: List[int]
+    produtos: List[int]
+    clientes: List[int]
+
+
+async def _requisicao(
+    client: httpx.AsyncClient, medidor: Medidor, etapa: str, metodo: str, url: str, **kwargs
+) -> Optional[httpx.Response]:
+    inicio = time.perf_counter()
+    try:
+        resposta = await client.request(metodo, url, **kwargs)
+    except httpx.HTTPError as e:
+        medidor.registrar(etapa, inicio, type(e).__name__, erro=True)
+        return None
+    medidor.registrar(etapa, inicio, str(resposta.status_code), erro=resposta.status_code >= 400)
+    return resposta if resposta.status_code < 400 else None
+
+
+async def _login(client: httpx.AsyncClient, email: str, senha: str) -> str:
+    resposta = await client.post(f"{settings.API_V1_STR}/auth/login", json={"email": email, "password": senha})
+    resposta.raise_for_status()
+    return resposta.json()["access_token"]
+
+
+async def _preparar(client: httpx.AsyncClient, args: argparse.Namespace) -> Ambiente:
+    """Cria mesas, produtos e clientes da execução pela API."""
+    prefixo = f"carga-{int(time.time())}"
+    rng = random.Random(args.semente)
+
+    async def criar(caminho: str, corpo: dict) -> int:
+        resposta = await client.post(f"{settings.API_V1_STR}{caminho}", json=corpo)
+        resposta.raise_for_status()
+        return resposta.json()["id"]
+
+    mesas = [await criar("/mesas/", {"numero_identificador": f"{prefixo}-{i}", "capacidade": 4}) for i in range(args.mesas)]
+    produtos = [
+        await criar("/produtos/", {"nome": f"{prefixo} produto {i}", "preco_unitario": f"{rng.randint(8, 90)}.90"})
+        for i in range(args.produtos)
+    ]
+    clientes = [
+        await criar("/clientes/", {"nome": f"{prefixo} cliente {i}", "telefone": f"1199{i:07d}"})
+        for i in range(max(1, args.mesas // 2))
+    ]
+    return Ambiente(mesas=mesas, produtos=produtos, clientes=clientes)
+
+
+def _saldo(comanda: dict) -> Decimal:
+    total = (
+        Decimal(str(comanda.get("valor_final_comanda") or 0))
+        + Decimal(str(comanda.get("valor_taxa_servico") or 0))
+        - Decimal(str(comanda.get("valor_desconto") or 0))
+    )
+    coberto = Decimal(str(comanda.get("valor_pago") or 0)) + Decimal(str(comanda.get("valor_credito_usado") or 0))
+    return max(Decimal("0.00"), total - coberto).quantize(Decimal("0.01"))
+
+
+async def _mesa(
+    client: httpx.AsyncClient, medidor: Medidor, ambiente: Ambiente, indice: int, args: argparse.Namespace, fim: float
+):
+    """Uma mesa ocupada seguidamente por grupos de clientes até o fim do teste."""
+    rng = random.Random(args.semente + indice)
+    api = settings.API_V1_STR
+    mesa_id = ambiente.mesas[indice]
+    while time.monotonic() < fim:
+        fiado = rng.random() < args.fracao_fiado
+        corpo = {"id_mesa": mesa_id}
+        if fiado:
+            corpo["id_cliente_associado"] = rng.choice(ambiente.clientes)
+        resposta = await _requisicao(client, medidor, "abrir_comanda", "POST", f"{api}/comandas/", json=corpo)
+        if resposta is None:
+            await asyncio.sleep(1)
+            continue
+        comanda = resposta.json()
+        comanda_id = comanda["id"]
+
+        for _ in range(rng.randint(1, args.rodadas_max)):
+            itens = [
+                {"id_produto": produto, "quantidade": rng.randint(1, 4)}
+                for produto in rng.sample(ambiente.produtos, rng.randint(1, min(4, len(ambiente.produtos))))
+            ]
+            resposta = await _requisicao(
+                client, medidor, "criar_pedido", "POST", f"{api}/pedidos/",
+                json={"id_comanda": comanda_id, "mesa_id": mesa_id, "itens": itens},
+            )
+            if resposta is None:
+                continue
+            pedido_id = resposta.json()["id"]
+            for novo_status in TRANSICOES_COZINHA:
+                await asyncio.sleep(rng.uniform(0, args.pausa_cozinha))
+                await _requisicao(
+                    client, medidor, "status_cozinha", "PUT", f"{api}/pedidos/{pedido_id}/status",
+                    json={"status": novo_status.value},
+                )
+
+        resposta = await _requisicao(client, medidor, "consultar_comanda", "GET", f"{api}/comandas/{comanda_id}")
+        saldo = _saldo(resposta.json()) if resposta is not None else Decimal("0.00")
+        if saldo > 0:
+            parcial = (saldo * Decimal(rng.randint(30, 70)) / 100).quantize(Decimal("0.01"))
+            pagamentos = [(parcial, MetodoPagamento.PIX)]
+            restante = saldo - parcial
+            if restante > 0:
+                metodo = MetodoPagamento.FIADO if fiado else MetodoPagamento.CARTAO_DEBITO
+                pagamentos.append((restante, metodo))
+            for valor, metodo in pagamentos:
+                etapa = "registrar_fiado" if metodo == MetodoPagamento.FIADO else "pagamento_parcial"
+                await _requisicao(
+                    client, medidor, etapa, "POST", f"{api}/pagamentos/",
+                    json={
+                        "id_comanda": comanda_id,
+                        "valor_pago": str(valor),
+                        "metodo_pagamento": metodo.value,
+                        "id_cliente": corpo.get("id_cliente_associado"),
+                    },
+                )
+
+        if await _requisicao(client, medidor, "fechar_comanda", "POST", f"{api}/comandas/{comanda_id}/fechar"):
+            medidor.comandas_fechadas += 1
+
+
+async def _leitor_qr(client: httpx.AsyncClient, medidor: Medidor, indice: int, args: argparse.Namespace, fim: float):
+    """Clientes escaneando o QR da mesa: leitura do cardápio completo."""
+    rng = random.Random(args.semente * 1000 + indice)
+    while time.monotonic() < fim:
+        await _requisicao(client, medidor, "cardapio_qr", "GET", f"{settings.API_V1_STR}/produtos/cardapio")
+        await asyncio.sleep(rng.expovariate(1 / args.intervalo_qr))
+
+
+def verificar_orcamentos(etapas: Dict[str, Dict], orcamentos: Dict) -> List[str]:
+    """Lista as violações dos orçamentos de latência (ms) e de taxa de erro por etapa."""
+    violacoes = []
+    taxa_erro_max = orcamentos.get("taxa_erro_max")
+    for nome, limites in orcamentos.get("etapas", {}).items():
+        dados = etapas.get(nome)
+        if dados is None:
+            violacoes.append(f"{nome}: nenhuma requisição medida")
+            continue
+        for percentil, limite in limites.items():
+            medido = dados["latencia_ms"].get(percentil)
+            if medido is not None and medido > limite:
+                violacoes.append(f"{nome}: {percentil}={medido}ms excede o orçamento de {limite}ms")
+        if taxa_erro_max is not None and dados["taxa_erro"] > taxa_erro_max:
+            violacoes.append(f"{nome}: taxa de erro {dados['taxa_erro']:.2%} excede {taxa_erro_max:.2%}")
+    return violacoes
+
+
+async def executar(args: argparse.Namespace) -> Dict:
+    limites = httpx.Limits(max_connections=args.mesas + args.leitores_qr + 5)
+    async with httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=args.timeout, limits=limites) as client:
+        token = await _login(client, args.email, args.senha)
+        client.headers["Authorization"] = f"Bearer {token}"
+        ambiente = await _preparar(client, args)
+
+        medidor = Medidor()
+        inicio = time.monotonic()
+        fim = inicio + args.duracao
+        await asyncio.gather(
+            *(_mesa(client, medidor, ambiente, i, args, fim) for i in range(args.mesas)),
+            *(_leitor_qr(client, medidor, i, args, fim) for i in range(args.leitores_qr)),
+        )
+        duracao_real = time.monotonic() - inicio
+
+    todas = [latencia for etapa in medidor.etapas.values() for latencia in etapa.latencias_ms]
+    return {
+        "parametros": {
+            "url": args.url,
+            "mesas": args.mesas,
+            "leitores_qr": args.leitores_qr,
+            "produtos": args.produtos,
+            "duracao_segundos": args.duracao,
+            "rodadas_max": args.rodadas_max,
+            "fracao_fiado": args.fracao_fiado,
+            "semente": args.semente,
+        },
+        "duracao_real_segundos": round(duracao_real, 3),
+        "comandas_fechadas": medidor.comandas_fechadas,
+        "vazao_total_por_segundo": round(len(todas) / duracao_real, 2) if duracao_real else 0.0,
+        "latencia_ms": resumo_latencias(todas),
+        "etapas": medidor.resumo(duracao_real),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do horário de pico (fluxo completo do bar).")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base da API")
+    parser.add_argument("--email", default=settings.FIRST_SUPERUSER, help="Usuário para login (pagamentos e fiado)")
+    parser.add_argument("--senha", default=settings.FIRST_SUPERUSER_PASSWORD)
+    parser.add_argument("--mesas", type=int, default=20, help="Mesas ocupadas simultaneamente")
+    parser.add_argument("--leitores-qr", type=int, default=10, help="Clientes lendo o cardápio em paralelo")
+    parser.add_argument("--intervalo-qr", type=float, default=2.0, help="Intervalo médio entre leituras, em segundos")
+    parser.add_argument("--produtos", type=int, default=40, help="Produtos criados para o cardápio")
+    parser.add_argument("--rodadas-max", type=int, default=4, help="Máximo de rodadas de pedidos por comanda")
+    parser.add_argument("--pausa-cozinha", type=float, default=0.5, help="Pausa máxima entre transições, em segundos")
+    parser.add_argument("--fracao-fiado", type=float, default=0.2, help="Fração das comandas que deixam saldo em fiado")
+    parser.add_argument("--duracao", type=float, default=60.0, help="Duração do teste, em segundos")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição, em segundos")
+    parser.add_argument("--semente", type=int, default=42, help="Semente dos sorteios, para execuções reproduzíveis")
+    parser.add_argument("--orcamentos", default="scripts/rush_hour_budgets.json", help="Orçamentos de latência (JSON)")
+    parser.add_argument("--saida", default="resultados/rush_hour.json", help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    with open(args.orcamentos, encoding="utf-8") as arquivo:
+        orcamentos = json.load(arquivo)
+    violacoes = verificar_orcamentos(resultado["etapas"], orcamentos)
+    resultado["orcamentos"] = orcamentos
+    resultado["violacoes"] = violacoes
+    destino = salvar_resultado(args.saida, "rush_hour", resultado)
+
+    for nome, dados in resultado["etapas"].items():
+        latencia = dados["latencia_ms"]
+        print(
+            f"{nome:<20} {dados['vazao_por_segundo']:>8}/s  p50={latencia['p50']}ms "
+            f"p95={latencia['p95']}ms p99={latencia['p99']}ms erros={dados['erros']}"
+        )
+    print(f"Resultado gravado em {destino}")
+    if violacoes:
+        print("Orçamentos de latência ultrapassados:")
+        for violacao in violacoes:
+            print(f"  - {violacao}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# scripts/ws_load_test.py
+"""
+Teste de carga do fan-out de WebSockets.
+
+Abre milhares de conexões em /ws/staff/notifications e /ws/comanda/{id}/status contra uma instância
+local da API (com Redis local), publica mensagens via RedisService.publish_message numa taxa
+configurável e mede a latência de entrega (p50/p95/p99), a memória do servidor por conexão e as
+mensagens perdidas. O resultado vai para um arquivo JSON, para comparação entre versões.
+
+Uso (com a API rodando em um único worker):
+    python -m scripts.ws_load_test --staff 2000 --comanda 2000 --comanda-id 1 \\
+        --taxa 20 --duracao 30 --pid-servidor "$(pgrep -f 'uvicorn app.main' | head -1)" \\
+        --saida resultados/ws_load_test.json
+
+Com --pausa, a publicação é dividida em duas metades separadas por um período sem mensagens; as
+entregas da segunda metade mostram se o hub continua assinando o Redis depois de um canal quieto.
+
+Por padrão os clientes não respondem ao ping da aplicação (como os clientes reais, que contam com o
+ping do protocolo WebSocket). Com --pong, conectam com ?pong=true e respondem a cada ping.
+
+O cliente e o servidor devem estar na mesma máquina: a latência usa o relógio de parede.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from app.core.config.settings import settings
+from app.core.notifications import STAFF_NOTIFICATION_CHANNEL, comanda_status_channel
+from app.schemas.websocket_schemas import WebSocketMessage
+from app.services.redis_service import RedisService
+from scripts.metricas import resumo_latencias, rss_do_processo, salvar_resultado
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+@dataclass
+class Grupo:
+    """Estado de um grupo de conexões que assinam o mesmo canal."""
+    nome: str
+    url: str
+    canal: str
+    target_role: str
+    conectados: int = 0
+    falhas_conexao: int = 0
+    desconectados: int = 0
+    publicadas: int = 0
+    recebidas: int = 0
+    latencias_ms: array = field(default_factory=lambda: array("d"))
+
+
+def _decodificar(frame) -> Optional[dict]:
+    if isinstance(frame, bytes):
+        return msgpack.unpackb(frame, raw=False) if msgpack is not None else None
+    try:
+        return json.loads(frame)
+    except ValueError:
+        return None
+
+
+class Rampa:
+    """Acompanha a abertura das conexões e sinaliza quando todas terminaram (com sucesso ou não)."""
+
+    def __init__(self, total: int, aberturas_simultaneas: int):
+        self.pendentes = total
+        self.abertura = asyncio.Semaphore(aberturas_simultaneas)
+        self.concluida = asyncio.Event()
+
+    def registrar(self):
+        self.pendentes -= 1
+        if self.pendentes <= 0:
+            self.concluida.set()
+
+
+async def _cliente(grupo: Grupo, encoding: str, rampa: Rampa, pong: bool):
+    url = f"{grupo.url}?encoding={encoding}" + ("&pong=true" if pong else "")
+    try:
+        async with rampa.abertura:
+            conexao = await websockets.connect(url, max_size=None, ping_interval=None, open_timeout=60)
+    except Exception:
+        grupo.falhas_conexao += 1
+        rampa.registrar()
+        return
+    grupo.conectados += 1
+    rampa.registrar()
+    try:
+        async for frame in conexao:
+            agora = time.time()
+            mensagem = _decodificar(frame)
+            if not isinstance(mensagem, dict):
+                continue
+            payload = mensagem.get("payload") or {}
+            if payload.get("event") == "ping":
+                if pong:
+                    await conexao.send("pong")  # Conexões com ?pong=true caem sem resposta ao heartbeat
+                continue
+            enviado_em = payload.get("enviado_em") if isinstance(payload, dict) else None
+            if enviado_em is not None:
+                grupo.recebidas += 1
+                grupo.latencias_ms.append((agora - enviado_em) * 1000)
+    except websockets.ConnectionClosed:
+        grupo.desconectados += 1
+    except asyncio.CancelledError:
+        await conexao.close()
+        raise
+
+
+async def _publicar(redis_service: RedisService, grupos: List[Grupo], taxa: float, duracao: float):
+    """Publica uma mensagem por grupo a cada 1/taxa segundos, sem acumular atraso."""
+    loop = asyncio.get_running_loop()
+    intervalo = 1 / taxa
+    inicio = loop.time()
+    sequencia = 0
+    while loop.time() - inicio < duracao:
+        for grupo in grupos:
+            mensagem = WebSocketMessage(
+                type="notification",
+                payload={"carga_seq": sequencia, "enviado_em": time.time()},
+                target_role=grupo.target_role,
+            )
+            await redis_service.publish_message(f"{settings.WS_REDIS_CHANNEL_PREFIX}{grupo.canal}", mensagem)
+            grupo.publicadas += 1
+        sequencia += 1
+        await asyncio.sleep(max(0.0, inicio + sequencia * intervalo - loop.time()))
+
+
+async def _stats_do_servidor(base_http: str, token: Optional[str]) -> Optional[Dict]:
+    if not token:
+        return None
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            resposta = await client.get(
+                f"{base_http}{settings.API_V1_STR}/ws/stats", headers={"Authorization": f"Bearer {token}"}
+            )
+            resposta.raise_for_status()
+            return resposta.json()
+    except Exception as e:
+        return {"erro": str(e)}
+
+
+def _elevar_limite_de_arquivos(necessarios: int):
+    flexivel, rigido = resource.getrlimit(resource.RLIMIT_NOFILE)
+    desejado = necessarios + 256  # Folga para o Redis e o cliente HTTP
+    if rigido != resource.RLIM_INFINITY:
+        desejado = min(desejado, rigido)
+    if desejado > flexivel:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (desejado, rigido))
+
+
+async def executar(args: argparse.Namespace) -> Dict:
+    base_ws = args.url.replace("http://", "ws://").replace("https://", "wss://").rstrip("/")
+    base_http = args.url.rstrip("/")
+    prefixo = f"{base_ws}{settings.API_V1_STR}/ws"
+
+    grupos: List[Grupo] = []
+    if args.staff:
+        grupos.append(Grupo("staff", f"{prefixo}/staff/notifications", STAFF_NOTIFICATION_CHANNEL, "staff"))
+    if args.comanda:
+        if args.comanda_id is None:
+            raise SystemExit("--comanda-id é obrigatório quando --comanda > 0")
+        grupos.append(Grupo(
+            "comanda", f"{prefixo}/comanda/{args.comanda_id}/status", comanda_status_channel(args.comanda_id), "client"
+        ))
+    quantidade = {"staff": args.staff, "comanda": args.comanda}
+    total = sum(quantidade[grupo.nome] for grupo in grupos)
+    if total == 0:
+        raise SystemExit("Nenhuma conexão pedida: use --staff e/ou --comanda")
+    if args.encoding == "msgpack" and msgpack is None:
+        raise SystemExit("--encoding msgpack exige o pacote msgpack instalado")
+
+    _elevar_limite_de_arquivos(total)
+    redis_service = RedisService()
+    await redis_service.connect()
+
+    rss_inicial = rss_do_processo(args.pid_servidor) if args.pid_servidor else None
+    rampa = Rampa(total, args.aberturas_simultaneas)
+    inicio_conexoes = time.monotonic()
+    clientes = [
+        asyncio.create_task(_cliente(grupo, args.encoding, rampa, args.pong))
+        for grupo in grupos
+        for _ in range(quantidade[grupo.nome])
+    ]
+    await rampa.concluida.wait()
+    tempo_conexoes = time.monotonic() - inicio_conexoes
+    await asyncio.sleep(1)  # Deixa o servidor terminar de registrar as últimas conexões
+    rss_conectado = rss_do_processo(args.pid_servidor) if args.pid_servidor else None
+    stats_antes = await _stats_do_servidor(base_http, args.token)
+
+    if args.pausa > 0:
+        # Canais quietos por mais que o timeout de leitura do Redis não podem derrubar o listener do hub
+        await _publicar(redis_service, grupos, args.taxa, args.duracao / 2)
+        await asyncio.sleep(args.pausa)
+        await _publicar(redis_service, grupos, args.taxa, args.duracao / 2)
+    else:
+        await _publicar(redis_service, grupos, args.taxa, args.duracao)
+    await asyncio.sleep(args.espera_final)
+    stats_depois = await _stats_do_servidor(base_http, args.token)
+    rss_final = rss_do_processo(args.pid_servidor) if args.pid_servidor else None
+
+    for cliente in clientes:
+        cliente.cancel()
+    await asyncio.gather(*clientes, return_exceptions=True)
+    await redis_service.close_redis_client()
+
+    conectados = sum(grupo.conectados for grupo in grupos)
+    memoria_por_conexao = None
+    if rss_inicial is not None and rss_conectado is not None and conectados:
+        memoria_por_conexao = round((rss_conectado - rss_inicial) / conectados)
+
+    resultado_grupos = {}
+    for grupo in grupos:
+        esperadas = grupo.publicadas * grupo.conectados
+        resultado_grupos[grupo.nome] = {
+            "conexoes_pedidas": quantidade[grupo.nome],
+            "conectados": grupo.conectados,
+            "falhas_conexao": grupo.falhas_conexao,
+            "desconectados_durante_o_teste": grupo.desconectados,
+            "mensagens_publicadas": grupo.publicadas,
+            "entregas_esperadas": esperadas,
+            "entregas_recebidas": grupo.recebidas,
+            "mensagens_perdidas": max(0, esperadas - grupo.recebidas),
+            "latencia_ms": resumo_latencias(grupo.latencias_ms),
+        }
+
+    todas = array("d")
+    for grupo in grupos:
+        todas.extend(grupo.latencias_ms)
+    return {
+        "parametros": {
+            "url": args.url,
+            "staff": args.staff,
+            "comanda": args.comanda,
+            "comanda_id": args.comanda_id,
+            "taxa_por_segundo": args.taxa,
+            "duracao_segundos": args.duracao,
+            "pausa_segundos": args.pausa,
+            "encoding": args.encoding,
+            "pong": args.pong,
+        },
+        "tempo_para_conectar_segundos": round(tempo_conexoes, 3),
+        "memoria_servidor": {
+            "rss_inicial_bytes": rss_inicial,
+            "rss_conectado_bytes": rss_conectado,
+            "rss_final_bytes": rss_final,
+            "bytes_por_conexao": memoria_por_conexao,
+        },
+        "grupos": resultado_grupos,
+        "latencia_ms": resumo_latencias(todas),
+        "mensagens_perdidas": sum(g["mensagens_perdidas"] for g in resultado_grupos.values()),
+        "stats_servidor_antes": stats_antes,
+        "stats_servidor_depois": stats_depois,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do fan-out de WebSockets.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base da API")
+    parser.add_argument("--staff", type=int, default=1000, help="Conexões em /ws/staff/notifications")
+    parser.add_argument("--comanda", type=int, default=0, help="Conexões em /ws/comanda/{id}/status")
+    parser.add_argument("--comanda-id", type=int, help="Comanda existente usada pelas conexões de comanda")
+    parser.add_argument("--taxa", type=float, default=10.0, help="Mensagens por segundo, por canal")
+    parser.add_argument("--duracao", type=float, default=30.0, help="Duração da publicação, em segundos")
+    parser.add_argument(
+        "--pausa", type=float, default=0.0,
+        help="Silêncio no meio da publicação, em segundos (use mais que REDIS_SOCKET_TIMEOUT_SECONDS)",
+    )
+    parser.add_argument("--espera-final", type=float, default=5.0, help="Espera por entregas atrasadas, em segundos")
+    parser.add_argument("--encoding", choices=("json", "msgpack"), default="json")
+    parser.add_argument(
+        "--pong", action="store_true", help="Conecta com ?pong=true e responde ao ping da aplicação"
+    )
+    parser.add_argument("--aberturas-simultaneas", type=int, default=200, help="Handshakes em paralelo")
+    parser.add_argument("--pid-servidor", type=int, help="PID do worker da API, para medir memória por conexão")
+    parser.add_argument("--token", help="JWT de superusuário, para anexar /ws/stats ao resultado")
+    parser.add_argument("--saida", default="resultados/ws_load_test.json", help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    destino = salvar_resultado(args.saida, "ws_load_test", resultado)
+    latencia = resultado["latencia_ms"]
+    print(
+        f"p50={latencia['p50']}ms p95={latencia['p95']}ms p99={latencia['p99']}ms "
+        f"perdidas={resultado['mensagens_perdidas']} "
+        f"memória/conexão={resultado['memoria_servidor']['bytes_por_conexao']} bytes -> {destino}"
+    )
+
+
+if __name__ == "__main__":
+    main()
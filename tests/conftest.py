@@ -0,0 +1,32 @@
+# tests/conftest.py
+"""
+Configuração mínima para importar os módulos da aplicação nos testes unitários.
+
+As configurações obrigatórias recebem valores fictícios (só quando não vêm do ambiente/.env);
+os testes não abrem conexões com o banco nem com o Redis.
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+for nome, valor in {
+    "APP_ENV": "test",
+    "PROJECT_NAME": "testes",
+    "API_V1_STR": "/api/v1",
+    "FRONTEND_URL": "http://localhost",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "teste",
+    "DB_PASS": "teste",
+    "DB_NAME": "teste",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "SECRET_KEY": "teste",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_DAYS": "7",
+    "PASSWORD_RESET_TOKEN_EXPIRE_MINUTES": "30",
+    "FIRST_SUPERUSER": "admin@example.com",
+    "FIRST_SUPERUSER_PASSWORD": "teste",
+}.items():
+    os.environ.setdefault(nome, valor)
@@ -0,0 +1,198 @@
+# tests/test_captura_trafego.py
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.captura_trafego import (
+    MARCADOR_REFERENCIA, MARCADOR_TEXTO, MAX_ITENS_LISTA, GravadorTrafego, entidade_do_campo,
+)
+from scripts.replay_trafego import Remontador, SemEquivalenteLocal
+
+
+@pytest.fixture
+def gravador(tmp_path):
+    gravador = GravadorTrafego(str(tmp_path), max_corpo_bytes=65536)
+    yield gravador
+    gravador.fechar()
+
+
+# --- Anonimização (GravadorTrafego.forma) ---
+
+@pytest.mark.parametrize("campo, entidade", [
+    ("id_comanda", "comanda"),
+    ("comanda_id", "comanda"),
+    ("id_cliente_associado", "cliente"),
+    ("id_usuario_registrou", "usuario"),
+    ("quantidade", None),
+])
+def test_entidade_do_campo(campo, entidade):
+    assert entidade_do_campo(campo) == entidade
+
+
+def test_ids_viram_pseudonimos_estaveis_por_entidade(gravador):
+    forma = gravador.forma({"id_comanda": 812, "mesa_id": 7, "itens": [{"id_produto": 33}, {"id_produto": 812}]})
+    assert forma == {
+        "id_comanda": f"{MARCADOR_REFERENCIA}comanda:0",
+        "mesa_id": f"{MARCADOR_REFERENCIA}mesa:0",
+        "itens": [
+            {"id_produto": f"{MARCADOR_REFERENCIA}produto:0"},
+            {"id_produto": f"{MARCADOR_REFERENCIA}produto:1"},
+        ],
+    }
+    # O mesmo ID, como texto (caminho) ou número (corpo), recebe o mesmo pseudônimo
+    assert gravador.forma("812", "comanda_id") == f"{MARCADOR_REFERENCIA}comanda:0"
+
+
+def test_textos_livres_guardam_so_o_tamanho(gravador):
+    forma = gravador.forma({"observacoes": "Sem cebola", "nome": "Maria da Silva"})
+    assert forma == {"observacoes": f"{MARCADOR_TEXTO}10", "nome": f"{MARCADOR_TEXTO}14"}
+
+
+def test_enums_do_dominio_e_datas_sao_preservados(gravador):
+    corpo = {
+        "status": "Em Preparo",
+        "metodo": "FIADO",
+        "data_inicio": "2026-10-19",
+        "criado_em": "2026-10-19T12:30:00.123+00:00",
+    }
+    assert gravador.forma(corpo) == corpo
+
+
+def test_numeros_booleanos_e_nulos_ficam_como_estao(gravador):
+    corpo = {"quantidade": 2, "valor": 12.5, "ativo": True, "id_cliente": None, "mesa_id": False}
+    assert gravador.forma(corpo) == corpo
+
+
+def test_listas_longas_sao_truncadas(gravador):
+    assert len(gravador.forma(list(range(MAX_ITENS_LISTA + 10)))) == MAX_ITENS_LISTA
+
+
+def test_registro_gravado_nao_contem_dados_pessoais(gravador, tmp_path):
+    scope = {
+        "method": "POST",
+        "route": SimpleNamespace(path="/api/v1/comandas/{comanda_id}/pagamentos"),
+        "path_params": {"comanda_id": "812"},
+        "query_string": b"busca=Maria",
+        "headers": [(b"authorization", b"Bearer segredo")],
+    }
+    corpo = json.dumps({"id_cliente": 5, "observacoes": "CPF 123.456.789-00"}).encode()
+    gravador.registrar(scope, corpo, 201, 12.5)
+    gravador.fechar()
+
+    [arquivo] = tmp_path.glob("trafego-*.jsonl.gz")
+    with gzip.open(arquivo, "rt", encoding="utf-8") as f:
+        cabecalho, registro = (json.loads(linha) for linha in f)
+    assert cabecalho["v"] == 1
+    assert registro["r"] == "/api/v1/comandas/{comanda_id}/pagamentos"
+    assert registro["p"] == {"comanda_id": f"{MARCADOR_REFERENCIA}comanda:0"}
+    assert registro["q"] == {"busca": f"{MARCADOR_TEXTO}5"}
+    assert registro["b"] == {"id_cliente": f"{MARCADOR_REFERENCIA}cliente:0", "observacoes": f"{MARCADOR_TEXTO}18"}
+    assert registro["a"] == 1 and registro["s"] == 201 and registro["d"] == 12.5
+    texto = arquivo.read_bytes()
+    assert b"segredo" not in gzip.decompress(texto) and b"123.456" not in gzip.decompress(texto)
+
+
+@pytest.mark.parametrize("nome, valor, esperado", [
+    ("skip", "0", "0"),
+    ("limit", "100", "100"),
+    ("valor_minimo", "-12.5", "-12.5"),
+    ("periodo", "semanal", "semanal"),
+    ("comparacao", "mensal_ano_anterior", "mensal_ano_anterior"),
+    ("modo", "diff", "diff"),
+    ("papel", "garcom", "garcom"),
+    ("estacao", "bar", "bar"),
+    ("data_inicio", "2026-10-01", "2026-10-01"),
+    ("periodo", "Maria", f"{MARCADOR_TEXTO}5"),
+    ("busca", "bar", f"{MARCADOR_TEXTO}3"),
+    ("comanda_id", "812", f"{MARCADOR_REFERENCIA}comanda:0"),
+    ("comanda_identificador", "812", f"{MARCADOR_REFERENCIA}comanda:0"),
+    ("qr_code_hash", "3f2a-9c", f"{MARCADOR_REFERENCIA}qr_code_hash:0"),
+])
+def test_parametros_de_query_e_caminho(gravador, nome, valor, esperado):
+    assert gravador.parametro(nome, valor) == esperado
+
+
+def _registros(tmp_path):
+    [arquivo] = tmp_path.glob("trafego-*.jsonl.gz")
+    with gzip.open(arquivo, "rt", encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f][1:]
+
+
+# --- Remontagem no replay (Remontador) ---
+
+@pytest.fixture
+def remontador():
+    return Remontador({"comanda": [10, 20, 30], "produto": [7], "mesa": []})
+
+
+def test_referencias_viram_ids_locais(remontador):
+    assert remontador.valor(f"{MARCADOR_REFERENCIA}comanda:1") == 20
+    # Mais pseudônimos que entidades locais: reaproveita em ciclo
+    assert remontador.valor(f"{MARCADOR_REFERENCIA}comanda:4") == 20
+
+
+def test_textos_viram_texto_do_mesmo_tamanho(remontador):
+    assert remontador.valor(f"{MARCADOR_TEXTO}5") == "xxxxx"
+
+
+def test_corpo_aninhado_e_remontado(remontador):
+    forma = {
+        "id_comanda": f"{MARCADOR_REFERENCIA}comanda:0",
+        "itens": [{"id_produto": f"{MARCADOR_REFERENCIA}produto:3", "quantidade": 2, "observacoes": None}],
+        "status": "Recebido",
+    }
+    assert remontador.valor(forma) == {
+        "id_comanda": 10,
+        "itens": [{"id_produto": 7, "quantidade": 2, "observacoes": None}],
+        "status": "Recebido",
+    }
+
+
+def test_entidade_sem_equivalente_local(remontador):
+    with pytest.raises(SemEquivalenteLocal):
+        remontador.valor(f"{MARCADOR_REFERENCIA}mesa:0")
+    with pytest.raises(SemEquivalenteLocal):
+        remontador.valor(f"{MARCADOR_REFERENCIA}fiado:0")
+
+
+def test_caminho_substitui_parametros_da_rota(remontador):
+    parametros = {"comanda_id": f"{MARCADOR_REFERENCIA}comanda:2", "produto_id": f"{MARCADOR_REFERENCIA}produto:0"}
+    assert remontador.caminho("/api/v1/comandas/{comanda_id}", parametros) == "/api/v1/comandas/30"
+    assert remontador.caminho("/api/v1/produtos/{produto_id:int}", parametros) == "/api/v1/produtos/7"
+
+
+def test_captura_e_remontagem_ida_e_volta(gravador):
+    forma = gravador.forma({"id_comanda": 812, "observacoes": "Sem gelo"})
+    remontado = Remontador({"comanda": [99]}).valor(forma)
+    assert remontado == {"id_comanda": 99, "observacoes": "x" * len("Sem gelo")}
+
+
+def test_listagem_com_paginacao_e_periodo_ida_e_volta(gravador, tmp_path):
+    scope = {
+        "method": "GET",
+        "route": SimpleNamespace(path="/api/v1/relatorios/vendas"),
+        "query_string": b"skip=0&limit=100&periodo=semanal",
+    }
+    gravador.registrar(scope, b"", 200, 8.0)
+    gravador.fechar()
+
+    [registro] = _registros(tmp_path)
+    assert registro["q"] == {"skip": "0", "limit": "100", "periodo": "semanal"}
+    assert Remontador({}).valor(registro["q"]) == {"skip": "0", "limit": "100", "periodo": "semanal"}
+
+
+def test_fila_da_estacao_ida_e_volta(gravador, tmp_path):
+    scope = {
+        "method": "GET",
+        "route": SimpleNamespace(path="/api/v1/cozinha/{estacao}/fila"),
+        "path_params": {"estacao": "bar"},
+    }
+    gravador.registrar(scope, b"", 200, 3.0)
+    gravador.fechar()
+
+    [registro] = _registros(tmp_path)
+    assert registro["p"] == {"estacao": "bar"}
+    # Sem entidades locais: o parâmetro não é referência, então não há nada a remontar
+    assert Remontador({}).caminho(registro["r"], registro["p"]) == "/api/v1/cozinha/bar/fila"
@@ -0,0 +1,136 @@
+# tests/test_fila_cozinha_estacoes.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import fila_cozinha_service as modulo
+from app.services.fila_cozinha_service import ESTACAO_PADRAO, FilaCozinhaService
+
+
+class RedisFalso:
+    def __init__(self, versao=None, falhar=False):
+        self.versao = versao
+        self.falhar = falhar
+        self.incrementos = 0
+
+    async def get(self, chave):
+        if self.falhar:
+            raise ConnectionError("Redis fora do ar")
+        return self.versao
+
+    async def incr(self, chave):
+        self.incrementos += 1
+
+
+class BancoFalso:
+    """Responde à consulta (categoria_id, estacao) com as linhas informadas e conta as leituras."""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.leituras = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, consulta):
+        self.leituras += 1
+        return SimpleNamespace(all=lambda: list(self.linhas))
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = RedisFalso(versao="1")
+
+    async def get_redis_client():
+        return redis
+
+    monkeypatch.setattr(modulo.redis_service_instance, "get_redis_client", get_redis_client)
+    return redis
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = BancoFalso([(1, "cozinha"), (2, "bar"), (3, "churrasqueira")])
+    monkeypatch.setattr(modulo, "AsyncSessionFactory", banco)
+    return banco
+
+
+def _produto(categoria_id):
+    return SimpleNamespace(categoria_id=categoria_id)
+
+
+# --- estacao_do_produto ---
+
+def test_produto_vai_para_a_estacao_da_categoria():
+    servico = FilaCozinhaService()
+    servico._estacoes = {1: "cozinha", 2: "bar"}
+    assert servico.estacao_do_produto(_produto(1)) == "cozinha"
+    assert servico.estacao_do_produto(_produto(2)) == "bar"
+
+
+@pytest.mark.parametrize("produto", [None, _produto(None), _produto(99)])
+def test_sem_categoria_conhecida_vai_para_a_estacao_padrao(produto):
+    servico = FilaCozinhaService()
+    servico._estacoes = {2: "bar"}
+    assert servico.estacao_do_produto(produto) == ESTACAO_PADRAO
+
+
+def test_estacao_desconhecida_vai_para_a_estacao_padrao():
+    servico = FilaCozinhaService()
+    servico._estacoes = {3: "churrasqueira"}
+    assert servico.estacao_do_produto(_produto(3)) == ESTACAO_PADRAO
+
+
+# --- Mapa categoria -> estação ---
+
+def test_mapa_carregado_uma_vez_por_versao(redis, banco):
+    servico = FilaCozinhaService()
+    asyncio.run(servico.atualizar_estacoes())
+    asyncio.run(servico.atualizar_estacoes())
+    assert banco.leituras == 1
+    assert servico._estacoes == {1: "cozinha", 2: "bar", 3: "churrasqueira"}
+    assert servico.estacao_do_produto(_produto(2)) == "bar"
+
+    redis.versao = "2"  # Outro worker alterou uma categoria
+    asyncio.run(servico.atualizar_estacoes())
+    assert banco.leituras == 2
+
+
+def test_forcar_rele_o_mapa_na_mesma_versao(redis, banco):
+    servico = FilaCozinhaService()
+    asyncio.run(servico.atualizar_estacoes())
+    asyncio.run(servico.atualizar_estacoes(forcar=True))
+    assert banco.leituras == 2
+
+
+def test_sem_redis_mantem_o_mapa_ja_carregado(redis, banco):
+    servico = FilaCozinhaService()
+    asyncio.run(servico.atualizar_estacoes())
+    redis.falhar = True
+    asyncio.run(servico.atualizar_estacoes())
+    assert banco.leituras == 1
+    assert servico.estacao_do_produto(_produto(2)) == "bar"
+
+
+def test_sem_redis_e_sem_mapa_carrega_do_banco(redis, banco):
+    redis.falhar = True
+    servico = FilaCozinhaService()
+    asyncio.run(servico.atualizar_estacoes())
+    assert banco.leituras == 1
+    assert servico.estacao_do_produto(_produto(2)) == "bar"
+
+
+def test_invalidar_faz_todos_os_workers_relerem(redis, banco):
+    servico = FilaCozinhaService()
+    asyncio.run(servico.atualizar_estacoes())
+    asyncio.run(servico.invalidar_estacoes())
+    assert redis.incrementos == 1
+    asyncio.run(servico.atualizar_estacoes())
+    assert banco.leituras == 2
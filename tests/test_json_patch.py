@@ -0,0 +1,80 @@
+# tests/test_json_patch.py
+import copy
+
+from app.utils.json_patch import gerar_json_patch
+
+
+def _aplicar(documento, ops):
+    """Aplicação mínima de JSON Patch (add/remove/replace), suficiente para validar os patches gerados."""
+    documento = copy.deepcopy(documento)
+    for op in ops:
+        if op["path"] == "":
+            documento = copy.deepcopy(op["value"])
+            continue
+        partes = [p.replace("~1", "/").replace("~0", "~") for p in op["path"].split("/")[1:]]
+        alvo = documento
+        for parte in partes[:-1]:
+            alvo = alvo[int(parte)] if isinstance(alvo, list) else alvo[parte]
+        chave = int(partes[-1]) if isinstance(alvo, list) else partes[-1]
+        if op["op"] == "remove":
+            del alvo[chave]
+        else:
+            alvo[chave] = copy.deepcopy(op["value"])
+    return documento
+
+
+def test_documentos_iguais_nao_geram_operacoes():
+    resumo = {"status": "Aberta", "pedidos": [{"id": 1, "status": "Recebido"}]}
+    assert gerar_json_patch(resumo, copy.deepcopy(resumo)) == []
+
+
+def test_campo_alterado_vira_replace_no_ponteiro():
+    ops = gerar_json_patch({"saldo": 10.0, "pago": 0.0}, {"saldo": 0.0, "pago": 0.0})
+    assert ops == [{"op": "replace", "path": "/saldo", "value": 0.0}]
+
+
+def test_chaves_adicionadas_e_removidas():
+    ops = gerar_json_patch({"a": 1, "b": 2}, {"b": 2, "c": 3})
+    assert {"op": "remove", "path": "/a"} in ops
+    assert {"op": "add", "path": "/c", "value": 3} in ops
+    assert len(ops) == 2
+
+
+def test_listas_de_mesmo_tamanho_comparadas_item_a_item():
+    antigo = {"pedidos": [{"id": 1, "status": "Recebido"}, {"id": 2, "status": "Recebido"}]}
+    novo = {"pedidos": [{"id": 1, "status": "Recebido"}, {"id": 2, "status": "Em Preparo"}]}
+    assert gerar_json_patch(antigo, novo) == [
+        {"op": "replace", "path": "/pedidos/1/status", "value": "Em Preparo"}
+    ]
+
+
+def test_lista_que_mudou_de_tamanho_e_substituida_inteira():
+    novo = {"pedidos": [{"id": 1}, {"id": 2}]}
+    assert gerar_json_patch({"pedidos": [{"id": 1}]}, novo) == [
+        {"op": "replace", "path": "/pedidos", "value": novo["pedidos"]}
+    ]
+
+
+def test_chaves_com_barra_e_til_sao_escapadas():
+    ops = gerar_json_patch({"itens_por_status": {"a/b": 1, "c~d": 1}}, {"itens_por_status": {"a/b": 2, "c~d": 0}})
+    assert {op["path"] for op in ops} == {"/itens_por_status/a~1b", "/itens_por_status/c~0d"}
+
+
+def test_tipos_diferentes_na_raiz_substituem_o_documento():
+    assert gerar_json_patch([1], {"a": 1}) == [{"op": "replace", "path": "", "value": {"a": 1}}]
+
+
+def test_patch_aplicado_reproduz_o_novo_resumo():
+    antigo = {
+        "status_comanda": "Aberta",
+        "valor_pago": 0.0,
+        "itens_por_status": {"Recebido": 3},
+        "pedidos": [{"id": 1, "status": "Recebido"}],
+    }
+    novo = {
+        "status_comanda": "Parcialmente Paga",
+        "valor_pago": 25.5,
+        "itens_por_status": {"Recebido": 1, "Pronto": 2},
+        "pedidos": [{"id": 1, "status": "Pronto para Entrega"}, {"id": 2, "status": "Recebido"}],
+    }
+    assert _aplicar(antigo, gerar_json_patch(antigo, novo)) == novo